@@ -30,8 +30,16 @@ class BaseTabluarInline(admin.TabularInline):
 class TargetInline(BaseTabluarInline):
     model = Target
 
-    fields = ("scheme", "host", "weight", "enabled", "toggle")
-    readonly_fields = ("toggle",)
+    fields = (
+        "scheme",
+        "host",
+        "weight",
+        "enabled",
+        "health",
+        "breaker",
+        "toggle",
+    )
+    readonly_fields = ("health", "breaker", "toggle")
 
     def toggle(self, obj: Target):
         str(obj)
@@ -75,7 +83,7 @@ class APIETCInline(APIInline):
 
 class APIAdmin(admin.ModelAdmin):
     ordering = ("upstream", "request_path")
-    list_filter = ("upstream", "plugin")
+    list_filter = ("upstream", "plugin", "priority")
     list_per_page = 10
 
 
@@ -88,7 +96,7 @@ class UpstreamAdmin(admin.ModelAdmin):
         APIBasicInline,
         APIETCInline,
     ]
-    readonly_fields = ("total_weight",)
+    readonly_fields = ("total_weight", "pool_stats", "limiter_stats")
     search_fields = ("alias",)
     fields = (
         "total_weight",
@@ -97,8 +105,33 @@ class UpstreamAdmin(admin.ModelAdmin):
         "host",
         "weight",
         "load_balance",
+        "counter",
+        "hash_on",
+        "hash_key",
         "retries",
+        "retry_budget",
         "timeout",
+        "pool_size",
+        "pool_idle_timeout",
+        "pool_max_requests",
+        "pool_stats",
+        "concurrency_limiter",
+        "concurrency_limit",
+        "queue_size",
+        "queue_timeout",
+        "limiter_stats",
+        "health_check_path",
+        "health_check_interval",
+        "healthy_threshold",
+        "unhealthy_threshold",
+        "outlier_consecutive_failures",
+        "outlier_error_rate",
+        "outlier_min_requests",
+        "outlier_ejection_time",
+        "outlier_max_ejection_time",
+        "slow_start",
+        "slow_start_curve",
+        "slow_start_min_weight",
     )
     list_display = (
         "__str__",
@@ -128,7 +161,8 @@ class UpstreamAdmin(admin.ModelAdmin):
 class TargetAdmin(admin.ModelAdmin):
     ordering = ("upstream",)
     list_filter = ("upstream",)
-    list_display = ("__str__", "enabled", "toggle_button")
+    list_display = ("__str__", "enabled", "health", "breaker", "toggle_button")
+    readonly_fields = ("enabled_at",)
 
     def get_urls(self):
         urls = super().get_urls()
@@ -1,22 +1,13 @@
 from threading import Thread
 from django.apps import AppConfig
 
-from base.consts import DAY, MINUTE
-from base.caches import cache, UseSingleCache
-
 
+# 첫 요청이 라우트 테이블을 만드느라 지연되지 않도록 미리 만들어 둠
 def warm_cache():
-    from .models import Api
+    from .routes import route_table
 
-    is_running = cache.get("warm_up", False)
-    if is_running:
-        print("최근에 수행된 캐시 작업이 있습니다.")
-        return
-    cache.set("warm_up", True, 2 * MINUTE)
-    api_cache = UseSingleCache(0, "api")
-    for api in Api.objects.prefetch_related("upstream", "upstream__targets").iterator():
-        print("set", api)
-        api_cache.set(api, 30 * DAY, path=api.request_path, upstream=api.upstream.pk)
+    trie = route_table.refresh()
+    print(f"route table ready ({trie.size} routes)")
 
 
 class ApigatewayConfig(AppConfig):
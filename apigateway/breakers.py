@@ -0,0 +1,168 @@
+import time
+from collections import deque
+from threading import Lock
+from typing import TYPE_CHECKING, Optional
+
+from django.conf import settings
+from django.db import models
+
+from base.caches import cache
+
+if TYPE_CHECKING:
+    from .nodes import LoadBalancer, Node
+
+
+class BreakerState(models.TextChoices):
+    CLOSED = "closed"  # 정상적으로 요청을 보냄
+    OPEN = "open"  # 분산 대상에서 제외됨
+    HALF_OPEN = "half_open"  # 제외 시간이 끝나 시험 요청 하나만 보냄
+
+
+def breaker_key(node: "Node"):
+    return f"breaker:{node.node_key}"
+
+
+# 프록시 요청의 결과(연결 실패, 타임아웃, 5xx)로 타겟의 이상을 감지하는 서킷 브레이커
+# 워커마다 자신이 보낸 요청의 결과로 판단하며, 상태가 바뀔 때만 캐시에 기록하여 어드민에 보여줌
+class CircuitBreaker:
+    def __init__(self):
+        self._lock = Lock()
+        self.state = BreakerState.CLOSED
+        self.failures = 0  # 연속으로 실패한 횟수
+        self.outcomes: deque[bool] = deque(
+            maxlen=getattr(settings, "OUTLIER_WINDOW_SIZE", 100)
+        )
+        self.ejections = 0  # 연속으로 제외된 횟수, 제외 시간을 늘리는데 사용
+        self.opened_until = 0.0
+        self.closed_at = 0.0
+        self.recovered_at = 0.0  # 시험 요청이 성공하여 복구된 시각(epoch)
+        self.trial_at: Optional[float] = None  # 진행중인 시험 요청을 보낸 시각
+
+    # 시험 요청의 응답이 오지 않으면 timeout 이후 다시 시험 요청을 보낼 수 있음
+    def trial_pending(self, now: float, upstream: "LoadBalancer"):
+        return self.trial_at is not None and now - self.trial_at < upstream.timeout
+
+    # 상태를 바꾸지 않고 현재 요청을 보낼 수 있는지만 확인
+    def available(self, now: float, upstream: "LoadBalancer"):
+        if self.state == BreakerState.CLOSED:
+            return True
+        if self.state == BreakerState.OPEN and now < self.opened_until:
+            return False
+        return not self.trial_pending(now, upstream)
+
+    # 분산 대상으로 선택되었을 때 호출, 제외 시간이 끝났다면 시험 요청으로 기록
+    def acquire(self, now: float, upstream: "LoadBalancer", node: "Node"):
+        if self.state == BreakerState.CLOSED:
+            return
+        with self._lock:
+            if self.state == BreakerState.OPEN and self.opened_until <= now:
+                self.transition(BreakerState.HALF_OPEN, node)
+            if self.state == BreakerState.HALF_OPEN:
+                self.trial_at = now
+
+    def tripped(self, upstream: "LoadBalancer"):
+        consecutive = upstream.outlier_consecutive_failures
+        if consecutive and consecutive <= self.failures:
+            return True
+        error_rate = upstream.outlier_error_rate
+        count = len(self.outcomes)
+        if not error_rate or count < max(upstream.outlier_min_requests, 1):
+            return False
+        errors = count - sum(self.outcomes)
+        return error_rate <= errors * 100 / count
+
+    def record(self, ok: bool, upstream: "LoadBalancer", node: "Node"):
+        now = time.monotonic()
+        with self._lock:
+            self.outcomes.append(ok)
+            self.failures = 0 if ok else self.failures + 1
+            if self.state == BreakerState.HALF_OPEN:
+                self.trial_at = None
+                if ok:
+                    self.close(now, node)
+                else:
+                    self.open(now, upstream, node)
+            elif self.state == BreakerState.CLOSED and self.tripped(upstream):
+                self.open(now, upstream, node)
+
+    # 제외 시간은 연속으로 제외될 때마다 두배로 늘어남
+    def open(self, now: float, upstream: "LoadBalancer", node: "Node"):
+        max_time = upstream.outlier_max_ejection_time
+        # 오랫동안 정상이었던 타겟은 처음 제외되는 것으로 취급
+        if self.state == BreakerState.CLOSED and max_time < now - self.closed_at:
+            self.ejections = 0
+        duration = min(upstream.outlier_ejection_time * 2**self.ejections, max_time)
+        self.ejections += 1
+        self.opened_until = now + duration
+        self.transition(BreakerState.OPEN, node, duration)
+
+    def close(self, now: float, node: "Node"):
+        self.failures = 0
+        self.outcomes.clear()
+        self.closed_at = now
+        self.recovered_at = time.time()
+        self.transition(BreakerState.CLOSED, node)
+
+    def transition(self, state: BreakerState, node: "Node", duration: float = 0):
+        self.state = state
+        print("circuit breaker", state, node.full_path)
+        try:
+            cache.set(
+                breaker_key(node),
+                {"state": state, "until": time.time() + duration},
+                timeout=None,
+            )
+        except Exception as e:
+            print("circuit breaker publish failed", e)
+
+
+class CircuitBreakers:
+    def __init__(self):
+        self._lock = Lock()
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, node: "Node") -> CircuitBreaker:
+        key = node.node_key
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(key, CircuitBreaker())
+        return breaker
+
+    def enabled(self, upstream: "LoadBalancer"):
+        return bool(
+            upstream.outlier_consecutive_failures or upstream.outlier_error_rate
+        )
+
+    def available(self, upstream: "LoadBalancer", node: "Node"):
+        if not self.enabled(upstream):
+            return True
+        breaker = self._breakers.get(node.node_key)
+        if breaker is None:
+            return True
+        return breaker.available(time.monotonic(), upstream)
+
+    def acquire(self, upstream: "LoadBalancer", node: "Node"):
+        if self.enabled(upstream):
+            self.get(node).acquire(time.monotonic(), upstream, node)
+
+    def record(self, upstream: "LoadBalancer", node: "Node", ok: bool):
+        if self.enabled(upstream):
+            self.get(node).record(ok, upstream, node)
+
+    def recovered_at(self, node: "Node") -> float:
+        breaker = self._breakers.get(node.node_key)
+        return breaker.recovered_at if breaker else 0
+
+
+breakers = CircuitBreakers()
+
+
+# 어드민에서 보여줄 노드의 서킷 브레이커 상태(마지막으로 상태를 바꾼 워커 기준)
+def describe(node: "Node"):
+    state = cache.get(breaker_key(node))
+    if state is None:
+        return BreakerState.CLOSED.label
+    if state["state"] == BreakerState.OPEN and state["until"] <= time.time():
+        return BreakerState.HALF_OPEN.label
+    return BreakerState(state["state"]).label
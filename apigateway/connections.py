@@ -0,0 +1,82 @@
+import time
+from threading import Lock
+from typing import TYPE_CHECKING, Iterable
+
+from django.conf import settings
+
+from .workers import WorkerValues
+
+if TYPE_CHECKING:
+    from .nodes import Node
+
+
+# 타겟별로 처리중인 요청 수를 워커 메모리에 기록
+# LEAST_CONNECTIONS_SHARED가 켜져 있으면 LEAST_CONNECTIONS_SYNC_INTERVAL마다
+# 이 워커의 값을 워커별 키에 기록하고 모든 워커의 합계를 조회
+# 그 사이에는 마지막 조회 이후 이 워커에서 바뀐 만큼만 더해서 추정
+# 요청을 받지 않아 기록이 멈춘 워커의 값은 LEAST_CONNECTIONS_WORKER_TTL이 지나면 합계에서 빠짐
+class ConnectionCounter:
+    def __init__(self):
+        self._lock = Lock()
+        self._counts: dict[str, int] = {}
+        self.workers = WorkerValues("connections")
+        # 마지막으로 조회한 전체 워커의 합계와 그 때 기록한 이 워커의 값, 조회 시각
+        self._totals: dict[str, int] = {}
+        self._published: dict[str, int] = {}
+        self._synced_at = 0.0
+
+    @property
+    def shared(self) -> bool:
+        return getattr(settings, "LEAST_CONNECTIONS_SHARED", False)
+
+    def incr(self, node: "Node") -> int:
+        key = node.node_key
+        with self._lock:
+            count = self._counts.get(key, 0) + 1
+            self._counts[key] = count
+        return count
+
+    def decr(self, node: "Node") -> int:
+        key = node.node_key
+        with self._lock:
+            count = max(self._counts.get(key, 0) - 1, 0)
+            self._counts[key] = count
+        return count
+
+    def get(self, node: "Node") -> int:
+        return self._counts.get(node.node_key, 0)
+
+    def sync(self):
+        ttl = getattr(settings, "LEAST_CONNECTIONS_WORKER_TTL", 10)
+        with self._lock:
+            published = {key: count for key, count in self._counts.items() if count}
+        try:
+            self.workers.publish(published, ttl)
+            totals = dict(self.workers.total())
+        except Exception as e:
+            print("connection count failed", e)
+            totals = published
+        self._totals, self._published = totals, published
+        self._synced_at = time.monotonic()
+
+    # 노드들의 처리중인 요청 수
+    def load(self, nodes: Iterable["Node"]) -> list[int]:
+        nodes = list(nodes)
+        if not self.shared:
+            return [self.get(node) for node in nodes]
+        interval = getattr(settings, "LEAST_CONNECTIONS_SYNC_INTERVAL", 0.5)
+        if interval < time.monotonic() - self._synced_at:
+            self.sync()
+        totals, published = self._totals, self._published
+        return [
+            max(
+                totals.get(node.node_key, 0)
+                + self.get(node)
+                - published.get(node.node_key, 0),
+                0,
+            )
+            for node in nodes
+        ]
+
+
+connections = ConnectionCounter()
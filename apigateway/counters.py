@@ -0,0 +1,73 @@
+import random
+from threading import Lock
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.db import models
+
+from base.caches import cache
+
+if TYPE_CHECKING:
+    from .nodes import LoadBalancer
+
+
+class CounterType(models.TextChoices):
+    LOCAL = "local"  # 워커마다 독립적인 카운터, 요청마다 redis를 조회하지 않음
+    LEASED = "leased"  # redis에서 번호를 묶음으로 받아와 사용
+    GLOBAL = "global"  # 요청마다 redis에서 번호를 받음, 모든 워커에서 엄격한 순서를 보장
+
+
+# 업스트림별로 로드밸런싱에 사용할 요청 번호를 발급
+class RequestCounter:
+    def __init__(self):
+        self._lock = Lock()
+        self._local: dict[int, int] = {}
+        # 업스트림별로 받아온 번호의 묶음 [다음 번호, 끝 번호)
+        self._leases: dict[int, tuple[int, int]] = {}
+
+    @property
+    def lease_size(self) -> int:
+        return getattr(settings, "COUNTER_LEASE_SIZE", 100)
+
+    def next(self, upstream: "LoadBalancer") -> int:
+        if upstream.counter == CounterType.GLOBAL:
+            return self.next_global(upstream)
+        if upstream.counter == CounterType.LEASED:
+            return self.next_leased(upstream)
+        return self.next_local(upstream)
+
+    def next_global(self, upstream: "LoadBalancer") -> int:
+        cache.add(upstream.req_key, 0)
+        return cache.incr(upstream.req_key, 1)
+
+    # 워커들이 같은 순서로 같은 노드를 고르지 않도록 임의의 번호에서 시작
+    def next_local(self, upstream: "LoadBalancer") -> int:
+        with self._lock:
+            count = self._local.get(upstream.pk)
+            if count is None:
+                count = random.randrange(1 << 16)
+            count += 1
+            self._local[upstream.pk] = count
+            return count
+
+    # 묶음 단위로 번호를 받으므로 redis 조회는 lease_size번의 요청마다 한번만 발생
+    def next_leased(self, upstream: "LoadBalancer") -> int:
+        with self._lock:
+            start, end = self._leases.get(upstream.pk, (0, 0))
+            if start >= end:
+                try:
+                    size = self.lease_size
+                    cache.add(upstream.req_key, 0)
+                    end = cache.incr(upstream.req_key, size)
+                    start = end - size
+                except Exception as e:
+                    # redis에 문제가 있어도 요청은 처리되도록 워커의 번호를 사용
+                    print("counter lease failed", e)
+                    start = self._local.get(upstream.pk, random.randrange(1 << 16))
+                    end = start + 1
+                    self._local[upstream.pk] = end
+            self._leases[upstream.pk] = (start + 1, end)
+            return start + 1
+
+
+counters = RequestCounter()
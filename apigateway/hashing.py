@@ -0,0 +1,51 @@
+import hashlib
+from bisect import bisect
+from typing import TYPE_CHECKING, Callable, Generic, Iterable, Optional, TypeVar
+
+from django.conf import settings
+
+if TYPE_CHECKING:
+    from .nodes import Node
+
+TNode = TypeVar("TNode", bound="Node")
+
+
+def hash_value(string: str) -> int:
+    digest = hashlib.blake2b(string.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+# 가상 노드를 가진 해시 링
+# 노드마다 가중치에 비례하는 수의 가상 노드를 링 위에 배치하고
+# 키의 해시값에서 시계방향으로 처음 만나는 노드를 선택
+# 노드가 추가되거나 빠져도 그 노드에 해당하던 키(약 1/N)만 다른 노드로 옮겨감
+class HashRing(Generic[TNode]):
+    def __init__(self, nodes: Iterable[TNode], replicas: Optional[int] = None):
+        if replicas is None:
+            replicas = getattr(settings, "HASH_RING_REPLICAS", 160)
+        points: list[tuple[int, TNode]] = []
+        for node in nodes:
+            # 기본 가중치(100)를 가진 노드가 replicas개의 가상 노드를 가짐
+            count = max(replicas * node.weight // 100, 1)
+            for i in range(count):
+                points.append((hash_value(f"{node.node_key}#{i}"), node))
+        points.sort(key=lambda x: x[0])
+        self._hashes = [point[0] for point in points]
+        self._nodes = [point[1] for point in points]
+
+    def __len__(self):
+        return len(self._hashes)
+
+    # available을 통과하지 못한 노드(비활성화, 헬스체크 실패, 재시도 시 이미 실패한 노드)는 건너뜀
+    def get(
+        self, key: str, available: Callable[[TNode], bool] = lambda x: True
+    ) -> Optional[TNode]:
+        size = len(self._hashes)
+        if not size:
+            return None
+        start = bisect(self._hashes, hash_value(key))
+        for i in range(size):
+            node = self._nodes[(start + i) % size]
+            if available(node):
+                return node
+        return None
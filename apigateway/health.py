@@ -0,0 +1,166 @@
+import os
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Thread
+from typing import TYPE_CHECKING, Iterable, Optional, TypedDict
+
+from django.conf import settings
+
+from base.caches import cache
+
+if TYPE_CHECKING:
+    from .nodes import LoadBalancer, Node
+
+
+class HealthState(TypedDict):
+    healthy: bool
+    successes: int  # 연속으로 성공한 횟수
+    failures: int  # 연속으로 실패한 횟수
+    changed_at: float  # 마지막으로 상태가 바뀐 시각(epoch)
+
+
+def health_key(node: "Node"):
+    return f"health:{node.node_key}"
+
+
+def initial_state() -> HealthState:
+    return HealthState(healthy=True, successes=0, failures=0, changed_at=0)
+
+
+# 연속 성공/실패 횟수가 기준을 넘으면 상태를 바꿈
+def record(state: HealthState, ok: bool, upstream: "LoadBalancer") -> HealthState:
+    if ok:
+        state["successes"] += 1
+        state["failures"] = 0
+        if not state["healthy"] and upstream.healthy_threshold <= state["successes"]:
+            state["healthy"] = True
+            state["changed_at"] = time.time()
+    else:
+        state["failures"] += 1
+        state["successes"] = 0
+        if state["healthy"] and upstream.unhealthy_threshold <= state["failures"]:
+            state["healthy"] = False
+            state["changed_at"] = time.time()
+    return state
+
+
+def get_states(nodes: Iterable["Node"]) -> dict[str, HealthState]:
+    keys = {health_key(node): node.node_key for node in nodes}
+    states = cache.get_many(list(keys))
+    return {keys[key]: state for key, state in states.items()}
+
+
+# 업스트림마다 정해진 주기로 모든 노드에 헬스체크 요청을 보내고
+# 결과를 캐시에 기록하여 모든 워커와 서버가 같은 상태를 공유
+# 요청 처리 중에는 워커 메모리의 ejected만 확인하므로 redis나 db를 조회하지 않음
+class HealthChecker:
+    def __init__(self):
+        self._lock = Lock()
+        self.pid: Optional[int] = None
+        self._thread: Optional[Thread] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.ejected: frozenset[str] = frozenset()
+        # 헬스체크에 실패했다가 복구된 노드와 복구된 시각
+        self.recovered: dict[str, float] = {}
+        self.upstreams: list["LoadBalancer"] = []
+        self.tick: float = getattr(settings, "HEALTH_CHECK_TICK", 1)
+
+    # uwsgi처럼 워커를 fork하는 서버에서는 부모 프로세스의 스레드가 복사되지 않으므로
+    # 워커마다 스레드와 스레드 풀을 새로 만듦
+    def start(self):
+        pid = os.getpid()
+        if self.pid == pid:
+            return
+        with self._lock:
+            if self.pid == pid:
+                return
+            self.executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "HEALTH_CHECK_WORKERS", 8),
+                thread_name_prefix="health-probe",
+            )
+            self._thread = Thread(target=self.run, name="health-checker", daemon=True)
+            self._thread.start()
+            self.pid = pid
+
+    # 라우트 테이블이 다시 만들어질 때마다 검사할 업스트림을 교체
+    def watch(self, upstreams: Iterable["LoadBalancer"]):
+        self.upstreams = [x for x in upstreams if x.health_check_path]
+        self.start()
+
+    def is_healthy(self, node: "Node"):
+        self.start()
+        return node.node_key not in self.ejected
+
+    # 비활성화된 타겟은 분산 대상이 아니므로 검사하지 않음
+    def nodes(self, upstream: "LoadBalancer") -> list["Node"]:
+        return [upstream, *(x for x in upstream.targets.all() if x.enabled)]
+
+    def probe(self, upstream: "LoadBalancer", node: "Node") -> bool:
+        url = node.full_path + upstream.health_check_path
+        timeout = min(upstream.timeout, upstream.health_check_interval) or 1
+        try:
+            resp = requests.get(url, timeout=timeout)
+            return resp.status_code < 400
+        except Exception:
+            return False
+
+    def check(self, upstream: "LoadBalancer"):
+        # 같은 주기에 여러 워커가 같은 업스트림을 검사하지 않도록 잠금
+        lock_key = f"health:lock:{upstream.pk}"
+        if not cache.add(lock_key, True, timeout=upstream.health_check_interval):
+            return
+        nodes = self.nodes(upstream)
+        assert self.executor is not None
+        results = self.executor.map(lambda node: self.probe(upstream, node), nodes)
+        states = get_states(nodes)
+        updated = {}
+        for node, ok in zip(nodes, results):
+            state = states.get(node.node_key) or initial_state()
+            if state["healthy"] and not ok and state["failures"] == 0:
+                print("health check failed", node.full_path)
+            updated[health_key(node)] = record(state, ok, upstream)
+        cache.set_many(updated, timeout=None)
+
+    # 캐시에 기록된 상태로 워커 메모리의 ejected를 갱신
+    def sync(self, upstreams: list["LoadBalancer"]):
+        nodes = [node for upstream in upstreams for node in self.nodes(upstream)]
+        states = get_states(nodes)
+        self.ejected = frozenset(
+            key for key, state in states.items() if not state["healthy"]
+        )
+        self.recovered = {
+            key: state["changed_at"]
+            for key, state in states.items()
+            if state["healthy"] and state["changed_at"]
+        }
+
+    def run(self):
+        checked_at: dict[int, float] = {}
+        while True:
+            time.sleep(self.tick)
+            upstreams = self.upstreams
+            try:
+                now = time.monotonic()
+                for upstream in upstreams:
+                    last = checked_at.get(upstream.pk, 0)
+                    if now - last < upstream.health_check_interval:
+                        continue
+                    checked_at[upstream.pk] = now
+                    self.check(upstream)
+                self.sync(upstreams)
+            except Exception as e:
+                print("health check error", e)
+
+
+health_checker = HealthChecker()
+
+
+# 어드민에서 보여줄 노드의 헬스체크 상태
+def describe(node: "Node", upstream: Optional["LoadBalancer"]):
+    if upstream is None or not upstream.health_check_path:
+        return "-"
+    state = cache.get(health_key(node))
+    if state is None:
+        return "unknown"
+    return "healthy" if state["healthy"] else "unhealthy"
@@ -0,0 +1,236 @@
+import time
+import asyncio
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from threading import BoundedSemaphore, Lock
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional
+
+from django.conf import settings
+
+from .retries import RetryBudget
+from .streams import RequestBodyStream, discard_response, on_body_end
+
+if TYPE_CHECKING:
+    from .limits import ConcurrencyLimiter
+    from .models import Api
+
+
+# 최근 응답 시간들의 백분위수
+# 요청마다 정렬하지 않도록 일정 횟수마다 다시 계산한 값을 사용
+class LatencyWindow:
+    def __init__(self):
+        self._lock = Lock()
+        self.samples: deque[float] = deque(
+            maxlen=getattr(settings, "HEDGE_SAMPLE_SIZE", 1000)
+        )
+        self.added = 0
+        self._sorted: list[float] = []
+
+    def add(self, rtt: float):
+        with self._lock:
+            self.samples.append(rtt)
+            self.added += 1
+            every = getattr(settings, "HEDGE_RECOMPUTE_EVERY", 50)
+            min_samples = getattr(settings, "HEDGE_MIN_SAMPLES", 20)
+            if len(self._sorted) < min_samples or self.added % every == 0:
+                self._sorted = sorted(self.samples)
+
+    def percentile(self, percent: int) -> Optional[float]:
+        values = self._sorted
+        if len(values) < getattr(settings, "HEDGE_MIN_SAMPLES", 20):
+            return None
+        index = min(len(values) * percent // 100, len(values) - 1)
+        return values[index]
+
+
+# 느린 응답을 기다리는 대신 다른 타겟으로 같은 요청을 한번 더 보내고 먼저 온 응답을 사용
+# 멱등한 GET 요청에만 사용하며, 추가로 보내는 요청은 api의 hedge_budget(%) 이내로 제한
+# 동시 요청 수 제한이 있는 업스트림에서는 추가 요청도 슬롯을 하나 더 사용하고, 남은 슬롯이 없으면 보내지 않음
+# 첫번째 요청(HEDGE_WORKERS)과 헤지 요청(HEDGE_MAX_OUTSTANDING)은 각자의 개수만큼만 스레드를 사용하여
+# 스레드 풀의 대기열에 쌓이지 않음, 스레드가 없으면 첫번째 요청은 헤지 없이 보내고 헤지 요청은 보내지 않음
+class Hedger:
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.windows: defaultdict[int, LatencyWindow] = defaultdict(LatencyWindow)
+        self.budgets: defaultdict[int, RetryBudget] = defaultdict(
+            lambda: RetryBudget(min_per_second=0)
+        )
+        self.workers: int = getattr(settings, "HEDGE_WORKERS", 32)
+        self.max_hedges: int = getattr(settings, "HEDGE_MAX_OUTSTANDING", 8)
+        self.primaries = BoundedSemaphore(self.workers)
+        self.hedges = BoundedSemaphore(self.max_hedges)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers + self.max_hedges,
+                        thread_name_prefix="hedge",
+                    )
+        return self._executor
+
+    def enabled(self, api: "Api", method: str, data) -> bool:
+        return api.hedge and method == "get" and not isinstance(data, RequestBodyStream)
+
+    def delay(self, api: "Api") -> Optional[float]:
+        return self.windows[api.pk].percentile(api.hedge_percentile)
+
+    # 헤지 요청의 개수, 예산, 동시 요청 수 제한의 슬롯을 모두 받았을 때만 헤지
+    def allow(self, api: "Api", limiter: Optional["ConcurrencyLimiter"]) -> bool:
+        if not self.hedges.acquire(blocking=False):
+            return False
+        if self.budgets[api.pk].withdraw(api.hedge_budget / 100) and (
+            limiter is None or limiter.try_acquire()
+        ):
+            return True
+        self.hedges.release()
+        return False
+
+    # 헤지 요청이 끝나면 개수를 반환하고, 슬롯은 응답의 본문이 끝날 때 반환
+    def finish_hedge(self, limiter: Optional["ConcurrencyLimiter"], response=None):
+        self.hedges.release()
+        if limiter is None:
+            return
+        if response is None:
+            limiter.release_slot()
+        else:
+            on_body_end(response, limiter.release_slot)
+
+    def hedge(
+        self, send: Callable[[], object], limiter: Optional["ConcurrencyLimiter"]
+    ):
+        def run():
+            try:
+                response = send()
+            except BaseException:
+                self.finish_hedge(limiter)
+                raise
+            self.finish_hedge(limiter, response)
+            return response
+
+        return run
+
+    def async_hedge(
+        self, send: Callable[[], Awaitable], limiter: Optional["ConcurrencyLimiter"]
+    ):
+        async def run():
+            try:
+                response = await send()
+            except BaseException:
+                self.finish_hedge(limiter)
+                raise
+            self.finish_hedge(limiter, response)
+            return response
+
+        return run
+
+    # 스레드가 남아있을 때만 첫번째 요청을 스레드 풀에서 보냄
+    def submit_primary(self, send: Callable[[], object]) -> Optional[Future]:
+        if not self.primaries.acquire(blocking=False):
+            return None
+
+        def run():
+            try:
+                return send()
+            finally:
+                self.primaries.release()
+
+        return self.executor.submit(run)
+
+    # 이긴 요청의 응답 시간만 기록하면 백분위수가 점점 작아져 헤지가 늘어나므로
+    # 헤지 여부와 무관하게 첫번째 요청의 응답 시간을 기록
+    def observe(self, api: "Api", started: float):
+        def callback(future):
+            if not future.cancelled() and future.exception() is None:
+                self.windows[api.pk].add(self.clock() - started)
+
+        return callback
+
+    def send(
+        self,
+        api: "Api",
+        send: Callable[[], object],
+        limiter: Optional["ConcurrencyLimiter"] = None,
+    ):
+        self.budgets[api.pk].deposit()
+        started = self.clock()
+        delay = self.delay(api)
+        primary = None if delay is None else self.submit_primary(send)
+        if primary is None:
+            response = send()
+            self.windows[api.pk].add(self.clock() - started)
+            return response
+        primary.add_done_callback(self.observe(api, started))
+        futures = {primary}
+        done, _ = wait(futures, timeout=delay)
+        if not done and self.allow(api, limiter):
+            futures.add(self.executor.submit(self.hedge(send, limiter)))
+        error: Optional[BaseException] = None
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # 함께 도착했거나 늦게 도착한 응답은 헤더를 받는 대로 닫아서
+                    # 본문을 읽지 않고 커넥션과 슬롯을 반환
+                    for loser in (done - {future}) | futures:
+                        loser.add_done_callback(discard_result)
+                    return future.result()
+                error = error or future.exception()
+        raise error  # type:ignore
+
+    async def async_send(
+        self,
+        api: "Api",
+        send: Callable[[], Awaitable],
+        limiter: Optional["ConcurrencyLimiter"] = None,
+    ):
+        self.budgets[api.pk].deposit()
+        started = self.clock()
+        delay = self.delay(api)
+        if delay is None:
+            response = await send()
+            self.windows[api.pk].add(self.clock() - started)
+            return response
+        primary = asyncio.ensure_future(send())
+        primary.add_done_callback(self.observe(api, started))
+        tasks = {primary}
+        won = False
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and self.allow(api, limiter):
+                tasks.add(asyncio.ensure_future(self.async_hedge(send, limiter)()))
+            error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        won = True
+                        # 함께 도착한 응답은 버림
+                        for loser in done - {task}:
+                            discard_result(loser)
+                        return task.result()
+                    error = error or task.exception()
+            raise error  # type:ignore
+        finally:
+            # 헤지 요청이 이겨서 첫번째 요청을 취소하면 지금까지 걸린 시간을 최소값으로 기록
+            if won and not primary.done():
+                self.windows[api.pk].add(self.clock() - started)
+            # 먼저 온 응답을 사용하면 나머지 요청은 취소
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+
+def discard_result(future: Future | asyncio.Future):
+    if not future.cancelled() and future.exception() is None:
+        discard_response(future.result())
+
+
+hedger = Hedger()
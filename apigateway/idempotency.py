@@ -0,0 +1,331 @@
+import os
+import time
+import uuid
+import zlib
+import struct
+import asyncio
+import hashlib
+from threading import Lock, Thread
+from typing import Optional
+
+import httpx
+import requests
+from django.conf import settings
+
+from base.caches import cache
+from base.consts import DAY
+from base.exceptions import ConflictException, IdempotencyKeyReusedException
+from base.wrappers import MockRequest
+
+from .streams import (
+    RequestBodyStream,
+    body_hasher,
+    get_content_length,
+    should_stream_body,
+)
+
+VERSION = 1
+COMPRESSED = 1
+# 버전, 플래그, 상태코드, 본문 지문, 헤더 수
+HEADER = struct.Struct("!BBH16sH")
+FIELD = struct.Struct("!HH")
+
+
+# 저장해둔 응답, to_http_response에서 업스트림의 응답과 같이 다룰 수 있음
+class StoredResponse:
+    def __init__(
+        self, status_code: int, headers: dict[str, str], content: bytes, fingerprint: bytes
+    ):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.fingerprint = fingerprint
+
+    def close(self):
+        pass
+
+    # 응답 전체를 피클링하지 않고 상태코드, 일부 헤더, 본문만 저장
+    # 본문이 기준보다 크면 압축해서 저장
+    def dumps(self) -> bytes:
+        headers = [
+            (name.encode("latin-1"), value.encode("latin-1"))
+            for name, value in self.headers.items()
+        ]
+        flags = 0
+        content = self.content
+        threshold = getattr(settings, "IDEMPOTENCY_COMPRESS_THRESHOLD", 1024)
+        if threshold <= len(content):
+            compressed = zlib.compress(content)
+            if len(compressed) < len(content):
+                flags |= COMPRESSED
+                content = compressed
+        parts = [
+            HEADER.pack(VERSION, flags, self.status_code, self.fingerprint, len(headers))
+        ]
+        for name, value in headers:
+            parts.append(FIELD.pack(len(name), len(value)))
+            parts.append(name)
+            parts.append(value)
+        parts.append(content)
+        return b"".join(parts)
+
+    @classmethod
+    def loads(cls, data: bytes) -> Optional["StoredResponse"]:
+        version, flags, status_code, fingerprint, count = HEADER.unpack_from(data)
+        # 형식이 바뀌기 전에 저장된 응답은 없는 것으로 취급
+        if version != VERSION:
+            return None
+        offset = HEADER.size
+        headers = {}
+        for _ in range(count):
+            name_length, value_length = FIELD.unpack_from(data, offset)
+            offset += FIELD.size
+            name = data[offset : offset + name_length].decode("latin-1")
+            offset += name_length
+            headers[name] = data[offset : offset + value_length].decode("latin-1")
+            offset += value_length
+        content = data[offset:]
+        if flags & COMPRESSED:
+            content = zlib.decompress(content)
+        return cls(status_code, headers, content, fingerprint)
+
+
+def get_idempotent_key(request: MockRequest) -> Optional[str]:
+    key = request.headers.get("Idempotency-Key", None)
+    if not key:
+        return None
+    user = request.headers.get("Authorization", "Anon")
+    content_type = request.headers.get("Content-Type", "application/json")
+    string = f"{user}:{request.get_full_path()}:{request.method}:{content_type}:{key}"
+    return "idempotency:" + hashlib.blake2b(string.encode("utf-8")).hexdigest()
+
+
+# 같은 키로 다른 본문을 보냈는지 확인하기 위한 원본 본문의 해시
+# 스트리밍으로 보낸 본문은 보내면서 계산한 해시를 사용
+def get_fingerprint(request: MockRequest) -> bytes:
+    fingerprint: Optional[bytes] = getattr(request, "body_fingerprint", None)
+    if fingerprint is not None:
+        return fingerprint
+    stream: Optional[RequestBodyStream] = getattr(request, "body_stream", None)
+    if stream is None and should_stream_body(request):
+        stream = RequestBodyStream(request, get_content_length(request))
+    if stream is not None:
+        # 업스트림에 보내지 않았거나 보내다가 실패했다면 남은 본문을 마저 읽음
+        for _ in stream:
+            pass
+        fingerprint = stream.digest()
+    else:
+        hasher = body_hasher()
+        hasher.update(request.body)
+        fingerprint = hasher.digest()
+    request.body_fingerprint = fingerprint
+    return fingerprint
+
+
+# 메모리에 올리는 본문은 drf가 파싱하기 전에 지문을 만들어 둠
+# 스트리밍으로 보낼 본문은 업스트림에 보내면서 지문을 만듦
+def prepare_fingerprint(request: MockRequest):
+    if not should_stream_body(request):
+        get_fingerprint(request)
+
+
+# 아직 읽지 않은 응답의 본문을 max_body를 넘지 않을 때까지만 읽음
+# 넘으면 읽은 부분과 나머지 본문을 partial_content에 남겨두고 응답을 만들 때 이어서 스트리밍
+def read_content(
+    response: requests.Response | httpx.Response, max_body: int
+) -> Optional[bytes]:
+    if not isinstance(response, requests.Response) or response._content_consumed:
+        content = response.content
+        return content if len(content) <= max_body else None
+    chunk_size = getattr(settings, "STREAM_CHUNK_SIZE", 64 * 1024)
+    chunks = response.iter_content(min(chunk_size, max_body + 1))
+    buffered: list[bytes] = []
+    size = 0
+    for chunk in chunks:
+        buffered.append(chunk)
+        size += len(chunk)
+        if max_body < size:
+            response.partial_content = (b"".join(buffered), chunks)
+            return None
+    response._content = b"".join(buffered)
+    return response._content
+
+
+# 응답을 저장할 수 있으면 StoredResponse로 변환
+# 5xx는 다시 시도할 수 있도록, 너무 큰 본문은 캐시를 차지하지 않도록 저장하지 않음
+def to_stored_response(
+    response: requests.Response | httpx.Response, fingerprint: bytes
+) -> Optional[StoredResponse]:
+    if 500 <= response.status_code:
+        return None
+    max_body = getattr(settings, "IDEMPOTENCY_MAX_BODY", 1024 * 1024)
+    length = response.headers.get("Content-Length")
+    if length is not None and length.isdigit() and max_body < int(length):
+        return None
+    content = read_content(response, max_body)
+    if content is None:
+        return None
+    names = getattr(settings, "IDEMPOTENCY_HEADERS", ("Content-Type", "Location", "ETag"))
+    headers = {name: response.headers[name] for name in names if name in response.headers}
+    return StoredResponse(response.status_code, headers, content, fingerprint)
+
+
+def replay(data: bytes, request: MockRequest) -> Optional[StoredResponse]:
+    stored = StoredResponse.loads(data)
+    if stored is None:
+        return None
+    if stored.fingerprint != get_fingerprint(request):
+        raise IdempotencyKeyReusedException
+    print("hit idemp")
+    return stored
+
+
+# 잠금을 가진 요청이 처리중인 동안 lease의 1/3마다 잠금의 유효기간을 늘리는 스레드
+# 재시도와 헤지로 요청이 lease보다 오래 걸려도 기다리던 요청이 잠금을 가져가 다시 보내지 않음
+# 워커가 죽으면 갱신도 멈추므로 lease가 지나면 잠금이 풀림
+class LeaseRenewer:
+    def __init__(self, store: "IdempotencyStore"):
+        self.store = store
+        self._lock = Lock()
+        self.pid: Optional[int] = None
+        self.leases: dict[str, str] = {}
+
+    # fork된 워커마다 스레드를 새로 만듦
+    def start(self):
+        pid = os.getpid()
+        if self.pid == pid:
+            return
+        with self._lock:
+            if self.pid == pid:
+                return
+            Thread(target=self.run, name="idempotency-lease", daemon=True).start()
+            self.pid = pid
+
+    def add(self, key: str, token: str):
+        self.start()
+        with self._lock:
+            self.leases[key] = token
+
+    def remove(self, key: str, token: str):
+        with self._lock:
+            if self.leases.get(key) == token:
+                del self.leases[key]
+
+    def renew_all(self):
+        with self._lock:
+            leases = list(self.leases.items())
+        for key, token in leases:
+            try:
+                if not self.store.renew(key, token):
+                    print("idempotency lease lost", key)
+                    self.remove(key, token)
+            except Exception as e:
+                print("idempotency lease renew failed", e)
+
+    def run(self):
+        while True:
+            time.sleep(self.store.lease / 3)
+            self.renew_all()
+
+
+# 같은 키의 요청은 하나만 업스트림으로 보냄
+# 잠금은 SET NX와 짧은 유효기간으로 잡아서 워커가 죽더라도 잠금이 남지 않음
+# 처리중인 요청이 있으면 응답이 저장되거나 잠금이 풀릴때까지 간격을 늘려가며 기다림
+class IdempotencyStore:
+    def __init__(self):
+        self.renewer = LeaseRenewer(self)
+
+    @property
+    def lease(self) -> int:
+        return getattr(settings, "IDEMPOTENCY_LEASE", 30)
+
+    @property
+    def wait_timeout(self) -> float:
+        return getattr(settings, "IDEMPOTENCY_WAIT_TIMEOUT", 10)
+
+    @property
+    def ttl(self) -> int:
+        return getattr(settings, "IDEMPOTENCY_TTL", 15 * DAY)
+
+    def conflict(self):
+        return ConflictException(detail={"duplicated": ["이미 처리중인 요청입니다."]})
+
+    # 저장된 응답이나 잠금의 토큰을 반환
+    def begin(self, key: str, request: MockRequest) -> tuple[Optional[StoredResponse], str]:
+        prepare_fingerprint(request)
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+        interval = 0.05
+        while True:
+            data = cache.get(key)
+            if data is not None:
+                stored = replay(data, request)
+                if stored is not None:
+                    return stored, ""
+            if cache.add(f"{key}:lock", token, timeout=self.lease):
+                self.renewer.add(key, token)
+                # 잠금을 얻기 직전에 저장된 응답이 있는지 다시 확인
+                data = cache.get(key)
+                if data is not None and (stored := replay(data, request)):
+                    self.release(key, token)
+                    return stored, ""
+                return None, token
+            if deadline <= time.monotonic():
+                raise self.conflict()
+            time.sleep(interval)
+            interval = min(interval * 2, 0.5)
+
+    def save(self, key: str, request: MockRequest, response) -> None:
+        stored = to_stored_response(response, get_fingerprint(request))
+        if stored is not None:
+            cache.set(key, stored.dumps(), timeout=self.ttl)
+
+    # 유효기간이 지나 다른 요청이 가져간 잠금은 풀지 않음
+    def release(self, key: str, token: str):
+        self.renewer.remove(key, token)
+        if cache.get(f"{key}:lock") == token:
+            cache.delete(f"{key}:lock")
+
+    # 아직 이 요청의 잠금이면 유효기간을 lease만큼 늘림
+    def renew(self, key: str, token: str) -> bool:
+        if cache.get(f"{key}:lock") != token:
+            return False
+        return cache.touch(f"{key}:lock", timeout=self.lease)
+
+    async def async_begin(
+        self, key: str, request: MockRequest
+    ) -> tuple[Optional[StoredResponse], str]:
+        prepare_fingerprint(request)
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+        interval = 0.05
+        while True:
+            data = await cache.aget(key)
+            if data is not None:
+                stored = replay(data, request)
+                if stored is not None:
+                    return stored, ""
+            if await cache.aadd(f"{key}:lock", token, timeout=self.lease):
+                self.renewer.add(key, token)
+                data = await cache.aget(key)
+                if data is not None and (stored := replay(data, request)):
+                    await self.async_release(key, token)
+                    return stored, ""
+                return None, token
+            if deadline <= time.monotonic():
+                raise self.conflict()
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, 0.5)
+
+    async def async_save(self, key: str, request: MockRequest, response) -> None:
+        stored = to_stored_response(response, get_fingerprint(request))
+        if stored is not None:
+            await cache.aset(key, stored.dumps(), timeout=self.ttl)
+
+    async def async_release(self, key: str, token: str):
+        self.renewer.remove(key, token)
+        if await cache.aget(f"{key}:lock") == token:
+            await cache.adelete(f"{key}:lock")
+
+
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,64 @@
+import math
+import time
+from threading import Lock
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+
+from .connections import connections
+
+if TYPE_CHECKING:
+    from .nodes import Node
+
+
+# 노드의 응답 시간에 대한 지수 가중 이동 평균
+# 평균보다 느린 응답은 바로 반영하고(peak), 빠른 응답은 시간이 지남에 따라 천천히 반영
+class PeakEwma:
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.updated_at = time.monotonic()
+
+    def observe(self, rtt: float, decay: float):
+        now = time.monotonic()
+        if self.rtt < rtt:
+            self.rtt = rtt
+        else:
+            weight = math.exp(-(now - self.updated_at) / decay)
+            self.rtt = self.rtt * weight + rtt * (1 - weight)
+        self.updated_at = now
+
+
+# 워커 메모리에 노드별 응답 시간을 기록
+class LatencyTracker:
+    def __init__(self):
+        self._lock = Lock()
+        self._ewmas: dict[str, PeakEwma] = {}
+
+    @property
+    def decay(self) -> float:
+        return getattr(settings, "PEAK_EWMA_DECAY", 10)
+
+    @property
+    def default_rtt(self) -> float:
+        # 응답 시간이 기록되지 않은 노드의 응답 시간(초)
+        return getattr(settings, "PEAK_EWMA_DEFAULT_RTT", 0.1)
+
+    def observe(self, node: "Node", rtt: float):
+        key = node.node_key
+        with self._lock:
+            ewma = self._ewmas.get(key)
+            if ewma is None:
+                self._ewmas[key] = PeakEwma(rtt)
+            else:
+                ewma.observe(rtt, self.decay)
+
+    def rtt(self, node: "Node") -> float:
+        ewma = self._ewmas.get(node.node_key)
+        return self.default_rtt if ewma is None else ewma.rtt
+
+    # 응답 시간과 처리중인 요청 수를 곱한 값, 작을수록 빠르게 응답할 것으로 예상
+    def cost(self, node: "Node") -> float:
+        return self.rtt(node) * (connections.get(node) + 1)
+
+
+latencies = LatencyTracker()
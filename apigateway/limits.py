@@ -0,0 +1,237 @@
+import math
+import time
+import asyncio
+from collections import deque
+from threading import Event, Lock
+from typing import TYPE_CHECKING, Optional
+
+from django.conf import settings
+from django.db import models
+
+from base.exceptions import OverloadedException
+
+from .metrics import metrics
+
+if TYPE_CHECKING:
+    from .nodes import LoadBalancer
+
+
+class LimiterType(models.TextChoices):
+    NONE = "none"  # 동시 요청 수를 제한하지 않음
+    STATIC = "static"  # concurrency_limit으로 고정
+    AIMD = "aimd"  # 성공하면 조금씩 늘리고 실패하거나 느려지면 크게 줄임
+    GRADIENT = "gradient"  # 최소 응답 시간 대비 최근 응답 시간의 비율로 조절
+
+
+# 대기열에서 슬롯을 기다리는 요청
+# 동기 요청은 Event로, 비동기 요청은 이벤트 루프의 Future로 깨움
+class Waiter:
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.granted = False
+        self.loop = loop
+        self.event = Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+
+    def grant(self):
+        self.granted = True
+        if self.event is not None:
+            self.event.set()
+        elif self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.wake)
+
+    def wake(self):
+        if self.future is not None and not self.future.done():
+            self.future.set_result(True)
+
+
+# 업스트림별 동시 요청 수 제한과 대기열
+# 제한에 걸린 요청은 queue_size까지 queue_timeout동안 기다리고
+# 대기열이 가득 찼거나 기다려도 슬롯을 받지 못하면 바로 503을 반환
+class ConcurrencyLimiter:
+    def __init__(self, upstream: "LoadBalancer"):
+        self._lock = Lock()
+        self.signature = self.get_signature(upstream)
+        self.kind = upstream.concurrency_limiter
+        self.max_limit = max(upstream.concurrency_limit, 1)
+        self.min_limit = min(getattr(settings, "LIMITER_MIN_LIMIT", 1), self.max_limit)
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self.waiters: deque[Waiter] = deque()
+        # gradient에서 사용하는 최소 응답 시간과 최근 응답 시간의 이동 평균
+        self.min_rtt: Optional[float] = None
+        self.recent_rtt: Optional[float] = None
+        self.samples = 0
+
+    @staticmethod
+    def get_signature(upstream: "LoadBalancer"):
+        return (upstream.concurrency_limiter, upstream.concurrency_limit)
+
+    def retry_after(self, upstream: "LoadBalancer") -> int:
+        return getattr(
+            settings,
+            "LIMITER_RETRY_AFTER",
+            max(math.ceil(upstream.queue_timeout / 1000), 1),
+        )
+
+    def reject(self, upstream: "LoadBalancer"):
+        metrics.incr(f"limiter:{upstream.pk}:rejected")
+        raise OverloadedException(wait=self.retry_after(upstream))
+
+    # 슬롯을 바로 받거나, 대기열에 들어갈 Waiter를 반환
+    def enqueue(
+        self, upstream: "LoadBalancer", loop: Optional[asyncio.AbstractEventLoop]
+    ) -> Optional[Waiter]:
+        with self._lock:
+            if not self.waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return None
+            if upstream.queue_size <= len(self.waiters) or not upstream.queue_timeout:
+                self.reject(upstream)
+            waiter = Waiter(loop)
+            self.waiters.append(waiter)
+            return waiter
+
+    # 기다리는 동안 슬롯을 받지 못했다면 대기열에서 빼고 거절
+    # 타임아웃과 동시에 슬롯을 받았다면 그대로 사용
+    def give_up(self, upstream: "LoadBalancer", waiter: Waiter):
+        with self._lock:
+            if waiter.granted:
+                return
+            self.waiters.remove(waiter)
+            self.reject(upstream)
+
+    # 기다리던 요청이 취소되면 대기열에서 빼고, 이미 슬롯을 받았다면 다음 요청에게 넘겨줌
+    def cancel(self, waiter: Waiter):
+        with self._lock:
+            if not waiter.granted:
+                self.waiters.remove(waiter)
+                return
+            self.in_flight = max(self.in_flight - 1, 0)
+            self.grant_waiters()
+
+    def acquire(self, upstream: "LoadBalancer"):
+        waiter = self.enqueue(upstream, None)
+        if waiter is None or waiter.event is None:
+            return
+        try:
+            waiter.event.wait(upstream.queue_timeout / 1000)
+        except BaseException:
+            self.cancel(waiter)
+            raise
+        self.give_up(upstream, waiter)
+
+    async def async_acquire(self, upstream: "LoadBalancer"):
+        waiter = self.enqueue(upstream, asyncio.get_running_loop())
+        if waiter is None or waiter.future is None:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(waiter.future), upstream.queue_timeout / 1000
+            )
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            # 클라이언트가 연결을 끊는 등으로 취소되면 슬롯을 받지 않은 채로 끝냄
+            self.cancel(waiter)
+            raise
+        self.give_up(upstream, waiter)
+
+    # 요청이 끝나면 응답 시간과 성공 여부로 제한을 조절하고 기다리던 요청에게 슬롯을 넘겨줌
+    def release(self, upstream: "LoadBalancer", rtt: float, ok: bool):
+        with self._lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+            if self.kind == LimiterType.AIMD:
+                self.aimd(upstream, rtt, ok)
+            elif self.kind == LimiterType.GRADIENT:
+                self.gradient(rtt, ok)
+            self.grant_waiters()
+
+    # 기다리지 않고 남은 슬롯이 있을 때만 받음, 헤지 요청에서 사용
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.waiters or int(self.limit) <= self.in_flight:
+                return False
+            self.in_flight += 1
+            return True
+
+    # 응답 시간으로 제한을 조절하지 않고 슬롯만 돌려줌
+    def release_slot(self):
+        with self._lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+            self.grant_waiters()
+
+    # 잠금을 가진 상태에서 호출
+    def grant_waiters(self):
+        while self.waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            self.waiters.popleft().grant()
+
+    def clamp(self, limit: float):
+        self.limit = min(max(limit, self.min_limit), self.max_limit)
+
+    # 실패했거나 기준보다 느린 응답이면 제한을 줄이고, 아니면 제한마다 1씩 늘림
+    def aimd(self, upstream: "LoadBalancer", rtt: float, ok: bool):
+        threshold = upstream.timeout * getattr(settings, "LIMITER_AIMD_SLOW_RATIO", 0.5)
+        if not ok or threshold < rtt:
+            self.clamp(self.limit * getattr(settings, "LIMITER_AIMD_BACKOFF", 0.9))
+        elif int(self.limit) <= self.in_flight + 1:
+            # 제한까지 요청이 차 있을 때만 늘려서 사용하지 않는 제한이 커지지 않게 함
+            self.clamp(self.limit + 1 / self.limit)
+
+    # 최소 응답 시간 대비 최근 응답 시간이 늘어나면(대기열이 생기면) 그 비율만큼 제한을 줄임
+    def gradient(self, rtt: float, ok: bool):
+        if not ok:
+            self.clamp(self.limit * 0.9)
+            return
+        self.samples += 1
+        if self.recent_rtt is None:
+            self.recent_rtt = rtt
+        else:
+            self.recent_rtt = self.recent_rtt * 0.9 + rtt * 0.1
+        # 업스트림의 상태가 바뀔 수 있으므로 최소 응답 시간은 천천히 잊어버림
+        if self.min_rtt is None or rtt < self.min_rtt:
+            self.min_rtt = rtt
+        elif self.samples % getattr(settings, "LIMITER_GRADIENT_RESET", 1000) == 0:
+            self.min_rtt = self.recent_rtt
+        gradient = max(0.5, min(1.0, self.min_rtt / max(self.recent_rtt, 1e-6)))
+        headroom = math.sqrt(self.limit)
+        self.clamp(self.limit * 0.8 + (self.limit * gradient + headroom) * 0.2)
+
+
+class ConcurrencyLimiters:
+    def __init__(self):
+        self._lock = Lock()
+        self._limiters: dict[int, ConcurrencyLimiter] = {}
+
+    # 설정이 바뀐 업스트림은 새 limiter를 사용
+    def get(self, upstream: "LoadBalancer") -> Optional[ConcurrencyLimiter]:
+        if upstream.concurrency_limiter == LimiterType.NONE:
+            return None
+        limiter = self._limiters.get(upstream.pk)
+        signature = ConcurrencyLimiter.get_signature(upstream)
+        if limiter is None or limiter.signature != signature:
+            with self._lock:
+                limiter = self._limiters.get(upstream.pk)
+                if limiter is None or limiter.signature != signature:
+                    limiter = ConcurrencyLimiter(upstream)
+                    self._limiters[upstream.pk] = limiter
+            metrics.start()
+        return limiter
+
+    def items(self):
+        with self._lock:
+            return list(self._limiters.items())
+
+
+limiters = ConcurrencyLimiters()
+
+
+# 워커별로 현재값을 기록하고 조회할 때 살아있는 워커들의 값을 합침
+@metrics.gauge
+def collect_limiter_stats() -> dict[str, int]:
+    result = {}
+    for pk, limiter in limiters.items():
+        result[f"limiter:{pk}:limit"] = int(limiter.limit)
+        result[f"limiter:{pk}:in_flight"] = limiter.in_flight
+        result[f"limiter:{pk}:queued"] = len(limiter.waiters)
+    return result
@@ -0,0 +1,124 @@
+import os
+import time
+from collections import defaultdict
+from threading import Lock, Thread
+from typing import Callable, Iterable, Optional
+
+from django.conf import settings
+
+from base.caches import cache
+
+from .workers import WorkerValues
+
+Collector = Callable[[], dict[str, int]]
+
+
+# 요청마다 redis를 호출하지 않도록 워커 메모리에서 카운터를 누적하고
+# 주기적으로 증가분만 캐시에 더해 모든 워커의 합계를 만듦
+class Metrics:
+    prefix = "metrics"
+
+    def __init__(self):
+        self._lock = Lock()
+        self._counters: defaultdict[str, int] = defaultdict(int)
+        # 누적값을 반환하는 수집기들과 마지막으로 캐시에 반영한 누적값
+        self._collectors: list[Collector] = []
+        self._collected: dict[str, int] = {}
+        # 현재값을 반환하는 수집기들, 합계에 더하지 않고 워커별로 기록
+        self._gauges: list[Collector] = []
+        self.workers = WorkerValues(f"{self.prefix}:gauges")
+        self.pid: Optional[int] = None
+        self._flusher: Optional["MetricsFlusher"] = None
+
+    def key(self, name: str):
+        return f"{self.prefix}:{name}"
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] += value
+        self.start()
+
+    # 누적값을 직접 들고 있는 객체(커넥션 풀 등)의 값을 flush 시점에 읽어옴
+    def collector(self, func: Collector):
+        with self._lock:
+            self._collectors.append(func)
+        return func
+
+    # 처리중인 요청 수처럼 늘고 줄어드는 현재값
+    # 워커가 죽으면 그 워커의 값은 ttl이 지난 뒤에 합계에서 빠짐
+    def gauge(self, func: Collector):
+        with self._lock:
+            self._gauges.append(func)
+        return func
+
+    def collect_gauges(self) -> dict[str, int]:
+        with self._lock:
+            gauges = list(self._gauges)
+        values: dict[str, int] = {}
+        for gauge in gauges:
+            values.update(gauge())
+        return values
+
+    def collect(self) -> dict[str, int]:
+        with self._lock:
+            deltas = dict(self._counters)
+            self._counters.clear()
+            collectors = list(self._collectors)
+        for collector in collectors:
+            for name, total in collector().items():
+                delta = total - self._collected.get(name, 0)
+                self._collected[name] = total
+                deltas[name] = deltas.get(name, 0) + delta
+        return deltas
+
+    def flush(self):
+        for name, delta in self.collect().items():
+            if not delta:
+                continue
+            key = self.key(name)
+            cache.add(key, 0, timeout=None)
+            cache.incr(key, delta)
+        if self._gauges:
+            interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 10)
+            self.workers.publish(self.collect_gauges(), interval * 3)
+
+    # 모든 워커에서 합산된 값을 반환
+    def get(self, names: Iterable[str]) -> dict[str, int]:
+        names = list(names)
+        values = cache.get_many([self.key(name) for name in names])
+        return {name: values.get(self.key(name), 0) for name in names}
+
+    # 살아있는 모든 워커의 현재값의 합
+    def get_gauges(self, names: Iterable[str]) -> dict[str, int]:
+        totals = self.workers.total()
+        return {name: totals.get(name, 0) for name in names}
+
+    # 워커를 fork하는 서버에서도 워커마다 flusher를 시작
+    def start(self):
+        pid = os.getpid()
+        if self.pid == pid:
+            return
+        with self._lock:
+            if self.pid == pid:
+                return
+            self._flusher = MetricsFlusher(self)
+            self._flusher.start()
+            self.pid = pid
+
+
+class MetricsFlusher(Thread):
+    def __init__(self, metrics: Metrics):
+        super().__init__(name="metrics-flusher", daemon=True)
+        self.metrics = metrics
+        self.interval: float = getattr(settings, "METRICS_FLUSH_INTERVAL", 10)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.metrics.flush()
+            except Exception as e:
+                print("metrics flush error", e)
+
+
+metrics = Metrics()
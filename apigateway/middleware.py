@@ -0,0 +1,134 @@
+import time
+import asyncio
+import json
+from threading import Lock
+from typing import Optional
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+
+from .metrics import metrics
+from .models import ApiPriority
+from .routes import route_table
+
+# 우선순위별로 요청을 거절하기 시작하는 과부하 정도(1이면 최대치)
+SHED_THRESHOLDS = {
+    ApiPriority.BEST_EFFORT: 0.6,
+    ApiPriority.NORMAL: 0.85,
+    ApiPriority.CRITICAL: 1.0,
+}
+
+
+# 워커의 과부하 정도를 측정하여 우선순위가 낮은 요청부터 거절
+# 인증이나 본문 파싱보다 먼저 수행되므로 거절하는 비용이 거의 없음
+class LoadShedder:
+    def __init__(self):
+        self._lock = Lock()
+        self.in_flight = 0
+        self.loop_lag = 0.0
+        self._monitor: Optional[asyncio.Task] = None
+
+    @property
+    def max_in_flight(self) -> int:
+        return getattr(settings, "SHED_MAX_IN_FLIGHT", 200)
+
+    @property
+    def max_loop_lag(self) -> float:
+        return getattr(settings, "SHED_MAX_LOOP_LAG", 0.5)
+
+    # 처리중인 요청 수와 이벤트 루프 지연 중 큰 쪽의 비율
+    def overload(self) -> float:
+        levels = [self.in_flight / max(self.max_in_flight, 1)]
+        if self.max_loop_lag:
+            levels.append(self.loop_lag / self.max_loop_lag)
+        return max(levels)
+
+    def priority(self, path: str) -> Optional[str]:
+        # 관리자 페이지는 과부하 상황에서도 사용할 수 있어야 함
+        if path.startswith("/gateway/"):
+            return None
+        # 라우트 테이블이 아직 없다면 만들지 않고 보통 우선순위로 처리
+        trie = route_table.current
+        api = trie.match(path) if trie else None
+        return api.priority if api else ApiPriority.NORMAL
+
+    def should_shed(self, path: str) -> bool:
+        priority = self.priority(path)
+        if priority is None:
+            return False
+        if self.overload() < SHED_THRESHOLDS.get(priority, 1.0):
+            return False
+        metrics.incr(f"shed:{priority}")
+        return True
+
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    # 이벤트 루프가 정해진 시간보다 얼마나 늦게 깨어나는지로 지연을 측정
+    def start_monitor(self):
+        if self._monitor is not None and not self._monitor.done():
+            return
+        loop = asyncio.get_running_loop()
+        self._monitor = loop.create_task(self.monitor())
+
+    async def monitor(self):
+        interval = getattr(settings, "SHED_LOOP_LAG_INTERVAL", 0.1)
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(interval)
+            lag = time.monotonic() - started - interval
+            # 일시적인 지연에 흔들리지 않도록 이동 평균을 사용
+            self.loop_lag = self.loop_lag * 0.7 + max(lag, 0) * 0.3
+
+
+shedder = LoadShedder()
+
+
+def shed_response():
+    retry_after = getattr(settings, "SHED_RETRY_AFTER", 1)
+    response = HttpResponse(
+        json.dumps(
+            {"overloaded": ["요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도해 주세요."]},
+            ensure_ascii=False,
+        ),
+        status=503,
+        content_type="application/json",
+    )
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+@sync_and_async_middleware
+def LoadShedding(get_response):
+    if asyncio.iscoroutinefunction(get_response):
+
+        async def async_middleware(request):
+            shedder.start_monitor()
+            if shedder.should_shed(request.path_info):
+                return shed_response()
+            shedder.enter()
+            try:
+                return await get_response(request)
+            finally:
+                shedder.exit()
+
+        function = async_middleware
+    else:
+
+        def middleware(request):
+            if shedder.should_shed(request.path_info):
+                return shed_response()
+            shedder.enter()
+            try:
+                return get_response(request)
+            finally:
+                shedder.exit()
+
+        function = middleware
+    return function
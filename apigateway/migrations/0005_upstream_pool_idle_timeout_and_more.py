@@ -0,0 +1,28 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apigateway', '0004_remove_target_port_remove_upstream_port'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upstream',
+            name='pool_idle_timeout',
+            field=models.PositiveIntegerField(default=60, help_text='이 시간(초)동안 사용되지 않은 커넥션은 새로 맺음, 0이면 제한 없음'),
+        ),
+        migrations.AddField(
+            model_name='upstream',
+            name='pool_max_requests',
+            field=models.PositiveIntegerField(default=0, help_text='이 횟수만큼 요청을 보낸 커넥션 풀은 새로 맺음, 0이면 제한 없음'),
+        ),
+        migrations.AddField(
+            model_name='upstream',
+            name='pool_size',
+            field=models.PositiveIntegerField(default=10, help_text='타겟마다 유지할 최대 커넥션 수'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apigateway', '0005_upstream_pool_idle_timeout_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='api',
+            name='stream_response',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apigateway', '0006_api_stream_response'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='api',
+            name='passthrough',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apigateway', '0007_api_passthrough'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='api',
+            name='max_body_size',
+            field=models.PositiveBigIntegerField(blank=True, help_text='요청 본문의 최대 크기(byte), 비어있으면 제한 없음', null=True),
+        ),
+    ]
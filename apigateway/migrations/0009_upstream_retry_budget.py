@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apigateway', '0008_api_max_body_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upstream',
+            name='retry_budget',
+            field=models.PositiveIntegerField(default=10, help_text='최근 요청 수 대비 허용할 재시도의 비율(%)'),
+        ),
+    ]
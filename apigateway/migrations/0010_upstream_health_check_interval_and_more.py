@@ -0,0 +1,33 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apigateway', '0009_upstream_retry_budget'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upstream',
+            name='health_check_interval',
+            field=models.PositiveIntegerField(default=10),
+        ),
+        migrations.AddField(
+            model_name='upstream',
+            name='health_check_path',
+            field=models.CharField(blank=True, default='', help_text='비어있으면 헬스체크를 하지 않음 ex) /health', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='upstream',
+            name='healthy_threshold',
+            field=models.PositiveIntegerField(default=2, help_text='연속으로 이 횟수만큼 성공하면 다시 분산 대상에 포함'),
+        ),
+        migrations.AddField(
+            model_name='upstream',
+            name='unhealthy_threshold',
+            field=models.PositiveIntegerField(default=3, help_text='연속으로 이 횟수만큼 실패하면 분산 대상에서 제외'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apigateway', '0010_upstream_health_check_interval_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upstream',
+            name='outlier_consecutive_failures',
+            field=models.PositiveIntegerField(default=5, help_text='연속으로 이 횟수만큼 실패한 타겟을 제외, 0이면 사용하지 않음'),
+        ),
+        migrations.AddField(
+            model_name='upstream',
+            name='outlier_ejection_time',
+            field=models.PositiveIntegerField(default=30, help_text='처음 제외되는 시간(초), 연속으로 제외될 때마다 두배로 늘어남'),
+        ),
+        migrations.AddField(
+            model_name='upstream',
+            name='outlier_error_rate',
+            field=models.PositiveIntegerField(default=50, help_text='최근 요청의 실패 비율(%)이 이 값 이상인 타겟을 제외, 0이면 사용하지 않음'),
+        ),
+        migrations.AddField(
+            model_name='upstream',
+            name='outlier_max_ejection_time',
+            field=models.PositiveIntegerField(default=300, help_text='최대 제외 시간(초)'),
+        ),
+        migrations.AddField(
+            model_name='upstream',
+            name='outlier_min_requests',
+            field=models.PositiveIntegerField(default=20, help_text='실패 비율을 계산하기 위한 최소 요청 수'),
+        ),
+    ]
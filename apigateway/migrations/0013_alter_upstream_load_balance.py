@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apigateway', '0012_alter_upstream_load_balance'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='upstream',
+            name='load_balance',
+            field=models.CharField(choices=[('round_robin', 'Round Robin'), ('weight_robin', 'Weight Robin'), ('least_connections', 'Least Connections'), ('peak_ewma', 'Peak Ewma')], default='round_robin', max_length=64),
+        ),
+    ]
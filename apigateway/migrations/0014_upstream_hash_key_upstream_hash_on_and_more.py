@@ -0,0 +1,28 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apigateway', '0013_alter_upstream_load_balance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upstream',
+            name='hash_key',
+            field=models.CharField(blank=True, default='', help_text='hash_on이 header, cookie일때 사용할 이름', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='upstream',
+            name='hash_on',
+            field=models.CharField(choices=[('ip', 'Ip'), ('user', 'User'), ('header', 'Header'), ('cookie', 'Cookie')], default='ip', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='upstream',
+            name='load_balance',
+            field=models.CharField(choices=[('round_robin', 'Round Robin'), ('weight_robin', 'Weight Robin'), ('least_connections', 'Least Connections'), ('peak_ewma', 'Peak Ewma'), ('consistent_hash', 'Consistent Hash')], default='round_robin', max_length=64),
+        ),
+    ]
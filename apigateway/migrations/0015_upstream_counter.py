@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apigateway', '0014_upstream_hash_key_upstream_hash_on_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upstream',
+            name='counter',
+            field=models.CharField(choices=[('local', 'Local'), ('leased', 'Leased'), ('global', 'Global')], default='local', help_text='로드밸런싱에 사용할 요청 번호를 발급하는 방식', max_length=64),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apigateway', '0015_upstream_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='target',
+            name='enabled_at',
+            field=models.DateTimeField(blank=True, help_text='마지막으로 활성화된 시각, slow_start의 기준', null=True),
+        ),
+        migrations.AddField(
+            model_name='upstream',
+            name='slow_start',
+            field=models.PositiveIntegerField(default=0, help_text='이 시간(초)동안 가중치를 서서히 늘림, 0이면 사용하지 않음'),
+        ),
+        migrations.AddField(
+            model_name='upstream',
+            name='slow_start_curve',
+            field=models.CharField(choices=[('linear', 'Linear'), ('exponential', 'Exponential')], default='linear', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='upstream',
+            name='slow_start_min_weight',
+            field=models.PositiveIntegerField(default=10, help_text='slow_start를 시작할 때의 가중치 비율(%)'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apigateway', '0016_target_enabled_at_upstream_slow_start_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upstream',
+            name='concurrency_limit',
+            field=models.PositiveIntegerField(default=100, help_text='워커마다 허용할 최대 동시 요청 수, aimd와 gradient에서는 상한'),
+        ),
+        migrations.AddField(
+            model_name='upstream',
+            name='concurrency_limiter',
+            field=models.CharField(choices=[('none', 'None'), ('static', 'Static'), ('aimd', 'Aimd'), ('gradient', 'Gradient')], default='none', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='upstream',
+            name='queue_size',
+            field=models.PositiveIntegerField(default=50, help_text='제한에 걸린 요청이 기다릴 수 있는 대기열의 크기'),
+        ),
+        migrations.AddField(
+            model_name='upstream',
+            name='queue_timeout',
+            field=models.PositiveIntegerField(default=1000, help_text='대기열에서 기다릴 최대 시간(ms), 0이면 기다리지 않고 거절'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apigateway', '0017_upstream_concurrency_limit_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='api',
+            name='priority',
+            field=models.CharField(choices=[('critical', 'Critical'), ('normal', 'Normal'), ('best_effort', 'Best Effort')], default='normal', max_length=64),
+        ),
+    ]
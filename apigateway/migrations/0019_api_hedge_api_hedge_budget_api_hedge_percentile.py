@@ -0,0 +1,28 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apigateway', '0018_api_priority'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='api',
+            name='hedge',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='api',
+            name='hedge_budget',
+            field=models.PositiveIntegerField(default=5, help_text='요청 수 대비 추가로 보낼 수 있는 헤지 요청의 비율(%)'),
+        ),
+        migrations.AddField(
+            model_name='api',
+            name='hedge_percentile',
+            field=models.PositiveIntegerField(default=95, help_text='최근 응답 시간의 이 백분위수만큼 기다린 뒤에 헤지 요청을 보냄'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apigateway', '0019_api_hedge_api_hedge_budget_api_hedge_percentile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='api',
+            name='rate_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='라우트 전체의 초당 요청 수, 비어있으면 제한 없음', null=True),
+        ),
+        migrations.AddField(
+            model_name='api',
+            name='rate_limit_burst',
+            field=models.PositiveIntegerField(blank=True, help_text='한번에 허용하는 최대 요청 수, 비어있으면 초당 요청 수와 같음', null=True),
+        ),
+        migrations.AddField(
+            model_name='consumer',
+            name='rate_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='apikey로 보낸 요청의 초당 요청 수, 비어있으면 기본값을 사용', null=True),
+        ),
+        migrations.AddField(
+            model_name='consumer',
+            name='rate_limit_burst',
+            field=models.PositiveIntegerField(blank=True, help_text='한번에 허용하는 최대 요청 수, 비어있으면 초당 요청 수와 같음', null=True),
+        ),
+    ]
@@ -1,18 +1,24 @@
 # import requests_unixsocket
 import json
+import httpx
 import requests
-from typing import Any, Callable, Self, Type
 
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils.html import format_html
 from django.urls import reverse_lazy
 
-from base.caches import UseSingleCache
+from base.exceptions import PayloadTooLargeException
 from base.wrappers import MockRequest
 
+from .breakers import describe as describe_breaker
+from .health import describe as describe_health
+from .metrics import metrics
 from .nodes import ChildNode, LoadBalancer
 from .plugins import PluginChoices, PluginMixin
+from .streams import RequestBodyStream, get_content_length, should_stream_body
 
 
 class User(AbstractUser):
@@ -32,11 +38,23 @@ class User(AbstractUser):
         return self.__getitem__(key, default)
 
 
+# Idempotency-Key가 있는 요청은 멱등하지 않은 메서드여도 재시도 할 수 있음
+def is_idempotent(request: MockRequest):
+    return "Idempotency-Key" in request.headers
+
+
 class ApiType(models.TextChoices):
     NORMAL = "일반"
     ADMIN = "관리자"
 
 
+# 과부하 상황에서 우선순위가 낮은 api의 요청부터 거절
+class ApiPriority(models.TextChoices):
+    CRITICAL = "critical"
+    NORMAL = "normal"
+    BEST_EFFORT = "best_effort"
+
+
 # 로드밸런싱을 수행 할 실제 모델
 class Upstream(LoadBalancer):
     alias = models.CharField(max_length=64, default="", unique=True)
@@ -67,6 +85,30 @@ class Upstream(LoadBalancer):
 
     total_weight.fget.short_description = "Total Weight"
 
+    # 모든 워커에서 합산된 커넥션 풀 재사용(hit)/신규 연결(miss) 횟수
+    @property
+    def pool_stats(self):
+        paths = {node.full_path for node in [self, *self.targets.all()]}
+        hits = metrics.get(f"pool:{path}:hits" for path in paths)
+        misses = metrics.get(f"pool:{path}:misses" for path in paths)
+        return f"hits {sum(hits.values())} / misses {sum(misses.values())}"
+
+    pool_stats.fget.short_description = "Connection Pool"
+
+    # 모든 워커에서 합산된 동시 요청 수 제한, 처리중, 대기중인 요청 수와 거절된 요청 수
+    @property
+    def limiter_stats(self):
+        names = ("limit", "in_flight", "queued", "rejected")
+        values = {
+            **metrics.get_gauges(f"limiter:{self.pk}:{name}" for name in names[:3]),
+            **metrics.get([f"limiter:{self.pk}:rejected"]),
+        }
+        return " / ".join(
+            f"{name} {values[f'limiter:{self.pk}:{name}']}" for name in names
+        )
+
+    limiter_stats.fget.short_description = "Concurrency Limiter"
+
     def to_string(self):
         return self.host
 
@@ -89,6 +131,16 @@ class Target(ChildNode):
             text,
         )
 
+    # 어드민에 보여줄 헬스체크 상태
+    @property
+    def health(self):
+        return describe_health(self, self.upstream)
+
+    # 어드민에 보여줄 서킷 브레이커 상태
+    @property
+    def breaker(self):
+        return describe_breaker(self)
+
     def to_string(self):
         return self.host
 
@@ -99,22 +151,38 @@ class Target(ChildNode):
 
 # api 라우팅을 하는 모델
 class Api(PluginMixin, models.Model):
-    cache: UseSingleCache[Type[Self]] = UseSingleCache(0, "api")
-
     name = models.CharField(max_length=128)
     request_path = models.CharField(max_length=255)  # 요청받을 주소 /users
     wrapped_path = models.CharField(max_length=255)  # 라우팅할 주소 /auth/users
     upstream = models.ForeignKey(
         Upstream, on_delete=models.CASCADE, related_name="api_set"
     )
-
-    method_map: dict[str, Callable[..., requests.Response]] = {
-        "get": requests.get,
-        "post": requests.post,
-        "put": requests.put,
-        "patch": requests.patch,
-        "delete": requests.delete,
-    }
+    upstream_id: int
+    # 응답을 메모리에 모으지 않고 받는 대로 클라이언트에게 전달
+    stream_response = models.BooleanField(default=False)
+    # 요청 본문을 파싱하지 않고 받은 그대로 전달
+    passthrough = models.BooleanField(default=False)
+    max_body_size = models.PositiveBigIntegerField(
+        null=True, blank=True, help_text="요청 본문의 최대 크기(byte), 비어있으면 제한 없음"
+    )
+    priority = models.CharField(
+        max_length=64, default=ApiPriority.NORMAL, choices=ApiPriority.choices
+    )
+    # 모든 클라이언트의 요청을 합쳐서 제한
+    rate_limit = models.PositiveIntegerField(
+        null=True, blank=True, help_text="라우트 전체의 초당 요청 수, 비어있으면 제한 없음"
+    )
+    rate_limit_burst = models.PositiveIntegerField(
+        null=True, blank=True, help_text="한번에 허용하는 최대 요청 수, 비어있으면 초당 요청 수와 같음"
+    )
+    # 응답이 늦으면 다른 타겟으로 한번 더 요청을 보냄(GET 요청에만 적용)
+    hedge = models.BooleanField(default=False)
+    hedge_percentile = models.PositiveIntegerField(
+        default=95, help_text="최근 응답 시간의 이 백분위수만큼 기다린 뒤에 헤지 요청을 보냄"
+    )
+    hedge_budget = models.PositiveIntegerField(
+        default=5, help_text="요청 수 대비 추가로 보낼 수 있는 헤지 요청의 비율(%)"
+    )
 
     def get_trailing_path(self, request: MockRequest):
         """
@@ -142,10 +210,20 @@ class Api(PluginMixin, models.Model):
         authorization = request.META.get("HTTP_AUTHORIZATION")
         if authorization != None:
             headers["Authorization"] = authorization
-        if request.content_type and request.content_type.lower() == "application/json":
+        if self.passthrough or should_stream_body(request):
+            # 본문을 그대로 넘기므로 boundary등을 포함한 Content-Type도 그대로 넘김
+            content_type = request.META.get("CONTENT_TYPE")
+            if content_type:
+                headers["Content-Type"] = content_type
+        elif request.content_type and request.content_type.lower() == "application/json":
             headers["Content-Type"] = request.content_type
         return headers
 
+    # 라우트별 본문 크기 제한을 넘는 요청은 본문을 읽기 전에 거절
+    def check_body_size(self, request: MockRequest):
+        if self.max_body_size and self.max_body_size < get_content_length(request):
+            raise PayloadTooLargeException
+
     # drf에서 file안의 객체들이 data로도 카피되는 것을 다시 되돌려줌
     def process_data(self, request: MockRequest):
         if request.FILES is not None and isinstance(request.FILES, dict):
@@ -158,36 +236,91 @@ class Api(PluginMixin, models.Model):
             data = request.data
         return data
 
+    # 비동기 게이트웨이는 응답을 스트리밍하지 못하므로 스트리밍 설정을 막음
+    def clean(self):
+        super().clean()
+        if self.stream_response and getattr(settings, "GATEWAY_ASYNC", False):
+            raise ValidationError(
+                {"stream_response": "GATEWAY_ASYNC 배포에서는 응답을 스트리밍할 수 없습니다"}
+            )
+
+    # 응답 전체를 메모리에 읽지 않고 스트리밍으로 전달할지 결정
+    # api에 설정되어 있거나, 크기를 알 수 없거나, 기준 크기보다 큰 응답을 스트리밍
+    def should_stream_response(self, resp: requests.Response | httpx.Response):
+        if self.stream_response:
+            return True
+        threshold = getattr(settings, "STREAM_RESPONSE_THRESHOLD", 1024 * 1024)
+        if not threshold:
+            return False
+        # 잘못되거나 중복된 Content-Length는 크기를 알 수 없는 것으로 취급
+        length = resp.headers.get("Content-Length")
+        if length is None or not length.isdigit():
+            return True
+        return threshold < int(length)
+
     # 디버깅용으로 에러가 발생 시 에러 내용을 출력해줌
-    def show_errors(self, resp: requests.Response):
+    def show_errors(self, resp: requests.Response | httpx.Response):
         if resp.status_code in [400, 404, 409]:
             try:
                 print(resp.json())
             except:
                 pass
 
-    # 리퀘스트 객체들을 수정하여 실제 요청을 보내고 받음
-    def send_request(self, request: MockRequest):
+    # 리퀘스트 객체들을 수정하여 업스트림에 넘길 인자들을 만듦
+    def prepare_request(self, request: MockRequest):
         trailing_path = self.get_trailing_path(request)
         method = self.get_method(request)
         headers = self.process_headers(request)
+        if should_stream_body(request):
+            # 큰 본문은 메모리에 올리지 않고 클라이언트에게서 읽는 대로 전달
+            length = get_content_length(request)
+            headers["Content-Length"] = str(length)
+            body = RequestBodyStream(request, length)
+            # 멱등성 저장소에서 전송하면서 계산된 본문의 지문을 사용
+            request.body_stream = body
+            return trailing_path, method, headers, body, None
+        if self.passthrough:
+            # drf의 파싱과 재직렬화를 거치지 않은 원본 본문
+            return trailing_path, method, headers, request.body, None
         data = self.process_data(request)
+        return trailing_path, method, headers, data, request.FILES
+
+    # 리퀘스트 객체들을 수정하여 실제 요청을 보내고 받음
+    def send_request(self, request: MockRequest):
         resp = self.upstream.send_request(
-            self, trailing_path, method, headers, data, request.FILES
+            self,
+            *self.prepare_request(request),
+            idempotent=is_idempotent(request),
+            hash_key=self.upstream.get_hash_key(request),
         )
         self.show_errors(resp)
         return resp
 
-    # api가 수정 될 시 업스트림에 연결된 모든 api캐시들을 퍼지
+    # send_request의 비동기 버전
+    async def async_send_request(self, request: MockRequest):
+        resp = await self.upstream.async_send_request(
+            self,
+            *self.prepare_request(request),
+            idempotent=is_idempotent(request),
+            hash_key=self.upstream.get_hash_key(request),
+        )
+        self.show_errors(resp)
+        return resp
+
+    # api가 수정 될 시 라우트 테이블을 다시 만듦
     def save(self, *args, **kwargs):
+        from .routes import invalidate_routes
+
         instance = super().save(*args, **kwargs)
-        self.cache.purge_by_regex(path="*", upstream=self.upstream.pk)
+        invalidate_routes()
         return instance
 
-    # api가 삭제 될 시 업스트림에 연결된 모든 api캐시들을 퍼지
+    # api가 삭제 될 시 라우트 테이블을 다시 만듦
     def delete(self, *args, **kwargs) -> tuple[int, dict[str, int]]:
-        self.cache.purge_by_regex(path="*", upstream=self.upstream.pk)
+        from .routes import invalidate_routes
+
         deleted = super().delete(*args, **kwargs)
+        invalidate_routes()
         return deleted
 
     def __unicode__(self):
@@ -199,13 +332,11 @@ class Api(PluginMixin, models.Model):
     def get(self, __name: str):
         return self.__getattribute__(__name)
 
+    # 처리중인 요청 수는 업스트림의 send_request에서 시도마다 타겟별로 기록
     def __enter__(self):
-        # con = self.upstream.incr_conn()
-        # print(f"{self.upstream} conn count", con)
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        # con = self.upstream.decr_conn()
         return
 
 
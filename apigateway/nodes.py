@@ -1,15 +1,34 @@
+import time
+import httpx
+import asyncio
 import requests
-from itertools import accumulate
-from random import randint
-from typing import TYPE_CHECKING, TypeVar, Callable
+from functools import cached_property
+from random import sample
+from typing import TYPE_CHECKING, Optional, Sequence, TypeVar
 
 from django.db import models
+from django.utils import timezone
 
 from base.consts import SCHEME_DELIMETER
 from base.exceptions import TimeoutException
-from base.caches import cache, UseSingleCache
+
+from . import slowstart
+from .breakers import breakers
+from .connections import connections
+from .counters import CounterType, counters
+from .hashing import HashRing
+from .health import health_checker
+from .hedging import hedger
+from .latency import latencies
+from .limits import ConcurrencyLimiter, LimiterType, limiters
+from .pools import async_pools, pools
+from .retries import Retry, rewind
+from .streams import RequestBodyStream, discard_response, on_body_end
+from .weights import WeightedSequence
 
 if TYPE_CHECKING:
+    from base.wrappers import MockRequest
+
     from .models import Api
 
 
@@ -21,6 +40,17 @@ class SchemeType(models.TextChoices):
 class LoadBalancingType(models.TextChoices):
     ROUND_ROBIN = "round_robin"
     WEIGHT_ROBIN = "weight_robin"
+    LEAST_CONNECTIONS = "least_connections"
+    PEAK_EWMA = "peak_ewma"
+    CONSISTENT_HASH = "consistent_hash"
+
+
+# consistent_hash에서 같은 노드로 보낼 요청을 구분하는 값
+class HashOnType(models.TextChoices):
+    IP = "ip"  # 클라이언트 ip
+    USER = "user"  # jwt 토큰의 user_id
+    HEADER = "header"  # hash_key에 지정한 헤더
+    COOKIE = "cookie"  # hash_key에 지정한 쿠키
 
 
 """
@@ -29,32 +59,38 @@ class LoadBalancingType(models.TextChoices):
 """
 
 
-# 연결중인 커넥션의 수를 컨트롤하는 믹스인 클래스
-class ServerConnectionRecord:
-    pk: int
+# requests의 data, files 인자를 httpx의 인자로 변환
+def httpx_body(data=None, files=None) -> dict:
+    body = {}
+    if isinstance(data, (str, bytes)):
+        body["content"] = data
+    elif isinstance(data, RequestBodyStream):
+        # 이터러블을 그대로 넘기면 동기 스트림으로 취급되므로 비동기 이터레이터로 넘김
+        body["content"] = aiter(data)
+    elif data:
+        body["data"] = data
+    if files:
+        body["files"] = files
+    return body
 
-    @property
-    def conn_key(self):
-        return f"upstream:{self.pk}-connection"
+
+# 노드별로 처리중인 요청의 수를 컨트롤하는 믹스인 클래스
+class ServerConnectionRecord:
+    node_key: str
 
     def get_conn(self):
-        return cache.get(self.conn_key, 0)
+        return connections.get(self)
 
     def incr_conn(self):
-        # 현재 업스트림에 연결된 커넥션 수를 증가시킵니다
-        cache.add(self.conn_key, 0)
-        return cache.incr(self.conn_key, 1)
+        # 현재 노드에서 처리중인 요청 수를 증가시킵니다
+        return connections.incr(self)
 
     def decr_conn(self):
-        # 현재 업스트림에 연결된 커넥션 수를 감소시킵니다
-        try:
-            cache.add(self.conn_key, 1)
-            return cache.decr(self.conn_key, 1)
-        except:
-            return 0
+        # 현재 노드에서 처리중인 요청 수를 감소시킵니다
+        return connections.decr(self)
 
 
-class Node(models.Model):
+class Node(ServerConnectionRecord, models.Model):
     class Meta:
         abstract = True
 
@@ -70,18 +106,25 @@ class Node(models.Model):
     def full_path(self):
         return f"{self.scheme}{SCHEME_DELIMETER}{self.host}"  # 해당 노드의 전체 url
 
+    # 업스트림과 타겟의 pk가 겹치지 않도록 모델 이름을 포함한 식별자
+    @property
+    def node_key(self):
+        return f"{self._meta.model_name}:{self.pk}"
+
     def save(self, *args, **kwargs) -> None:
+        from .routes import invalidate_routes
+
         res = super().save(*args, **kwargs)
-        single_cache = UseSingleCache(0, "api")
-        # 해당 모델에 변경이 가해지면 해당 업스트림에 연결된 모든 api 캐시를 삭제
-        single_cache.purge_by_regex(upstream=self.pk, path="*")
+        # 해당 모델에 변경이 가해지면 라우트 테이블을 다시 만듦
+        invalidate_routes()
         return res
 
     def delete(self, *args, **kwargs):
+        from .routes import invalidate_routes
+
         result = super().delete(*args, **kwargs)
-        single_cache = UseSingleCache(0, "api")
-        # 해당 모델에 변경이 가해지면 해당 업스트림에 연결된 모든 api 캐시를 삭제
-        single_cache.purge_by_regex(upstream=self.pk, path="*")
+        # 해당 모델에 변경이 가해지면 라우트 테이블을 다시 만듦
+        invalidate_routes()
         return result
 
 
@@ -91,6 +134,27 @@ class ChildNode(Node):
         abstract = True
 
     enabled = models.BooleanField("활성화", default=True)
+    enabled_at = models.DateTimeField(
+        null=True, blank=True, help_text="마지막으로 활성화된 시각, slow_start의 기준"
+    )
+
+    # 새로 추가되었거나 비활성화 상태에서 활성화되는 노드는 활성화된 시각을 기록
+    def save(self, *args, **kwargs) -> None:
+        if self.enabled:
+            previous = (
+                type(self)
+                .objects.filter(pk=self.pk)
+                .values_list("enabled", flat=True)
+                .first()
+                if self.pk
+                else None
+            )
+            if not previous:
+                self.enabled_at = timezone.now()
+                update_fields = kwargs.get("update_fields")
+                if update_fields is not None:
+                    kwargs["update_fields"] = {*update_fields, "enabled_at"}
+        return super().save(*args, **kwargs)
 
 
 TNode = TypeVar("TNode", bound=Node)
@@ -98,7 +162,7 @@ TCNode = TypeVar("TCNode", bound=ChildNode)
 
 
 # 실제 로드밸런싱을 수행하는 로직을 담은 베이스 클래스
-class LoadBalancer(ServerConnectionRecord, Node):
+class LoadBalancer(Node):
     class Meta:
         abstract = True
 
@@ -108,70 +172,288 @@ class LoadBalancer(ServerConnectionRecord, Node):
         choices=LoadBalancingType.choices,
     )
 
+    hash_on = models.CharField(
+        max_length=64, default=HashOnType.IP, choices=HashOnType.choices
+    )
+    hash_key = models.CharField(
+        max_length=255, blank=True, default="", help_text="hash_on이 header, cookie일때 사용할 이름"
+    )
+
+    counter = models.CharField(
+        max_length=64,
+        default=CounterType.LOCAL,
+        choices=CounterType.choices,
+        help_text="로드밸런싱에 사용할 요청 번호를 발급하는 방식",
+    )
+
     retries = models.PositiveIntegerField(default=0)
     timeout = models.PositiveIntegerField(default=10)
+    retry_budget = models.PositiveIntegerField(
+        default=10, help_text="최근 요청 수 대비 허용할 재시도의 비율(%)"
+    )
 
-    targets: models.Manager["TCNode"]  # type:ignore
+    # 액티브 헬스체크 설정
+    health_check_path = models.CharField(
+        max_length=255, blank=True, default="", help_text="비어있으면 헬스체크를 하지 않음 ex) /health"
+    )
+    health_check_interval = models.PositiveIntegerField(default=10)  # 초
+    healthy_threshold = models.PositiveIntegerField(
+        default=2, help_text="연속으로 이 횟수만큼 성공하면 다시 분산 대상에 포함"
+    )
+    unhealthy_threshold = models.PositiveIntegerField(
+        default=3, help_text="연속으로 이 횟수만큼 실패하면 분산 대상에서 제외"
+    )
+
+    # 프록시 요청의 결과로 타겟을 제외하는 서킷 브레이커 설정
+    outlier_consecutive_failures = models.PositiveIntegerField(
+        default=5, help_text="연속으로 이 횟수만큼 실패한 타겟을 제외, 0이면 사용하지 않음"
+    )
+    outlier_error_rate = models.PositiveIntegerField(
+        default=50, help_text="최근 요청의 실패 비율(%)이 이 값 이상인 타겟을 제외, 0이면 사용하지 않음"
+    )
+    outlier_min_requests = models.PositiveIntegerField(
+        default=20, help_text="실패 비율을 계산하기 위한 최소 요청 수"
+    )
+    outlier_ejection_time = models.PositiveIntegerField(
+        default=30, help_text="처음 제외되는 시간(초), 연속으로 제외될 때마다 두배로 늘어남"
+    )
+    outlier_max_ejection_time = models.PositiveIntegerField(
+        default=300, help_text="최대 제외 시간(초)"
+    )
 
-    method_map: dict[str, Callable[..., requests.Response]] = {
-        "get": requests.get,
-        "post": requests.post,
-        "put": requests.put,
-        "patch": requests.patch,
-        "delete": requests.delete,
-    }
+    # 업스트림으로 보내는 동시 요청 수 제한과 대기열 설정
+    concurrency_limiter = models.CharField(
+        max_length=64, default=LimiterType.NONE, choices=LimiterType.choices
+    )
+    concurrency_limit = models.PositiveIntegerField(
+        default=100, help_text="워커마다 허용할 최대 동시 요청 수, aimd와 gradient에서는 상한"
+    )
+    queue_size = models.PositiveIntegerField(
+        default=50, help_text="제한에 걸린 요청이 기다릴 수 있는 대기열의 크기"
+    )
+    queue_timeout = models.PositiveIntegerField(
+        default=1000, help_text="대기열에서 기다릴 최대 시간(ms), 0이면 기다리지 않고 거절"
+    )
+
+    # 활성화되거나 복구된 타겟의 가중치를 서서히 늘리는 설정
+    slow_start = models.PositiveIntegerField(
+        default=0, help_text="이 시간(초)동안 가중치를 서서히 늘림, 0이면 사용하지 않음"
+    )
+    slow_start_curve = models.CharField(
+        max_length=64,
+        default=slowstart.SlowStartCurve.LINEAR,
+        choices=slowstart.SlowStartCurve.choices,
+    )
+    slow_start_min_weight = models.PositiveIntegerField(
+        default=10, help_text="slow_start를 시작할 때의 가중치 비율(%)"
+    )
+
+    # 타겟별 keep-alive 커넥션 풀 설정
+    pool_size = models.PositiveIntegerField(
+        default=10, help_text="타겟마다 유지할 최대 커넥션 수"
+    )
+    pool_idle_timeout = models.PositiveIntegerField(
+        default=60, help_text="이 시간(초)동안 사용되지 않은 커넥션은 새로 맺음, 0이면 제한 없음"
+    )
+    pool_max_requests = models.PositiveIntegerField(
+        default=0, help_text="이 횟수만큼 요청을 보낸 커넥션 풀은 새로 맺음, 0이면 제한 없음"
+    )
+
+    targets: models.Manager["TCNode"]  # type:ignore
 
     @property
     def req_key(self):
         return f"upstream:{self.pk}-called"
 
     # round_robin을 수행하기위해 현재 node가 불린 횟수를 기록
+    # counter 설정에 따라 워커의 메모리나 redis에서 번호를 받음
     def call(self):
-        cache.add(self.req_key, 0)
-        return cache.incr(self.req_key, 1)
+        return counters.next(self)
 
     # 모든 노드들을 순차적으로 반환
-    def round_robin(
-        self, req_count: int, targets: list["TNode"], target_count: int
-    ) -> Node:
+    # nodes는 분산 대상 후보(업스트림 자신은 포함된다면 항상 마지막), target_count는 그 중 타겟의 수
+    def round_robin(self, req_count: int, nodes: list[Node], target_count: int) -> Node:
         cur_idx = req_count % target_count + 1
-        return [*targets, self][cur_idx - 1]
-
-    # 모든 노드들의 가중치를 누적하고 [50, 100, 250, 300] - > [50, 150, 400, 700]
-    # 0~최대 누적값 사이의 랜덤숫자를 생성해 해당 범위에 포함되는 노드를 반환
-    def weight_round(
-        self, req_count: int, targets: list["TNode"], target_count: int
+        return nodes[cur_idx - 1]
+
+    # 업스트림 자신을 포함한 활성화된 노드들의 가중치로 미리 계산한 선택 순서
+    # 라우트 테이블을 만들 때 미리 계산되고, 타겟이 바뀌면 라우트 테이블과 함께 다시 만들어짐
+    @cached_property
+    def weighted(self) -> WeightedSequence[Node]:
+        targets = [x for x in self.targets.all() if x.enabled]
+        return WeightedSequence([*targets, self])
+
+    # 가중치 [100, 300, 200]의 노드들은 한 주기(6번) 동안 1, 3, 2번씩 고르게 섞여서 선택됨
+    # 헬스체크등으로 제외된 노드의 순서는 다음 노드가 대신 받음
+    def weight_round(self, req_count: int, nodes: list[Node], target_count: int) -> Node:
+        allowed = {x.node_key for x in nodes}
+        node = self.weighted.get(req_count, lambda x: x.node_key in allowed)
+        if node is None:
+            # 모든 노드의 가중치가 0이라면 순서대로 선택
+            return self.round_robin(req_count, nodes, target_count)
+        return node
+
+    # 처리중인 요청 수를 가중치로 나눈 값이 가장 작은 노드를 반환
+    # 값이 같은 노드들 사이에서는 요청 순서대로 돌아가며 선택
+    def least_connections(
+        self, req_count: int, nodes: list[Node], target_count: int
     ) -> Node:
-        max = sum(map(lambda x: x.weight, targets))
-        accs = accumulate(map(lambda x: x.weight, targets))
-        zipped = list(zip(accs, targets))
-
-        rand = randint(0, max)
-
-        def find(node: tuple[int, Node]):
-            weight = node[0]
-            return rand < weight
-
-        node = next(filter(find, zipped), (0, self))
-        return node[1]
+        loads = connections.load(nodes)
+        scores = [(load + 1) / (node.weight or 1) for node, load in zip(nodes, loads)]
+        lowest = min(scores)
+        candidates = [node for node, score in zip(nodes, scores) if score == lowest]
+        return candidates[req_count % len(candidates)]
+
+    # 노드 두개를 무작위로 골라 응답 시간과 처리중인 요청 수로 계산한 비용이 작은 노드를 반환
+    # 모든 노드를 비교하지 않으므로 노드 수와 무관하게 일정한 비용으로 선택
+    def peak_ewma(self, req_count: int, nodes: list[Node], target_count: int) -> Node:
+        if len(nodes) < 2:
+            return nodes[0]
+        first, second = sample(nodes, 2)
+        if latencies.cost(second) < latencies.cost(first):
+            return second
+        return first
+
+    # 활성화된 노드들로 만든 해시 링
+    # 라우트 테이블을 만들 때 미리 계산되고, 타겟이 바뀌면 라우트 테이블과 함께 다시 만들어짐
+    @cached_property
+    def ring(self) -> HashRing[Node]:
+        targets = [x for x in self.targets.all() if x.enabled]
+        return HashRing([*targets, self])
+
+    # 요청에서 해시 링의 키로 사용할 값을 찾음, 값이 없으면 None
+    def get_hash_key(self, request: "MockRequest") -> Optional[str]:
+        if self.load_balance != LoadBalancingType.CONSISTENT_HASH:
+            return None
+        if self.hash_on == HashOnType.USER:
+            token = getattr(request, "auth", None)
+            user_id = getattr(token, "user_id", None)
+            return None if user_id is None else str(user_id)
+        if self.hash_on == HashOnType.HEADER:
+            return request.headers.get(self.hash_key) or None
+        if self.hash_on == HashOnType.COOKIE:
+            return request.COOKIES.get(self.hash_key) or None
+        origin = request.META.get("REMOTE_ADDR", "")
+        origin = origin or request.META.get("HTTP_X_FORWARDED_FOR", "")
+        return origin.split(",")[0].strip() or None
+
+    # 해시 링에서 키에 해당하는 노드를 반환
+    # 제외된 노드는 건너뛰므로 해당 노드의 키만 다음 노드로 옮겨감
+    def consistent_hash(
+        self,
+        hash_key: str,
+        nodes: list[Node],
+        exclude: Sequence[Node] = (),
+    ) -> Optional[Node]:
+        allowed = {x.node_key for x in nodes if x not in exclude}
+        return self.ring.get(hash_key, lambda x: x.node_key in allowed)
 
     # 실제 로드밸런싱을 수행하는 로직
-    def load_balancing(self) -> Node:
+    # exclude에 포함된 노드(재시도 시 이미 실패한 노드)는 다른 노드가 남아있다면 피함
+    # hash_key가 주어지면 consistent_hash로 선택하고, 키가 없는 요청은 round_robin으로 분산
+    def load_balancing(
+        self, exclude: Sequence[Node] = (), hash_key: Optional[str] = None
+    ) -> Node:
         req_count = self.call()
         # 이미 prefetch_related로 쿼리를 해왔기 때문에 filter를 사용하여 다시 쿼리를 발생시키지 않음
         # 활성화 되어있는 타겟 노드들만 반환
         targets = list(filter(lambda x: x.enabled, self.targets.all()))
-        target_count = len(targets)
+        # 헬스체크에 실패했거나 서킷 브레이커가 열린 노드는 업스트림 자신을 포함하여 제외하되
+        # 모두 제외되었다면 활성화된 노드를 모두 사용
+        nodes: list[Node] = [*targets, self]
+        healthy = [
+            x
+            for x in nodes
+            if health_checker.is_healthy(x) and breakers.available(self, x)
+        ]
+        if healthy:
+            nodes = healthy
+        target_count = len([x for x in nodes if x is not self])
         if target_count == 0:
-            return self  # 모든 타겟 노드가 비 활성화 상태 일 시 자신을 반환
+            # 모든 타겟 노드가 비 활성화 상태이거나 제외되었을 때 자신을 반환
+            breakers.acquire(self, self)
+            return self
+        if hash_key is not None:
+            node = self.consistent_hash(hash_key, nodes, exclude)
+            if node is not None:
+                breakers.acquire(self, node)
+                return node
         func = self.round_robin
         if self.load_balance == LoadBalancingType.WEIGHT_ROBIN:
             func = self.weight_round
-        return func(req_count, targets, target_count)
+        elif self.load_balance == LoadBalancingType.LEAST_CONNECTIONS:
+            func = self.least_connections
+        elif self.load_balance == LoadBalancingType.PEAK_EWMA:
+            func = self.peak_ewma
+        node = func(req_count, nodes, target_count)
+        # slow_start 중인 노드가 받지 못한 요청은 slow_start가 끝난 노드들에게 나눠줌
+        if not slowstart.admit(self, node):
+            warm = [x for x in nodes if 1 <= slowstart.factor(self, x)]
+            if warm:
+                node = warm[req_count % len(warm)]
+        if node in exclude:
+            remaining = [x for x in nodes if x not in exclude]
+            if remaining:
+                node = remaining[req_count % len(remaining)]
+        breakers.acquire(self, node)
+        return node
+
+    # 연결 실패, 타임아웃, 5xx 응답을 서킷 브레이커에 실패로 기록하고 응답 시간을 기록
+    # 응답을 받지 못한 요청은 빠르게 실패했더라도 timeout만큼 걸린 것으로 취급
+    def record_outcome(self, node: Node, elapsed: float, status_code: int = 0):
+        breakers.record(self, node, 0 < status_code < 500)
+        latencies.observe(node, elapsed if status_code else max(elapsed, self.timeout))
 
     # API 요청,반환 로직을 수행하는 메서드
-    # retry를 실행하는 메서드
-    def send_request(
+    # 동시 요청 수 제한이 설정되어 있다면 슬롯을 받은 뒤에 요청을 보냄
+    def send_request(self, api: "Api", *args, **kwargs) -> requests.Response:
+        limiter = limiters.get(self)
+        if limiter is None:
+            return self.hedged_request(api, *args, **kwargs)
+        limiter.acquire(self)
+        started = time.monotonic()
+        try:
+            response = self.hedged_request(api, *args, **kwargs)
+        except BaseException:
+            limiter.release(self, time.monotonic() - started, False)
+            raise
+        self.release_on_body_end(limiter, response, started)
+        return response
+
+    # send_request의 비동기 버전
+    async def async_send_request(
+        self, api: "Api", *args, **kwargs
+    ) -> httpx.Response:
+        limiter = limiters.get(self)
+        if limiter is None:
+            return await self.async_hedged_request(api, *args, **kwargs)
+        await limiter.async_acquire(self)
+        started = time.monotonic()
+        try:
+            response = await self.async_hedged_request(api, *args, **kwargs)
+        except BaseException:
+            limiter.release(self, time.monotonic() - started, False)
+            raise
+        self.release_on_body_end(limiter, response, started)
+        return response
+
+    # 스트리밍 응답은 본문을 보내는 동안에도 업스트림을 사용하므로
+    # 슬롯은 본문이 끝날 때 반환하고, 동시 요청 수 제한은 본문까지 걸린 시간으로 조정
+    def release_on_body_end(
+        self,
+        limiter: ConcurrencyLimiter,
+        response: requests.Response | httpx.Response,
+        started: float,
+    ):
+        ok = response.status_code < 500
+        on_body_end(
+            response,
+            lambda: limiter.release(self, time.monotonic() - started, ok),
+        )
+
+    # 헤지가 설정된 api의 GET 요청은 응답이 늦으면 다른 타겟으로 한번 더 보냄
+    # 두 요청이 tried를 공유하므로 같은 타겟을 고르지 않음
+    def hedged_request(
         self,
         api: "Api",
         trailing_path: str,
@@ -179,23 +461,148 @@ class LoadBalancer(ServerConnectionRecord, Node):
         headers=None,
         data=None,
         files=None,
-    ):
-        retries = 0
-
-        def sender(retries=0) -> requests.Response:
-            # timeout되면 504에러를 반환
-            if 0 < retries:
-                raise TimeoutException
+        **kwargs,
+    ) -> requests.Response:
+        args = (api, trailing_path, method, headers, data, files)
+        if not hedger.enabled(api, method, data):
+            return self.forward_request(*args, **kwargs)
+        tried: list[Node] = []
+        return hedger.send(
+            api,
+            lambda: self.forward_request(*args, tried=tried, **kwargs),
+            limiters.get(self),
+        )
+
+    # hedged_request의 비동기 버전
+    async def async_hedged_request(
+        self,
+        api: "Api",
+        trailing_path: str,
+        method: str,
+        headers=None,
+        data=None,
+        files=None,
+        **kwargs,
+    ) -> httpx.Response:
+        args = (api, trailing_path, method, headers, data, files)
+        if not hedger.enabled(api, method, data):
+            return await self.async_forward_request(*args, **kwargs)
+        tried: list[Node] = []
+        return await hedger.async_send(
+            api,
+            lambda: self.async_forward_request(*args, tried=tried, **kwargs),
+            limiters.get(self),
+        )
+
+    # 로드밸런싱으로 고른 노드에 요청을 보냄
+    # 연결 실패나 타임아웃 시 다른 타겟으로 retries번까지 재시도
+    def forward_request(
+        self,
+        api: "Api",
+        trailing_path: str,
+        method: str,
+        headers=None,
+        data=None,
+        files=None,
+        idempotent=False,
+        hash_key: Optional[str] = None,
+        tried: Optional[list[Node]] = None,
+    ) -> requests.Response:
+        retry = Retry(self, method, idempotent, data, hash_key, tried)
+        while True:
+            node = retry.next_node()  # LB로직을 수행하여 나온 노드를 반환
+            # 노드의 전체 url과 랩된 주소, 나머지 주소를 결합하여 실제 요청을 보낼 주소를 반환
+            url = node.full_path + api.wrapped_path + trailing_path
+            print(f"{url=}")
+            # 예외나 타임아웃이 발생해도 처리중인 요청 수가 남지 않도록 finally에서 감소
+            # 응답을 받았다면 본문을 끝까지 보내거나 응답을 닫을 때 감소
+            node.incr_conn()
+            started = time.monotonic()
+            response = None
             try:
-                node = self.load_balancing()  # LB로직을 수행하여 나온 노드를 반환
-                url = node.full_path + api.wrapped_path + trailing_path
-                print(f"{url=}")
-                # 노드의 전체 url과 랩된 주소, 나머지 주소를 결합하여 실제 요청을 보낼 주소를 반환
-                return self.method_map[method](
-                    url, headers=headers, data=data, files=files, timeout=self.timeout
+                # 타겟별로 유지되는 세션을 사용하여 커넥션을 재사용
+                session = pools.get(self, node).session
+                response = session.request(
+                    method,
+                    url,
+                    headers=headers,
+                    data=data,
+                    files=files,
+                    timeout=self.timeout,
+                    stream=True,  # 본문은 응답을 만들 때 필요한 만큼만 읽음
                 )
+                on_body_end(response, node.decr_conn)
+                elapsed = time.monotonic() - started
+                self.record_outcome(node, elapsed, response.status_code)
+                # 접근 로그에 기록할 타겟과 응답 시간
+                response.upstream_target = node.host
+                response.upstream_latency = elapsed
+                return response
             except Exception as e:
                 print("error", e)
-                return sender(retries + 1)
-
-        return sender(retries)
+                # 응답을 받은 뒤에 실패했다면 응답을 버림
+                if response is not None:
+                    discard_response(response)
+                self.record_outcome(node, time.monotonic() - started)
+                # 재시도 할 수 없으면 504에러를 반환
+                if not retry.should_retry(e):
+                    raise TimeoutException
+            finally:
+                if response is None:
+                    node.decr_conn()
+            time.sleep(retry.backoff())
+            rewind(files)
+
+    # forward_request의 비동기 버전
+    # 요청을 기다리는 동안 스레드를 점유하지 않으므로 하나의 워커가 많은 요청을 동시에 처리
+    async def async_forward_request(
+        self,
+        api: "Api",
+        trailing_path: str,
+        method: str,
+        headers=None,
+        data=None,
+        files=None,
+        idempotent=False,
+        hash_key: Optional[str] = None,
+        tried: Optional[list[Node]] = None,
+    ) -> httpx.Response:
+        retry = Retry(self, method, idempotent, data, hash_key, tried)
+        while True:
+            node = retry.next_node()  # LB로직을 수행하여 나온 노드를 반환
+            url = node.full_path + api.wrapped_path + trailing_path
+            print(f"{url=}")
+            node.incr_conn()
+            started = time.monotonic()
+            response = None
+            try:
+                pooled = async_pools.get(self, node)
+                response = await pooled.client.request(
+                    method,
+                    url,
+                    headers=headers,
+                    timeout=self.timeout,
+                    extensions={"trace": pooled.trace},
+                    **httpx_body(data, files),
+                )
+                on_body_end(response, node.decr_conn)
+                elapsed = time.monotonic() - started
+                self.record_outcome(node, elapsed, response.status_code)
+                # 접근 로그에 기록할 타겟과 응답 시간
+                response.upstream_target = node.host
+                response.upstream_latency = elapsed
+                return response
+            except Exception as e:
+                print("error", e)
+                # 응답을 받은 뒤에 실패했다면 응답을 버림
+                if response is not None:
+                    discard_response(response)
+                self.record_outcome(node, time.monotonic() - started)
+                # 재시도 할 수 없으면 504에러를 반환
+                if not retry.should_retry(e):
+                    raise TimeoutException
+            finally:
+                if response is None:
+                    node.decr_conn()
+            await asyncio.sleep(retry.backoff())
+            rewind(files)
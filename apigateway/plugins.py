@@ -17,6 +17,12 @@ class Consumer(models.Model):
     user_id = models.IntegerField()
     identifier = models.CharField(max_length=256, default="")
     apikey = models.CharField(max_length=32)
+    rate_limit = models.PositiveIntegerField(
+        null=True, blank=True, help_text="apikey로 보낸 요청의 초당 요청 수, 비어있으면 기본값을 사용"
+    )
+    rate_limit_burst = models.PositiveIntegerField(
+        null=True, blank=True, help_text="한번에 허용하는 최대 요청 수, 비어있으면 초당 요청 수와 같음"
+    )
 
     def __unicode__(self):
         return self.user_id
@@ -24,6 +30,21 @@ class Consumer(models.Model):
     def __str__(self):
         return f"{self.user_id}"
 
+    # 컨슈머별 요청 제한은 라우트 테이블에 함께 저장되므로 다시 만듦
+    def save(self, *args, **kwargs):
+        from .routes import invalidate_routes
+
+        instance = super().save(*args, **kwargs)
+        invalidate_routes()
+        return instance
+
+    def delete(self, *args, **kwargs) -> tuple[int, dict[str, int]]:
+        from .routes import invalidate_routes
+
+        deleted = super().delete(*args, **kwargs)
+        invalidate_routes()
+        return deleted
+
 
 class PluginChoices(models.IntegerChoices):
     NO_AUTH = 0
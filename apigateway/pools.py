@@ -0,0 +1,197 @@
+import time
+import asyncio
+from abc import ABC, abstractmethod
+import httpx
+import requests
+from threading import Lock
+from typing import TYPE_CHECKING, Generic, Optional, Type, TypeVar
+
+from requests.adapters import HTTPAdapter
+
+from .metrics import metrics
+
+if TYPE_CHECKING:
+    from .nodes import LoadBalancer, Node
+
+
+# 하나의 타겟에 대해 keep-alive 커넥션을 재사용하는 클라이언트의 베이스 클래스
+class PooledConnection(ABC):
+    def __init__(self, upstream: "LoadBalancer"):
+        self.size = upstream.pool_size
+        self.last_used = time.monotonic()
+        self.requests = 0
+
+    # 오래 쉬었거나 정해진 요청 수를 채운 클라이언트는 커넥션을 새로 맺음
+    def expired(self, now: float, upstream: "LoadBalancer"):
+        if self.size != upstream.pool_size:
+            return True
+        idle_timeout = upstream.pool_idle_timeout
+        if idle_timeout and idle_timeout < now - self.last_used:
+            return True
+        max_requests = upstream.pool_max_requests
+        if max_requests and max_requests <= self.requests:
+            return True
+        return False
+
+    # (요청 수, 새로 맺은 커넥션 수)
+    @abstractmethod
+    def stats(self) -> tuple[int, int]:
+        ...
+
+    @abstractmethod
+    def close(self, upstream: "LoadBalancer"):
+        ...
+
+
+class PooledSession(PooledConnection):
+    def __init__(self, upstream: "LoadBalancer"):
+        super().__init__(upstream)
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.size)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+    # urllib3 커넥션 풀에 기록된 값을 사용
+    def stats(self) -> tuple[int, int]:
+        requests_count, connections = 0, 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_count += pool.num_requests
+            connections += pool.num_connections
+        return requests_count, connections
+
+    def close(self, upstream: "LoadBalancer"):
+        self.session.close()
+
+
+class PooledClient(PooledConnection):
+    def __init__(self, upstream: "LoadBalancer"):
+        super().__init__(upstream)
+        # 유휴 커넥션의 만료는 httpx가 커넥션 단위로 처리
+        limits = httpx.Limits(
+            max_connections=self.size,
+            max_keepalive_connections=self.size,
+            keepalive_expiry=upstream.pool_idle_timeout or None,
+        )
+        self.client = httpx.AsyncClient(limits=limits)
+        self.connections = 0
+        # httpx의 커넥션은 만들어진 이벤트 루프에서만 사용할 수 있음
+        self.loop = asyncio.get_running_loop()
+
+    def expired(self, now: float, upstream: "LoadBalancer"):
+        if self.loop is not asyncio.get_running_loop():
+            return True
+        return super().expired(now, upstream)
+
+    # 요청의 trace 확장으로 새 커넥션이 맺어질 때마다 기록
+    async def trace(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            self.connections += 1
+
+    def stats(self) -> tuple[int, int]:
+        return self.requests, self.connections
+
+    # 진행중인 요청이 끝날 수 있도록 업스트림의 timeout이 지난 뒤에 닫음
+    # 다른 루프나 스레드에서 교체되었더라도 클라이언트를 만든 루프에서 닫음
+    def close(self, upstream: "LoadBalancer"):
+        loop = self.loop
+
+        def schedule():
+            loop.call_later(
+                upstream.timeout, lambda: loop.create_task(self.client.aclose())
+            )
+
+        # 루프가 이미 닫혔다면 그 루프의 커넥션도 더 이상 사용할 수 없음
+        if loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(schedule)
+        except RuntimeError:
+            # 확인한 뒤에 루프가 닫힌 경우
+            pass
+
+
+TConnection = TypeVar("TConnection", bound=PooledConnection)
+
+
+# 워커 프로세스마다 타겟별로 클라이언트를 하나씩 유지
+class ConnectionPool(Generic[TConnection]):
+    def __init__(self, connection_class: Type[TConnection]):
+        self.connection_class = connection_class
+        self._lock = Lock()
+        self._connections: dict[str, TConnection] = {}
+        # 교체되어 닫힌 클라이언트들의 누적 통계
+        self._retired: dict[str, tuple[int, int]] = {}
+
+    def get(self, upstream: "LoadBalancer", node: "Node") -> TConnection:
+        key = node.full_path
+        now = time.monotonic()
+        pooled = self._connections.get(key)
+        if pooled is None or pooled.expired(now, upstream):
+            pooled = self.replace(key, pooled, upstream)
+        pooled.requests += 1
+        pooled.last_used = now
+        return pooled
+
+    def replace(
+        self, key: str, old: Optional[TConnection], upstream: "LoadBalancer"
+    ) -> TConnection:
+        with self._lock:
+            current = self._connections.get(key)
+            # 다른 스레드가 먼저 교체했다면 그 클라이언트를 사용
+            if current is not old and current is not None:
+                return current
+            if old is not None:
+                self.retire(key, old, upstream)
+            pooled = self.connection_class(upstream)
+            self._connections[key] = pooled
+        metrics.start()
+        return pooled
+
+    def retire(self, key: str, pooled: TConnection, upstream: "LoadBalancer"):
+        requests_count, connections = pooled.stats()
+        retired_requests, retired_connections = self._retired.get(key, (0, 0))
+        self._retired[key] = (
+            retired_requests + requests_count,
+            retired_connections + connections,
+        )
+        pooled.close(upstream)
+
+    # 타겟별 (요청 수, 새로 맺은 커넥션 수)의 누적값
+    def stats(self) -> dict[str, tuple[int, int]]:
+        with self._lock:
+            connections = list(self._connections.items())
+            totals = dict(self._retired)
+        for key, pooled in connections:
+            requests_count, connection_count = pooled.stats()
+            retired_requests, retired_connections = totals.get(key, (0, 0))
+            totals[key] = (
+                retired_requests + requests_count,
+                retired_connections + connection_count,
+            )
+        return totals
+
+
+pools = ConnectionPool(PooledSession)
+async_pools = ConnectionPool(PooledClient)
+
+
+# 커넥션을 재사용한 요청은 hit, 새로 커넥션을 맺은 요청은 miss
+@metrics.collector
+def collect_pool_stats() -> dict[str, int]:
+    totals: dict[str, tuple[int, int]] = {}
+    for pool in (pools, async_pools):
+        for key, (requests_count, connections) in pool.stats().items():
+            total_requests, total_connections = totals.get(key, (0, 0))
+            totals[key] = (
+                total_requests + requests_count,
+                total_connections + connections,
+            )
+    result = {}
+    for key, (requests_count, connections) in totals.items():
+        result[f"pool:{key}:hits"] = max(requests_count - connections, 0)
+        result[f"pool:{key}:misses"] = connections
+    return result
@@ -0,0 +1,128 @@
+import time
+import httpx
+import random
+import requests
+from collections import defaultdict, deque
+from threading import Lock
+from typing import TYPE_CHECKING, Optional
+
+from django.conf import settings
+
+from .streams import RequestBodyStream
+
+if TYPE_CHECKING:
+    from .nodes import LoadBalancer, Node
+
+# 같은 요청을 여러번 보내도 결과가 같은 메서드
+IDEMPOTENT_METHODS = {"get", "head", "options", "put", "delete"}
+
+# 다른 타겟으로 다시 보내볼 가치가 있는 에러(연결 실패, 타임아웃)
+RETRYABLE_EXCEPTIONS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    httpx.TransportError,
+)
+
+
+# 업스트림별로 최근 window초 동안의 요청 수 대비 재시도 수를 제한
+# 타겟 장애가 재시도 폭주로 번지지 않도록 함
+class RetryBudget:
+    def __init__(self, window: int = 10, min_per_second: Optional[float] = None):
+        self.window = window
+        # 비율과 무관하게 초당 허용할 최소 횟수, None이면 설정값을 사용
+        self.min_per_second = min_per_second
+        self._lock = Lock()
+        # [초, 요청 수, 재시도 수]
+        self._buckets: deque[list[int]] = deque()
+        self.requests = 0
+        self.retries = 0
+
+    def _bucket(self) -> list[int]:
+        second = int(time.monotonic())
+        while self._buckets and self._buckets[0][0] <= second - self.window:
+            _, requests_count, retries = self._buckets.popleft()
+            self.requests -= requests_count
+            self.retries -= retries
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0])
+        return self._buckets[-1]
+
+    def deposit(self):
+        with self._lock:
+            self._bucket()[1] += 1
+            self.requests += 1
+
+    # 비율만큼의 재시도와 초당 최소 재시도 횟수를 허용
+    def withdraw(self, ratio: float) -> bool:
+        min_per_second = self.min_per_second
+        if min_per_second is None:
+            min_per_second = getattr(settings, "RETRY_BUDGET_MIN_PER_SECOND", 1)
+        min_retries = min_per_second * self.window
+        with self._lock:
+            bucket = self._bucket()
+            if min_retries + ratio * self.requests <= self.retries:
+                return False
+            bucket[2] += 1
+            self.retries += 1
+            return True
+
+
+retry_budgets: defaultdict[int, RetryBudget] = defaultdict(RetryBudget)
+
+
+# 하나의 요청에 대한 재시도 상태
+# 이미 시도한 타겟을 기억하여 재시도는 다른 타겟으로 보냄
+class Retry:
+    def __init__(
+        self,
+        upstream: "LoadBalancer",
+        method: str,
+        idempotent: bool,
+        data,
+        hash_key: Optional[str] = None,
+        tried: Optional[list["Node"]] = None,
+    ):
+        self.upstream = upstream
+        self.hash_key = hash_key
+        self.budget = retry_budgets[upstream.pk]
+        self.budget.deposit()
+        # 멱등하지 않은 요청이나 이미 흘려보낸 스트림 본문은 다시 보낼 수 없음
+        self.retryable = (
+            method in IDEMPOTENT_METHODS or idempotent
+        ) and not isinstance(data, RequestBodyStream)
+        self.attempts = 0
+        # 헤지 요청과 공유하면 서로 다른 타겟으로 요청을 보냄
+        self.tried: list["Node"] = [] if tried is None else tried
+
+    def next_node(self) -> "Node":
+        node = self.upstream.load_balancing(
+            exclude=self.tried, hash_key=self.hash_key
+        )
+        self.tried.append(node)
+        return node
+
+    def should_retry(self, exc: Exception) -> bool:
+        if not self.retryable or not isinstance(exc, RETRYABLE_EXCEPTIONS):
+            return False
+        if self.upstream.retries <= self.attempts:
+            return False
+        if not self.budget.withdraw(self.upstream.retry_budget / 100):
+            print("retry budget exhausted", self.upstream)
+            return False
+        self.attempts += 1
+        return True
+
+    # 재시도 간격은 지수적으로 늘리되 전체 지터를 적용하여 재시도가 몰리지 않게 함
+    def backoff(self) -> float:
+        base = getattr(settings, "RETRY_BACKOFF_BASE", 0.05)
+        cap = getattr(settings, "RETRY_BACKOFF_CAP", 1)
+        return random.uniform(0, min(cap, base * 2**self.attempts))
+
+
+# 재시도 시 업로드 파일을 처음부터 다시 읽도록 되돌림
+def rewind(files):
+    if not files:
+        return
+    for file in files.values():
+        if hasattr(file, "seek"):
+            file.seek(0)
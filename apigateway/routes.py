@@ -0,0 +1,241 @@
+import os
+import time
+from threading import Lock, Thread
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from base.caches import cache
+
+from .health import health_checker
+from .models import Api, Upstream
+from .nodes import LoadBalancingType
+from .plugins import Consumer
+
+# 트라이 노드에서 해당 위치에 등록된 api를 가리키는 키
+# 경로의 문자는 항상 str이므로 None과 겹치지 않음
+END = None
+
+# 라우팅 정보가 바뀔 때마다 1씩 증가하는 세대 번호와 변경 알림 채널
+GENERATION_KEY = "routes:generation"
+GENERATION_CHANNEL = "routes:generation"
+
+
+# request_path를 문자 단위로 저장하는 불변 트라이
+# 조회 비용은 등록된 라우트 수와 무관하게 요청 경로의 길이에만 비례
+class RouteTrie:
+    __slots__ = ("_root", "size", "generation", "upstreams", "consumers")
+
+    def __init__(
+        self,
+        apis: Iterable[Api],
+        generation: int = 0,
+        upstreams: Iterable[Upstream] = (),
+        consumers: Optional[dict[str, tuple[int, Optional[int], Optional[int]]]] = None,
+    ):
+        root: dict = {}
+        size = 0
+        for api in apis:
+            node = root
+            for char in api.request_path:
+                node = node.setdefault(char, {})
+            # 같은 request_path가 중복 등록되어 있다면 먼저 만들어진(pk가 작은) api가 우선
+            current: Optional[Api] = node.get(END)
+            if current is None or api.pk < current.pk:
+                node[END] = api
+            size += 1
+        self._root = root
+        self.size = size
+        self.generation = generation
+        self.upstreams = list(upstreams)
+        # 요청 제한에서 사용하는 apikey별 (컨슈머 pk, 초당 요청 수, 버스트 크기)
+        self.consumers = consumers or {}
+
+    # 요청 경로의 접두사 중 가장 긴 request_path를 가진 api를 반환
+    def match(self, path: str) -> Optional[Api]:
+        node = self._root
+        matched: Optional[Api] = node.get(END)
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                break
+            matched = node.get(END, matched)
+        return matched
+
+
+def get_generation() -> int:
+    return cache.get(GENERATION_KEY, 0)
+
+
+# 세대 번호를 올리고 모든 워커에게 알림
+# pub/sub을 쓸 수 없는 캐시 백엔드라면 각 워커의 폴링으로 반영됨
+def bump_generation() -> int:
+    cache.add(GENERATION_KEY, 0, timeout=None)
+    generation = cache.incr(GENERATION_KEY, 1)
+    try:
+        from django_redis import get_redis_connection
+
+        get_redis_connection("default").publish(GENERATION_CHANNEL, generation)
+    except (ImportError, NotImplementedError):
+        pass
+    except Exception as e:
+        print("route generation publish failed", e)
+    return generation
+
+
+# 워커 프로세스마다 하나씩 가지는 라우트 테이블
+# 요청 처리 중에는 redis나 db를 조회하지 않고 메모리의 트라이만 사용
+class RouteTable:
+    def __init__(self):
+        self._trie: Optional[RouteTrie] = None
+        self._lock = Lock()
+        self._syncer: Optional["RouteTableSyncer"] = None
+        self._syncer_pid: Optional[int] = None
+
+    @property
+    def generation(self) -> Optional[int]:
+        trie = self._trie
+        return trie.generation if trie else None
+
+    def build(self, generation: int) -> RouteTrie:
+        # 업스트림을 한번만 조회하여 같은 업스트림을 쓰는 api들이 하나의 인스턴스를 공유
+        upstreams = {
+            upstream.pk: upstream
+            for upstream in Upstream.objects.prefetch_related("targets")
+        }
+        apis = list(Api.objects.all())
+        for api in apis:
+            api.upstream = upstreams[api.upstream_id]
+        # 요청마다 해시 링이나 가중치 순서를 만들지 않도록 미리 계산
+        for upstream in upstreams.values():
+            if upstream.load_balance == LoadBalancingType.CONSISTENT_HASH:
+                upstream.ring
+            elif upstream.load_balance == LoadBalancingType.WEIGHT_ROBIN:
+                upstream.weighted
+        consumers = {
+            apikey: (pk, rate_limit, rate_limit_burst)
+            for pk, apikey, rate_limit, rate_limit_burst in Consumer.objects.exclude(
+                apikey=""
+            ).values_list("pk", "apikey", "rate_limit", "rate_limit_burst")
+        }
+        return RouteTrie(apis, generation, upstreams.values(), consumers)
+
+    # 새 트라이를 완성한 뒤에 교체하므로 교체 전까지는 이전 트라이로 요청을 처리
+    def refresh(self, generation: Optional[int] = None):
+        # 빌드가 실패하더라도 syncer가 주기적으로 다시 시도함
+        self.start_syncer()
+        with self._lock:
+            # 빌드 도중에 바뀐 내용은 다음 세대에서 반영되도록 세대 번호를 먼저 읽음
+            if generation is None:
+                generation = get_generation()
+            trie = self.build(generation)
+            self._trie = trie
+        health_checker.watch(trie.upstreams)
+        return trie
+
+    # 이미 같거나 더 최신 세대의 트라이를 가지고 있다면 다시 만들지 않음
+    def sync(self, generation: int):
+        current = self.generation
+        if current is not None and generation <= current:
+            return self._trie
+        return self.refresh(generation)
+
+    # uwsgi처럼 앱을 불러온 뒤에 워커를 fork하는 서버에서는 부모 프로세스의 스레드가 복사되지 않으므로
+    # 워커마다 라우트 테이블을 처음 사용할 때 syncer를 시작
+    def start_syncer(self):
+        pid = os.getpid()
+        if self._syncer_pid == pid:
+            return
+        with self._lock:
+            if self._syncer_pid == pid:
+                return
+            syncer = RouteTableSyncer(self)
+            syncer.start()
+            self._syncer = syncer
+            self._syncer_pid = pid
+
+    @property
+    def trie(self) -> RouteTrie:
+        self.start_syncer()
+        trie = self._trie
+        if trie is None:
+            trie = self.refresh()
+        return trie
+
+    def match(self, path: str) -> Optional[Api]:
+        return self.trie.match(path)
+
+    # 테이블을 만들지 않고 현재 트라이만 반환, 아직 만들어지지 않았다면 None
+    # 이벤트 루프에서 실행되는 미들웨어는 db를 조회하면 안 되므로 이것을 사용
+    @property
+    def current(self) -> Optional[RouteTrie]:
+        self.start_syncer()
+        return self._trie
+
+
+# 세대 번호 변경 알림을 구독하여 라우트 테이블을 다시 만드는 스레드
+# 알림을 놓치거나 구독이 끊긴 경우를 대비해 주기적으로 세대 번호를 확인
+class RouteTableSyncer(Thread):
+    def __init__(self, table: RouteTable):
+        super().__init__(name="route-table-syncer", daemon=True)
+        self.table = table
+        self.interval: float = getattr(settings, "ROUTE_SYNC_INTERVAL", 5)
+
+    def poll(self):
+        close_old_connections()
+        generation = get_generation()
+        if generation != self.table.generation:
+            self.table.refresh(generation)
+
+    def subscribe(self):
+        try:
+            from django_redis import get_redis_connection
+
+            pubsub = get_redis_connection("default").pubsub(
+                ignore_subscribe_messages=True
+            )
+        except (ImportError, NotImplementedError):
+            # redis 캐시를 쓰지 않는 환경에서는 폴링만 수행
+            return None
+        pubsub.subscribe(GENERATION_CHANNEL)
+        return pubsub
+
+    def listen(self):
+        pubsub = self.subscribe()
+        if pubsub is None:
+            while True:
+                time.sleep(self.interval)
+                self.poll()
+        try:
+            # 구독하기 전에 바뀐 내용을 놓치지 않도록 한번 확인
+            self.poll()
+            while True:
+                message = pubsub.get_message(timeout=self.interval)
+                if message is None:
+                    self.poll()
+                    continue
+                close_old_connections()
+                self.table.sync(int(message["data"]))
+        finally:
+            pubsub.close()
+
+    def run(self):
+        while True:
+            try:
+                self.listen()
+            except Exception as e:
+                print("route syncer error", e)
+                time.sleep(self.interval)
+
+
+route_table = RouteTable()
+
+
+# 라우팅에 영향을 주는 모델이 바뀌면 커밋 이후에 세대 번호를 올리고
+# 현재 워커는 알림을 기다리지 않고 바로 라우트 테이블을 다시 만듦
+def invalidate_routes():
+    def on_commit():
+        route_table.sync(bump_generation())
+
+    transaction.on_commit(on_commit)
@@ -0,0 +1,51 @@
+import random
+import time
+from typing import TYPE_CHECKING, Optional
+
+from django.db import models
+
+from .breakers import breakers
+from .health import health_checker
+
+if TYPE_CHECKING:
+    from .nodes import LoadBalancer, Node
+
+
+class SlowStartCurve(models.TextChoices):
+    LINEAR = "linear"  # 가중치가 일정한 속도로 늘어남
+    EXPONENTIAL = "exponential"  # 처음에는 천천히, 끝에 가까울수록 빠르게 늘어남
+
+
+# 노드가 활성화되었거나 헬스체크, 서킷 브레이커에서 복구된 시각(epoch)
+def started_at(node: "Node") -> float:
+    enabled_at = getattr(node, "enabled_at", None)
+    return max(
+        enabled_at.timestamp() if enabled_at else 0,
+        health_checker.recovered.get(node.node_key, 0),
+        breakers.recovered_at(node),
+    )
+
+
+# slow_start 시간 동안 노드가 받을 트래픽의 비율(0~1)
+# slow_start_min_weight(%)에서 시작하여 slow_start 시간이 지나면 1이 됨
+def factor(upstream: "LoadBalancer", node: "Node", now: Optional[float] = None):
+    window = upstream.slow_start
+    if not window:
+        return 1.0
+    start = started_at(node)
+    if not start:
+        return 1.0
+    progress = ((now or time.time()) - start) / window
+    if 1 <= progress:
+        return 1.0
+    progress = max(progress, 0)
+    minimum = min(max(upstream.slow_start_min_weight, 1), 100) / 100
+    if upstream.slow_start_curve == SlowStartCurve.EXPONENTIAL:
+        return minimum ** (1 - progress)
+    return minimum + (1 - minimum) * progress
+
+
+# 선택된 노드가 slow_start 중이라면 비율만큼만 요청을 받도록 함
+def admit(upstream: "LoadBalancer", node: "Node") -> bool:
+    ratio = factor(upstream, node)
+    return 1 <= ratio or random.random() < ratio
@@ -0,0 +1,96 @@
+import hashlib
+from typing import Callable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from base.wrappers import MockRequest
+
+
+def get_content_length(request: MockRequest) -> int:
+    try:
+        return int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        return 0
+
+
+# 본문이 기준 크기보다 크면 메모리에 읽지 않고 업스트림으로 흘려보냄
+def should_stream_body(request: MockRequest) -> bool:
+    threshold = getattr(
+        settings, "UPLOAD_STREAM_THRESHOLD", settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+    )
+    if threshold is None:
+        return False
+    return threshold < get_content_length(request)
+
+
+# 요청 본문의 지문을 만드는 해시, 본문을 나눠서 읽으면서 계산할 수 있음
+def body_hasher():
+    return hashlib.blake2b(digest_size=16)
+
+
+# 클라이언트의 요청 본문을 조금씩 읽어 업스트림으로 보내는 스트림
+# 업스트림 소켓에 쓰는 만큼만 클라이언트 소켓에서 읽으므로 메모리 사용량이 본문 크기와 무관
+class RequestBodyStream:
+    def __init__(self, request: MockRequest, length: int):
+        self.request = request
+        # requests는 len 속성으로 Content-Length를 계산
+        self.len = length
+        self.remaining = length
+        self.chunk_size: int = getattr(settings, "UPLOAD_STREAM_CHUNK_SIZE", 64 * 1024)
+        # 본문을 다시 읽지 않고 멱등성 키의 지문을 만들 수 있도록 읽는 대로 해시
+        self.hasher = body_hasher()
+
+    # Content-Length 이상은 읽지 않음
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self.chunk_size
+        size = min(size, self.remaining)
+        if size <= 0:
+            return b""
+        chunk = self.request.read(size)
+        self.remaining -= len(chunk)
+        self.hasher.update(chunk)
+        return chunk
+
+    def digest(self) -> bytes:
+        return self.hasher.digest()
+
+    def __iter__(self):
+        while chunk := self.read(self.chunk_size):
+            yield chunk
+
+    # httpx의 AsyncClient는 비동기 이터러블만 스트리밍으로 보낼 수 있음
+    # ASGI에서는 장고가 뷰를 호출하기 전에 본문을 임시 파일에 모두 받아두므로
+    # 메모리에 올리지 않는 것만 보장되고, 파일 읽기는 이벤트 루프를 막지 않도록 스레드에서 수행
+    async def __aiter__(self):
+        read = sync_to_async(self.read, thread_sensitive=False)
+        while chunk := await read(self.chunk_size):
+            yield chunk
+
+
+# 업스트림 응답의 본문을 끝까지 보냈거나 중간에 닫았을 때 실행할 함수를 등록
+# 스트리밍 응답은 헤더를 받은 뒤에도 본문을 보내는 동안 커넥션을 사용하므로
+# 처리중인 요청 수처럼 요청이 끝날 때 되돌려야 하는 값은 헤더가 아니라 본문이 끝날 때 되돌림
+def on_body_end(response, callback: Callable[[], None]):
+    response.__dict__.setdefault("body_end_callbacks", []).append(callback)
+
+
+# 등록된 함수를 한번만 실행
+def end_body(response):
+    callbacks = response.__dict__.pop("body_end_callbacks", [])
+    for callback in reversed(callbacks):
+        try:
+            callback()
+        except Exception as e:
+            print("body end callback failed", e)
+
+
+# 클라이언트에게 전달하지 않고 버리는 응답은 커넥션을 닫고 본문이 끝난 것으로 처리
+def discard_response(response):
+    try:
+        # httpx의 응답은 본문을 모두 읽으면서 이미 닫혀있음
+        if not getattr(response, "is_closed", False):
+            response.close()
+    finally:
+        end_body(response)
@@ -0,0 +1,80 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apigateway.breakers import BreakerState, CircuitBreaker, describe
+from apigateway.models import Target, Upstream
+
+
+class TestCircuitBreaker(SimpleTestCase):
+    def setUp(self):
+        self.upstream = Upstream(
+            pk=1,
+            timeout=10,
+            outlier_consecutive_failures=3,
+            outlier_error_rate=0,
+            outlier_ejection_time=30,
+            outlier_max_ejection_time=100,
+        )
+        self.target = Target(pk=1, host="target:8000")
+
+    def fail(self, breaker: CircuitBreaker, now: float, count: int = 1):
+        with mock.patch("apigateway.breakers.time.monotonic", return_value=now):
+            for _ in range(count):
+                breaker.record(False, self.upstream, self.target)
+
+    def succeed(self, breaker: CircuitBreaker, now: float):
+        with mock.patch("apigateway.breakers.time.monotonic", return_value=now):
+            breaker.record(True, self.upstream, self.target)
+
+    def test_open_after_consecutive_failures(self):
+        breaker = CircuitBreaker()
+        self.fail(breaker, 1000, 2)
+        self.succeed(breaker, 1000)
+        self.fail(breaker, 1000, 2)
+        self.assertEqual(breaker.state, BreakerState.CLOSED)
+        self.fail(breaker, 1000)
+        self.assertEqual(breaker.state, BreakerState.OPEN)
+        self.assertFalse(breaker.available(1029, self.upstream))
+        self.assertEqual(describe(self.target), BreakerState.OPEN.label)
+
+    def test_half_open_trial(self):
+        breaker = CircuitBreaker()
+        self.fail(breaker, 1000, 3)
+        # 제외 시간이 끝나면 시험 요청 하나만 보냄
+        self.assertTrue(breaker.available(1030, self.upstream))
+        breaker.acquire(1030, self.upstream, self.target)
+        self.assertEqual(breaker.state, BreakerState.HALF_OPEN)
+        self.assertFalse(breaker.available(1031, self.upstream))
+        # 시험 요청의 응답이 오지 않으면 timeout 이후 다시 보낼 수 있음
+        self.assertTrue(breaker.available(1040, self.upstream))
+        self.succeed(breaker, 1035)
+        self.assertEqual(breaker.state, BreakerState.CLOSED)
+        self.assertEqual(breaker.failures, 0)
+
+    def test_reopen_with_backoff(self):
+        breaker = CircuitBreaker()
+        self.fail(breaker, 1000, 3)
+        self.assertEqual(breaker.opened_until, 1030)
+        breaker.acquire(1030, self.upstream, self.target)
+        # 시험 요청이 실패하면 두배의 시간 동안 제외
+        self.fail(breaker, 1031)
+        self.assertEqual(breaker.state, BreakerState.OPEN)
+        self.assertEqual(breaker.opened_until, 1091)
+        breaker.acquire(1091, self.upstream, self.target)
+        self.fail(breaker, 1091)
+        # 최대 제외 시간을 넘지 않음
+        self.assertEqual(breaker.opened_until, 1191)
+
+    def test_error_rate(self):
+        self.upstream.outlier_consecutive_failures = 0
+        self.upstream.outlier_error_rate = 50
+        self.upstream.outlier_min_requests = 4
+        breaker = CircuitBreaker()
+        self.fail(breaker, 1000)
+        self.succeed(breaker, 1000)
+        self.fail(breaker, 1000)
+        # 최소 요청 수를 채우기 전에는 제외하지 않음
+        self.assertEqual(breaker.state, BreakerState.CLOSED)
+        self.succeed(breaker, 1000)
+        self.assertEqual(breaker.state, BreakerState.OPEN)
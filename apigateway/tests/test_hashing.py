@@ -0,0 +1,46 @@
+from django.test import SimpleTestCase
+
+from apigateway.hashing import HashRing
+from apigateway.models import Target
+
+KEYS = [f"user:{i}" for i in range(10000)]
+
+
+def make_target(pk: int, weight: int = 100):
+    return Target(pk=pk, host=f"10.0.0.{pk}", weight=weight)
+
+
+def assign(ring: HashRing, keys=KEYS):
+    return {key: ring.get(key).pk for key in keys}
+
+
+class TestHashRing(SimpleTestCase):
+    def test_same_key_same_node(self):
+        ring = HashRing([make_target(i) for i in range(1, 5)])
+        self.assertEqual(assign(ring), assign(ring))
+
+    def test_remove_node_remaps_only_its_keys(self):
+        targets = [make_target(i) for i in range(1, 6)]
+        before = assign(HashRing(targets))
+        after = assign(HashRing(targets[:-1]))
+        moved = [key for key in KEYS if before[key] != after[key]]
+        # 빠진 노드에 할당되었던 키만 옮겨감
+        self.assertTrue(all(before[key] == 5 for key in moved))
+        self.assertAlmostEqual(len(moved) / len(KEYS), 1 / 5, delta=0.05)
+
+    def test_add_node_remaps_about_one_nth(self):
+        targets = [make_target(i) for i in range(1, 6)]
+        before = assign(HashRing(targets[:-1]))
+        after = assign(HashRing(targets))
+        moved = [key for key in KEYS if before[key] != after[key]]
+        self.assertTrue(all(after[key] == 5 for key in moved))
+        self.assertAlmostEqual(len(moved) / len(KEYS), 1 / 5, delta=0.05)
+
+    def test_skip_unavailable(self):
+        targets = [make_target(i) for i in range(1, 4)]
+        ring = HashRing(targets)
+        for key in KEYS[:100]:
+            node = ring.get(key, lambda x: x.pk != 1)
+            self.assertNotEqual(node.pk, 1)
+            if ring.get(key).pk != 1:
+                self.assertEqual(node, ring.get(key))
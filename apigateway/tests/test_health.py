@@ -0,0 +1,53 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apigateway.health import HealthChecker, health_checker
+from apigateway.models import Target, Upstream
+from apigateway.nodes import LoadBalancingType
+
+
+class TestHealthChecker(SimpleTestCase):
+    def test_start_per_process(self):
+        checker = HealthChecker()
+        with mock.patch("apigateway.health.Thread") as thread:
+            checker.start()
+            checker.start()
+            self.assertEqual(thread.return_value.start.call_count, 1)
+            # fork된 워커는 부모의 상태만 물려받고 스레드는 없음
+            checker.pid = -1
+            checker.start()
+            self.assertEqual(thread.return_value.start.call_count, 2)
+
+    def test_skip_disabled_targets(self):
+        upstream = Upstream(pk=1, host="10.0.0.1")
+        targets = [
+            Target(pk=1, host="10.0.1.1"),
+            Target(pk=2, host="10.0.1.2", enabled=False),
+        ]
+        with mock.patch.object(Upstream, "targets") as manager:
+            manager.all.return_value = targets
+            nodes = HealthChecker().nodes(upstream)
+        self.assertEqual([x.node_key for x in nodes], ["upstream:1", "target:1"])
+
+
+class TestLoadBalancing(SimpleTestCase):
+    def pick(self, ejected: frozenset[str], count: int = 30):
+        upstream = Upstream(
+            pk=1, host="10.0.0.1", load_balance=LoadBalancingType.WEIGHT_ROBIN
+        )
+        targets = [Target(pk=pk, host=f"10.0.1.{pk}") for pk in (1, 2)]
+        with mock.patch.object(Upstream, "targets") as manager, mock.patch.object(
+            health_checker, "start"
+        ), mock.patch.object(health_checker, "ejected", ejected):
+            manager.all.return_value = targets
+            return {upstream.load_balancing().node_key for _ in range(count)}
+
+    def test_eject_upstream_itself(self):
+        self.assertIn("upstream:1", self.pick(frozenset()))
+        # 업스트림 자신도 헬스체크에 실패하면 분산 대상에서 제외
+        self.assertEqual(self.pick(frozenset({"upstream:1"})), {"target:1", "target:2"})
+
+    def test_all_ejected(self):
+        ejected = frozenset({"upstream:1", "target:1", "target:2"})
+        self.assertEqual(len(self.pick(ejected)), 3)
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from apigateway.hedging import Hedger
+from apigateway.limits import ConcurrencyLimiter, LimiterType
+from apigateway.models import Api, Upstream
+from apigateway.streams import end_body
+
+
+class FakeResponse:
+    def __init__(self, name: str):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_hedger(api: Api, delay: float = 0.01) -> Hedger:
+    hedger = Hedger(clock=mock.Mock(return_value=0.0))
+    for _ in range(20):
+        hedger.windows[api.pk].add(delay)
+    return hedger
+
+
+# 첫번째 호출은 release가 set될 때까지 응답하지 않음
+def make_send(release: threading.Event, calls: list):
+    def send():
+        calls.append(threading.get_ident())
+        if len(calls) == 1:
+            release.wait(timeout=10)
+            return FakeResponse("slow")
+        return FakeResponse("fast")
+
+    return send
+
+
+def make_limiter(limit: int) -> ConcurrencyLimiter:
+    upstream = Upstream(
+        pk=1, concurrency_limiter=LimiterType.STATIC, concurrency_limit=limit
+    )
+    limiter = ConcurrencyLimiter(upstream)
+    # 첫번째 요청이 send_request에서 받은 슬롯
+    limiter.acquire(upstream)
+    return limiter
+
+
+@override_settings(HEDGE_MIN_SAMPLES=20)
+class TestHedger(SimpleTestCase):
+    api = Api(pk=1, hedge=True, hedge_percentile=90, hedge_budget=100)
+
+    def test_record_primary_latency(self):
+        hedger = make_hedger(self.api)
+        release, calls = threading.Event(), []
+        response = hedger.send(self.api, make_send(release, calls))
+        self.assertEqual(response.name, "fast")
+        self.assertEqual(len(calls), 2)
+        hedger.clock.return_value = 5.0
+        release.set()
+        hedger.executor.shutdown(wait=True)
+        # 이긴 헤지 요청이 아니라 느린 첫번째 요청의 응답 시간을 기록
+        self.assertEqual(hedger.windows[self.api.pk].samples[-1], 5.0)
+
+    def test_close_loser(self):
+        hedger = make_hedger(self.api)
+        release, calls = threading.Event(), []
+        slow = FakeResponse("slow")
+
+        def send():
+            calls.append(1)
+            if len(calls) == 1:
+                release.wait(timeout=10)
+                return slow
+            return FakeResponse("fast")
+
+        hedger.send(self.api, send)
+        release.set()
+        hedger.executor.shutdown(wait=True)
+        self.assertTrue(slow.closed)
+
+    def test_no_slot(self):
+        limiter = make_limiter(1)
+        hedger = make_hedger(self.api)
+        release, calls = threading.Event(), []
+        # 남은 슬롯이 없으면 헤지하지 않음
+        threading.Timer(0.1, release.set).start()
+        response = hedger.send(self.api, make_send(release, calls), limiter)
+        self.assertEqual(response.name, "slow")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(limiter.in_flight, 1)
+
+    # 헤지 요청의 슬롯은 이긴 응답의 본문이 끝날 때 반환
+    def test_slot_until_body_end(self):
+        limiter = make_limiter(2)
+        hedger = make_hedger(self.api)
+        release, calls = threading.Event(), []
+        response = hedger.send(self.api, make_send(release, calls), limiter)
+        self.assertEqual(response.name, "fast")
+        self.assertEqual(limiter.in_flight, 2)
+        end_body(response)
+        self.assertEqual(limiter.in_flight, 1)
+        release.set()
+        hedger.executor.shutdown(wait=True)
+        self.assertEqual(limiter.in_flight, 1)
+
+    @override_settings(HEDGE_MAX_OUTSTANDING=1)
+    def test_max_outstanding(self):
+        hedger = make_hedger(self.api)
+        for _ in range(10):
+            hedger.budgets[self.api.pk].deposit()
+        self.assertTrue(hedger.allow(self.api, None))
+        self.assertFalse(hedger.allow(self.api, None))
+        hedger.finish_hedge(None)
+        self.assertTrue(hedger.allow(self.api, None))
+
+    # 스레드가 모두 사용중이면 대기열에 넣지 않고 헤지 없이 호출한 스레드에서 보냄
+    @override_settings(HEDGE_WORKERS=1)
+    def test_primaries_full(self):
+        hedger = make_hedger(self.api)
+        hedger.primaries.acquire()
+        release, calls = threading.Event(), []
+        release.set()
+        response = hedger.send(self.api, make_send(release, calls))
+        self.assertEqual(response.name, "slow")
+        self.assertEqual(calls, [threading.get_ident()])
+
+    async def test_async_record_cancelled_primary(self):
+        hedger = make_hedger(self.api)
+        calls: list = []
+
+        async def send():
+            calls.append(1)
+            if len(calls) == 1:
+                await asyncio.Event().wait()
+            hedger.clock.return_value = 3.0
+            return FakeResponse("fast")
+
+        response = await hedger.async_send(self.api, send)
+        self.assertEqual(response.name, "fast")
+        # 취소된 첫번째 요청은 취소될 때까지 걸린 시간을 기록
+        self.assertEqual(hedger.windows[self.api.pk].samples[-1], 3.0)
@@ -0,0 +1,115 @@
+from io import BytesIO
+from unittest import mock
+
+import requests
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from urllib3 import HTTPResponse
+
+from base.exceptions import ConflictException
+
+from apigateway.idempotency import (
+    IdempotencyStore,
+    StoredResponse,
+    to_stored_response,
+)
+from apigateway.views import convert_response
+
+
+def make_response(content: bytes):
+    headers = {"Content-Type": "application/json", "Location": "/orders/1"}
+    return StoredResponse(201, headers, content, b"f" * 16)
+
+
+class TestStoredResponse(SimpleTestCase):
+    def test_round_trip(self):
+        response = make_response(b'{"id": 1}')
+        loaded = StoredResponse.loads(response.dumps())
+        assert loaded is not None
+        self.assertEqual(loaded.status_code, 201)
+        self.assertEqual(loaded.headers, response.headers)
+        self.assertEqual(loaded.content, response.content)
+        self.assertEqual(loaded.fingerprint, response.fingerprint)
+
+    @override_settings(IDEMPOTENCY_COMPRESS_THRESHOLD=1024)
+    def test_compress_above_threshold(self):
+        small = make_response(b"a" * 100)
+        large = make_response(b"a" * 10000)
+        # 기준보다 작은 본문은 그대로, 큰 본문은 압축해서 저장
+        self.assertGreater(len(small.dumps()), 100)
+        self.assertLess(len(large.dumps()), 1000)
+        loaded = StoredResponse.loads(large.dumps())
+        assert loaded is not None
+        self.assertEqual(loaded.content, large.content)
+
+    def test_empty_body(self):
+        loaded = StoredResponse.loads(make_response(b"").dumps())
+        assert loaded is not None
+        self.assertEqual(loaded.content, b"")
+
+
+# Content-Length 없이 청크로 오는 업스트림 응답
+def make_upstream_response(content: bytes):
+    response = requests.Response()
+    response.status_code = 200
+    response.headers["Content-Type"] = "text/plain"
+    response.raw = HTTPResponse(
+        body=BytesIO(content), preload_content=False, status=200
+    )
+    return response
+
+
+@override_settings(IDEMPOTENCY_MAX_BODY=100, STREAM_CHUNK_SIZE=16)
+class TestUnknownLength(SimpleTestCase):
+    def test_store_small_body(self):
+        response = make_upstream_response(b"a" * 50)
+        stored = to_stored_response(response, b"f" * 16)
+        assert stored is not None
+        self.assertEqual(stored.content, b"a" * 50)
+        self.assertEqual(convert_response(response).content, b"a" * 50)
+
+    def test_stream_large_body(self):
+        content = bytes(range(256)) * 10
+        response = make_upstream_response(content)
+        self.assertIsNone(to_stored_response(response, b"f" * 16))
+        # 기준 크기를 넘을 때까지만 읽고 나머지는 이어서 스트리밍
+        prefix, _ = response.partial_content
+        self.assertLess(len(prefix), 100 + 16)
+        self.assertEqual(b"".join(convert_response(response)), content)
+
+
+# 업스트림 요청이 lease보다 오래 걸리는 동안 같은 키의 요청이 잠금을 가져가지 못함
+# 캐시의 유효기간을 가짜 시계로 확인
+@override_settings(IDEMPOTENCY_LEASE=3, IDEMPOTENCY_WAIT_TIMEOUT=0)
+@mock.patch("django.core.cache.backends.locmem.time.time")
+class TestLease(SimpleTestCase):
+    def setUp(self):
+        self.store = IdempotencyStore()
+        self.store.renewer.start = lambda: None  # type:ignore
+
+    def tearDown(self):
+        cache.delete("idemp:lease:lock")
+
+    def request(self):
+        return RequestFactory().post("/orders", b"{}", content_type="application/json")
+
+    def test_renew_while_running(self, now):
+        now.return_value = 1000
+        _, token = self.store.begin("idemp:lease", self.request())
+        for second in range(1001, 1010):
+            now.return_value = second
+            self.store.renewer.renew_all()
+        with self.assertRaises(ConflictException):
+            self.store.begin("idemp:lease", self.request())
+        self.store.release("idemp:lease", token)
+        self.assertEqual(self.store.renewer.leases, {})
+        _, token = self.store.begin("idemp:lease", self.request())
+        self.assertTrue(token)
+
+    # 갱신하지 않으면 lease가 지나 다른 요청이 잠금을 가져감
+    def test_expire_without_renew(self, now):
+        now.return_value = 1000
+        self.store.begin("idemp:lease", self.request())
+        now.return_value = 1004
+        _, token = self.store.begin("idemp:lease", self.request())
+        self.assertTrue(token)
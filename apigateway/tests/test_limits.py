@@ -0,0 +1,97 @@
+import asyncio
+
+from django.test import SimpleTestCase
+
+from apigateway.limits import ConcurrencyLimiter, LimiterType
+from apigateway.models import Upstream
+from base.exceptions import OverloadedException
+
+
+def make_upstream(kind: str = LimiterType.STATIC, limit: int = 1, **kwargs):
+    return Upstream(
+        pk=1,
+        concurrency_limiter=kind,
+        concurrency_limit=limit,
+        queue_size=kwargs.pop("queue_size", 5),
+        queue_timeout=kwargs.pop("queue_timeout", 1000),
+        timeout=kwargs.pop("timeout", 10),
+        **kwargs,
+    )
+
+
+class TestConcurrencyLimiter(SimpleTestCase):
+    def test_reject_when_queue_full(self):
+        upstream = make_upstream(queue_size=0)
+        limiter = ConcurrencyLimiter(upstream)
+        limiter.acquire(upstream)
+        with self.assertRaises(OverloadedException):
+            limiter.acquire(upstream)
+        limiter.release(upstream, 0.01, True)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_timeout_in_queue(self):
+        upstream = make_upstream(queue_timeout=10)
+        limiter = ConcurrencyLimiter(upstream)
+        limiter.acquire(upstream)
+        with self.assertRaises(OverloadedException):
+            limiter.acquire(upstream)
+        self.assertFalse(limiter.waiters)
+
+    async def test_cancel_while_waiting(self):
+        upstream = make_upstream()
+        limiter = ConcurrencyLimiter(upstream)
+        await limiter.async_acquire(upstream)
+        task = asyncio.create_task(limiter.async_acquire(upstream))
+        await asyncio.sleep(0)
+        self.assertEqual(len(limiter.waiters), 1)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertFalse(limiter.waiters)
+        limiter.release(upstream, 0.01, True)
+        self.assertEqual(limiter.in_flight, 0)
+
+    async def test_cancel_after_grant(self):
+        upstream = make_upstream()
+        limiter = ConcurrencyLimiter(upstream)
+        await limiter.async_acquire(upstream)
+        task = asyncio.create_task(limiter.async_acquire(upstream))
+        await asyncio.sleep(0)
+        # 슬롯을 넘겨받았지만 깨어나기 전에 취소되면 슬롯을 돌려줌
+        limiter.release(upstream, 0.01, True)
+        self.assertEqual(limiter.in_flight, 1)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_aimd(self):
+        upstream = make_upstream(LimiterType.AIMD, limit=10)
+        limiter = ConcurrencyLimiter(upstream)
+        for _ in range(9):
+            limiter.acquire(upstream)
+        limiter.release(upstream, 20, True)
+        # 느린 응답은 실패처럼 제한을 줄임
+        self.assertAlmostEqual(limiter.limit, 9)
+        limiter.release(upstream, 0.01, False)
+        self.assertAlmostEqual(limiter.limit, 8.1)
+        limiter.release(upstream, 0.01, True)
+        self.assertAlmostEqual(limiter.limit, 8.1)
+        for _ in range(2):
+            limiter.acquire(upstream)
+        limiter.release(upstream, 0.01, True)
+        self.assertAlmostEqual(limiter.limit, 8.1 + 1 / 8.1)
+
+    def test_gradient(self):
+        upstream = make_upstream(LimiterType.GRADIENT, limit=100)
+        limiter = ConcurrencyLimiter(upstream)
+        for _ in range(50):
+            limiter.acquire(upstream)
+            limiter.release(upstream, 0.01, True)
+        self.assertEqual(limiter.limit, 100)
+        # 응답 시간이 늘어나면 제한을 줄임
+        for _ in range(50):
+            limiter.acquire(upstream)
+            limiter.release(upstream, 0.1, True)
+        self.assertLess(limiter.limit, 60)
+        self.assertGreaterEqual(limiter.limit, limiter.min_limit)
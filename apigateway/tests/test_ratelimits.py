@@ -0,0 +1,60 @@
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from apigateway.models import Api
+from apigateway.routes import RouteTrie, route_table
+from base.middleware import get_scopes
+from base.ratelimits import PrefixTree, Scope, WindowCounter
+
+
+class TestPrefixTree(SimpleTestCase):
+    def test_networks(self):
+        tree = PrefixTree(["10.0.0.0/8", "192.168.0.1", "2001:db8::/32", "", "bad"])
+        self.assertIn("10.1.2.3", tree)
+        self.assertIn("192.168.0.1", tree)
+        self.assertNotIn("192.168.0.2", tree)
+        self.assertNotIn("11.0.0.1", tree)
+        self.assertIn("2001:db8::1", tree)
+        self.assertNotIn("2001:db9::1", tree)
+        self.assertNotIn("", tree)
+
+    def test_match_all(self):
+        tree = PrefixTree(["0.0.0.0/0"])
+        self.assertIn("1.2.3.4", tree)
+        self.assertNotIn("::1", tree)
+
+
+class TestWindowCounter(SimpleTestCase):
+    @override_settings(RATE_LIMIT_FLUSH_EVERY=3, RATE_LIMIT_FLUSH_INTERVAL=60)
+    def test_limit_across_flushes(self):
+        counter = WindowCounter()
+        scopes = [Scope("origin", rate=1, burst=10)]
+        results = [counter.hit("block", scopes, 0) for _ in range(12)]
+        self.assertEqual([r.allowed for r in results], [True] * 10 + [False] * 2)
+        self.assertEqual(results[0].remaining, 9)
+        self.assertEqual(results[9].remaining, 0)
+
+    @override_settings(RATE_LIMIT_FLUSH_EVERY=100, RATE_LIMIT_FLUSH_INTERVAL=60)
+    def test_block_only_on_origin(self):
+        counter = WindowCounter()
+        scopes = [Scope("origin", rate=10, burst=10), Scope("route", rate=1, burst=2)]
+        results = [counter.hit("block", scopes, 20) for _ in range(3)]
+        self.assertFalse(results[2].allowed)
+        # 라우트의 제한에 걸린 경우는 접속지를 차단하지 않음
+        self.assertFalse(results[2].blocked)
+
+
+@mock.patch.object(route_table, "start_syncer")
+class TestScopes(SimpleTestCase):
+    def test_route_scope(self, start_syncer):
+        api = Api(pk=3, request_path="/users/", rate_limit=5)
+        with mock.patch.object(route_table, "_trie", RouteTrie([api])):
+            scopes = get_scopes(RequestFactory().get("/users/1"), "10.0.0.1")
+        self.assertEqual([scope.key for scope in scopes], ["RATE:ORIGIN:10.0.0.1", "RATE:API:3"])
+
+    # 라우트 테이블이 아직 없을 때 db를 조회하지 않고 접속지의 제한만 적용
+    def test_cold_route_table(self, start_syncer):
+        with mock.patch.object(route_table, "_trie", None):
+            scopes = get_scopes(RequestFactory().get("/users/1"), "10.0.0.1")
+        self.assertEqual([scope.key for scope in scopes], ["RATE:ORIGIN:10.0.0.1"])
@@ -0,0 +1,78 @@
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase, override_settings
+
+from apigateway.models import Upstream
+from apigateway.retries import Retry, RetryBudget, retry_budgets
+from apigateway.streams import RequestBodyStream
+
+
+@override_settings(RETRY_BUDGET_MIN_PER_SECOND=0)
+class TestRetryBudget(SimpleTestCase):
+    @mock.patch("apigateway.retries.time.monotonic", return_value=100)
+    def test_ratio(self, monotonic):
+        budget = RetryBudget(window=10)
+        for _ in range(10):
+            budget.deposit()
+        # 요청 10개의 20%인 2번만 재시도 허용
+        self.assertTrue(budget.withdraw(0.2))
+        self.assertTrue(budget.withdraw(0.2))
+        self.assertFalse(budget.withdraw(0.2))
+
+    @override_settings(RETRY_BUDGET_MIN_PER_SECOND=1)
+    @mock.patch("apigateway.retries.time.monotonic", return_value=100)
+    def test_min_per_second(self, monotonic):
+        # 요청이 적어도 초당 최소 횟수만큼은 재시도 허용
+        budget = RetryBudget(window=2)
+        self.assertTrue(budget.withdraw(0.1))
+        self.assertTrue(budget.withdraw(0.1))
+        self.assertFalse(budget.withdraw(0.1))
+
+    def test_window(self):
+        budget = RetryBudget(window=10)
+        with mock.patch("apigateway.retries.time.monotonic", return_value=100):
+            for _ in range(10):
+                budget.deposit()
+            self.assertTrue(budget.withdraw(0.1))
+            self.assertFalse(budget.withdraw(0.1))
+        # window가 지나면 이전 요청과 재시도는 잊음
+        with mock.patch("apigateway.retries.time.monotonic", return_value=110):
+            budget.deposit()
+            self.assertEqual((budget.requests, budget.retries), (1, 0))
+            self.assertTrue(budget.withdraw(0.1))
+            self.assertFalse(budget.withdraw(0.1))
+
+
+@override_settings(RETRY_BUDGET_MIN_PER_SECOND=0)
+class TestRetry(SimpleTestCase):
+    def setUp(self):
+        self.upstream = Upstream(pk=1, retries=2, retry_budget=100)
+        retry_budgets[self.upstream.pk] = RetryBudget()
+
+    def tearDown(self):
+        retry_budgets.pop(self.upstream.pk, None)
+
+    def test_retry_idempotent(self):
+        retry = Retry(self.upstream, "get", False, None)
+        self.assertTrue(retry.should_retry(requests.ConnectionError()))
+        # 업스트림의 재시도 횟수를 넘지 않음
+        self.assertFalse(retry.should_retry(requests.ConnectionError()))
+        self.assertEqual(retry.attempts, 1)
+
+    def test_not_retryable(self):
+        error = requests.ConnectionError()
+        self.assertFalse(Retry(self.upstream, "post", False, None).should_retry(error))
+        self.assertTrue(Retry(self.upstream, "post", True, None).should_retry(error))
+        # 응답을 받은 뒤의 에러는 다시 보내지 않음
+        retry = Retry(self.upstream, "get", False, None)
+        self.assertFalse(retry.should_retry(requests.HTTPError()))
+        # 이미 흘려보낸 스트림 본문은 다시 보낼 수 없음
+        stream = RequestBodyStream(mock.Mock(), 10)
+        self.assertFalse(Retry(self.upstream, "put", False, stream).should_retry(error))
+
+    def test_budget_exhausted(self):
+        self.upstream.retry_budget = 0
+        retry = Retry(self.upstream, "get", False, None)
+        self.assertFalse(retry.should_retry(requests.Timeout()))
+        self.assertEqual(retry.attempts, 0)
@@ -0,0 +1,47 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apigateway.models import Api
+from apigateway.routes import RouteTable, RouteTableSyncer, RouteTrie
+
+
+def make_api(pk: int, request_path: str):
+    return Api(pk=pk, name=request_path, request_path=request_path)
+
+
+class TestRouteTrie(SimpleTestCase):
+    def test_longest_prefix(self):
+        trie = RouteTrie(
+            [
+                make_api(1, "/users/"),
+                make_api(2, "/users/1/memberships/"),
+                make_api(3, "/"),
+            ]
+        )
+        self.assertEqual(trie.match("/users/1/memberships/3").pk, 2)
+        self.assertEqual(trie.match("/users/1/").pk, 1)
+        self.assertEqual(trie.match("/posts/").pk, 3)
+
+    def test_no_match(self):
+        trie = RouteTrie([make_api(1, "/users/")])
+        self.assertIsNone(trie.match("/posts/"))
+        self.assertIsNone(trie.match("/users"))
+
+    def test_duplicated_path(self):
+        trie = RouteTrie([make_api(5, "/users/"), make_api(2, "/users/")])
+        self.assertEqual(trie.match("/users/me").pk, 2)
+        self.assertEqual(trie.size, 2)
+
+
+class TestRouteTable(SimpleTestCase):
+    def test_start_syncer_per_process(self):
+        table = RouteTable()
+        with mock.patch.object(RouteTableSyncer, "start") as start:
+            table.start_syncer()
+            table.start_syncer()
+            self.assertEqual(start.call_count, 1)
+            # fork된 워커는 부모의 syncer 정보만 물려받고 스레드는 없음
+            table._syncer_pid = -1
+            table.start_syncer()
+            self.assertEqual(start.call_count, 2)
@@ -0,0 +1,50 @@
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from apigateway.middleware import LoadShedder, LoadShedding, shedder
+from apigateway.models import Api, ApiPriority
+from apigateway.routes import RouteTrie, route_table
+
+
+def make_api(pk: int, request_path: str, priority: str):
+    return Api(pk=pk, name=request_path, request_path=request_path, priority=priority)
+
+
+TRIE = RouteTrie(
+    [
+        make_api(1, "/batch/", ApiPriority.BEST_EFFORT),
+        make_api(2, "/pay/", ApiPriority.CRITICAL),
+    ]
+)
+
+
+@override_settings(SHED_MAX_IN_FLIGHT=10, SHED_MAX_LOOP_LAG=0)
+@mock.patch.object(route_table, "start_syncer")
+class TestLoadShedding(SimpleTestCase):
+    def test_shed_low_priority_first(self, start_syncer):
+        load = LoadShedder()
+        load.in_flight = 7
+        with mock.patch.object(route_table, "_trie", TRIE):
+            self.assertTrue(load.should_shed("/batch/jobs"))
+            self.assertFalse(load.should_shed("/users/"))
+            self.assertFalse(load.should_shed("/pay/"))
+            load.in_flight = 9
+            self.assertTrue(load.should_shed("/users/"))
+            self.assertFalse(load.should_shed("/pay/"))
+            # 관리자 페이지는 거절하지 않음
+            load.in_flight = 100
+            self.assertFalse(load.should_shed("/gateway/"))
+
+    # 라우트 테이블이 아직 없을 때 이벤트 루프에서 db를 조회하지 않음
+    async def test_cold_route_table(self, start_syncer):
+        async def get_response(request):
+            return HttpResponse("ok")
+
+        middleware = LoadShedding(get_response)
+        with mock.patch.object(route_table, "_trie", None), mock.patch.object(
+            shedder, "in_flight", 0
+        ):
+            response = await middleware(RequestFactory().get("/batch/jobs"))
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,163 @@
+import io
+import threading
+from contextlib import contextmanager
+from unittest import mock
+
+import httpx
+import requests
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, override_settings
+from urllib3 import HTTPResponse
+
+from apigateway.connections import ConnectionCounter
+from apigateway.health import health_checker
+from apigateway.limits import ConcurrencyLimiters, LimiterType
+from apigateway.metrics import metrics
+from apigateway.models import Api, Upstream
+from apigateway.streams import RequestBodyStream
+from apigateway.views import convert_response, to_streaming_response, warn_buffered
+
+
+def make_response(**headers) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response.headers.update(headers)
+    return response
+
+
+@override_settings(STREAM_RESPONSE_THRESHOLD=100)
+class TestShouldStream(SimpleTestCase):
+    def test_threshold(self):
+        api = Api()
+        small = make_response(**{"Content-Length": "100"})
+        large = make_response(**{"Content-Length": "101"})
+        self.assertFalse(api.should_stream_response(small))
+        self.assertTrue(api.should_stream_response(large))
+        self.assertTrue(api.should_stream_response(make_response()))
+
+    # 잘못된 Content-Length는 크기를 알 수 없는 응답처럼 스트리밍
+    def test_invalid_length(self):
+        api = Api()
+        for length in ("10, 10", "-1", "abc", ""):
+            response = make_response(**{"Content-Length": length})
+            self.assertTrue(api.should_stream_response(response))
+
+
+class TestRequestBodyStream(SimpleTestCase):
+    # 비동기로 읽을 때 본문 읽기가 이벤트 루프 스레드에서 실행되지 않음
+    async def test_async_read_off_loop(self):
+        body = io.BytesIO(b"x" * 25)
+        threads = set()
+
+        def read(size):
+            threads.add(threading.get_ident())
+            return body.read(size)
+
+        stream = RequestBodyStream(mock.Mock(read=read), 20)
+        stream.chunk_size = 8
+        chunks = [chunk async for chunk in stream]
+        self.assertEqual(chunks, [b"x" * 8, b"x" * 8, b"x" * 4])
+        self.assertNotIn(threading.get_ident(), threads)
+
+
+# 비동기 게이트웨이는 응답을 스트리밍하지 못하므로 설정을 막고 버퍼링을 알림
+@override_settings(GATEWAY_ASYNC=True, STREAM_RESPONSE_THRESHOLD=100)
+class TestAsyncGateway(SimpleTestCase):
+    def test_clean(self):
+        with self.assertRaises(ValidationError):
+            Api(stream_response=True).clean()
+        Api(stream_response=False).clean()
+        with override_settings(GATEWAY_ASYNC=False):
+            Api(stream_response=True).clean()
+
+    @mock.patch("apigateway.views.buffered_apis", new_callable=set)
+    def test_warn_buffered(self, buffered):
+        api = Api(pk=1, name="download")
+        warn_buffered(api, httpx.Response(200, content=b"x" * 10))
+        self.assertEqual(buffered, set())
+        warn_buffered(api, httpx.Response(200, content=b"x" * 101))
+        self.assertEqual(buffered, {1})
+
+
+def make_upstream_response(content: bytes, **headers) -> requests.Response:
+    response = make_response(**headers)
+    response.raw = HTTPResponse(
+        body=io.BytesIO(content), preload_content=False, status=200
+    )
+    return response
+
+
+# 타겟이 없는 업스트림에 요청을 보내면 업스트림 자신에게 보냄
+@contextmanager
+def mock_upstream(upstream: Upstream, response: requests.Response):
+    with mock.patch.object(Upstream, "targets") as manager, mock.patch.object(
+        health_checker, "start"
+    ), mock.patch("apigateway.nodes.pools") as pools:
+        manager.all.return_value = []
+        pools.get.return_value.session.request.return_value = response
+        yield
+
+
+# 서버가 응답을 보낸 뒤에 닫는 것처럼 닫음, 요청 종료 시그널은 db를 정리하므로 보내지 않음
+def close(http_response):
+    with mock.patch("django.http.response.signals.request_finished"):
+        http_response.close()
+
+
+@override_settings(STREAM_CHUNK_SIZE=10)
+@mock.patch("apigateway.nodes.connections", new_callable=ConnectionCounter)
+class TestStreamedBody(SimpleTestCase):
+    upstream = Upstream(pk=1, host="10.0.0.1")
+    api = Api(pk=1, stream_response=True)
+
+    def forward(self, response: requests.Response) -> requests.Response:
+        with mock_upstream(self.upstream, response):
+            return self.upstream.forward_request(self.api, "/files/1", "get")
+
+    # 스트리밍하는 동안에는 처리중인 요청으로 남고 본문이 끝나면 감소
+    def test_count_until_body_end(self, connections):
+        response = self.forward(make_upstream_response(b"x" * 100))
+        http_response = to_streaming_response(response)
+        chunks = iter(http_response)
+        next(chunks)
+        self.assertEqual(connections.get(self.upstream), 1)
+        self.assertEqual(len(b"".join(chunks)), 90)
+        self.assertEqual(connections.get(self.upstream), 0)
+        close(http_response)
+        self.assertEqual(connections.get(self.upstream), 0)
+
+    # 본문을 보내기 전에 클라이언트의 연결이 끊겨 장고가 응답을 닫아도 감소
+    def test_count_on_disconnect(self, connections):
+        response = self.forward(make_upstream_response(b"x" * 100))
+        http_response = to_streaming_response(response)
+        self.assertEqual(connections.get(self.upstream), 1)
+        close(http_response)
+        self.assertEqual(connections.get(self.upstream), 0)
+        self.assertTrue(response.raw.closed)
+
+    def test_count_buffered(self, connections):
+        length = {"Content-Length": "10"}
+        response = self.forward(make_upstream_response(b"x" * 10, **length))
+        self.assertEqual(connections.get(self.upstream), 1)
+        self.assertEqual(convert_response(response).content, b"x" * 10)
+        self.assertEqual(connections.get(self.upstream), 0)
+
+    # 동시 요청 수 제한의 슬롯은 스트리밍이 끝날 때까지 반환하지 않음
+    @mock.patch.object(metrics, "start")
+    @mock.patch("apigateway.nodes.limiters", new_callable=ConcurrencyLimiters)
+    def test_limiter_slot_until_body_end(self, limiters, start, connections):
+        upstream = Upstream(
+            pk=2,
+            host="10.0.0.2",
+            concurrency_limiter=LimiterType.STATIC,
+            concurrency_limit=1,
+        )
+        with mock_upstream(upstream, make_upstream_response(b"x" * 100)):
+            response = upstream.send_request(self.api, "/files/1", "get")
+        limiter = limiters.get(upstream)
+        http_response = to_streaming_response(response)
+        next(iter(http_response))
+        self.assertEqual(limiter.in_flight, 1)
+        self.assertFalse(limiter.try_acquire())
+        close(http_response)
+        self.assertEqual(limiter.in_flight, 0)
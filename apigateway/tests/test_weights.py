@@ -0,0 +1,56 @@
+from collections import Counter
+
+from django.test import SimpleTestCase
+
+from apigateway.models import Target
+from apigateway.weights import WeightedSequence
+
+
+def make_target(pk: int, weight: int):
+    return Target(pk=pk, host=f"10.0.0.{pk}", weight=weight)
+
+
+def pick(sequence: WeightedSequence, count: int, **kwargs):
+    return Counter(sequence.get(i, **kwargs).pk for i in range(count))
+
+
+class TestWeightedSequence(SimpleTestCase):
+    def test_exactly_proportional(self):
+        weights = {1: 100, 2: 300, 3: 200, 4: 50}
+        sequence = WeightedSequence(make_target(pk, w) for pk, w in weights.items())
+        total = sum(weights.values())
+        # 주기(가중치를 최대공약수로 나눈 합)의 배수만큼 선택하면 정확히 가중치에 비례
+        self.assertEqual(len(sequence), total // 50)
+        counts = pick(sequence, len(sequence) * 1000)
+        for pk, weight in weights.items():
+            self.assertEqual(counts[pk], weight // 50 * 1000)
+
+    def test_proportional_in_any_window(self):
+        weights = {1: 37, 2: 101, 3: 13, 4: 250}
+        sequence = WeightedSequence(make_target(pk, w) for pk, w in weights.items())
+        total = sum(weights.values())
+        # 주기의 배수가 아닌 임의의 구간에서도 카이제곱 검정을 통과
+        window = 10007
+        counts = Counter(sequence.get(i + 123).pk for i in range(window))
+        chi2 = sum(
+            (counts[pk] - window * weight / total) ** 2 / (window * weight / total)
+            for pk, weight in weights.items()
+        )
+        # 자유도 3, 유의수준 0.001의 임계값
+        self.assertLess(chi2, 16.27)
+
+    def test_smooth(self):
+        sequence = WeightedSequence([make_target(1, 500), make_target(2, 100)])
+        # 가중치가 큰 노드도 연속으로 몰아서 선택하지 않음
+        picked = [sequence.get(i).pk for i in range(len(sequence))]
+        self.assertEqual(picked, [1, 1, 1, 2, 1, 1])
+
+    def test_skip_unavailable(self):
+        sequence = WeightedSequence([make_target(1, 100), make_target(2, 100)])
+        counts = pick(sequence, 100, available=lambda x: x.pk != 1)
+        self.assertEqual(counts, {2: 100})
+
+    def test_zero_weight(self):
+        sequence = WeightedSequence([make_target(1, 0), make_target(2, 100)])
+        self.assertEqual(pick(sequence, 10), {2: 10})
+        self.assertIsNone(WeightedSequence([make_target(1, 0)]).get(0))
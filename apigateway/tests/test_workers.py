@@ -0,0 +1,39 @@
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apigateway.metrics import Metrics
+from apigateway.workers import WorkerValues
+
+
+class TestWorkerValues(SimpleTestCase):
+    def test_sum_live_workers(self):
+        values = WorkerValues("test:workers")
+        now = time.time()
+        with mock.patch.object(
+            WorkerValues, "worker", new_callable=mock.PropertyMock
+        ) as worker:
+            worker.return_value = "a"
+            values.publish({"target:1": 2}, ttl=60)
+            worker.return_value = "b"
+            values.publish({"target:1": 1, "target:2": 4}, ttl=60)
+            self.assertEqual(values.total(), {"target:1": 3, "target:2": 4})
+            # a가 죽어서 기록이 멈추면 ttl이 지난 뒤에는 b의 값만 남음
+            with mock.patch("apigateway.workers.time.time", return_value=now + 61):
+                values.publish({"target:1": 1}, ttl=60)
+                self.assertEqual(values.total(), {"target:1": 1})
+
+
+class TestGauges(SimpleTestCase):
+    def test_gauge_not_accumulated(self):
+        metrics = Metrics()
+        metrics.prefix = "test:metrics"
+        metrics.workers = WorkerValues("test:metrics:gauges")
+        value = {"in_flight": 5}
+        metrics.gauge(lambda: dict(value))
+        metrics.flush()
+        value["in_flight"] = 2
+        metrics.flush()
+        # 변화량을 더하지 않고 현재값을 기록
+        self.assertEqual(metrics.get_gauges(["in_flight"]), {"in_flight": 2})
@@ -1,130 +1,242 @@
-import re
+import asyncio
+import itertools
+import httpx
 import requests
-import hashlib
-from typing import Callable, Optional
-from django.db.models import F, Value
-from django.http.response import HttpResponse
+from typing import Awaitable, Callable, Iterator, Optional
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.http.response import HttpResponse, StreamingHttpResponse
 
 from rest_framework import status, exceptions
 from rest_framework.views import APIView
-from base.exceptions import TimeoutException, ConflictException
-from base.caches import UseSingleCache, cache
 from base.wrappers import MockRequest
 
+from .idempotency import StoredResponse, get_idempotent_key, idempotency_store
 from .models import Api
+from .routes import route_table
+from .streams import discard_response, end_body
 
-MINUTE = 60
-HOUR = MINUTE * 60
-DAY = HOUR * 24
 OPERAION_FUNC = Callable[["gateway", MockRequest], requests.Response]
+ASYNC_OPERAION_FUNC = Callable[
+    ["async_gateway", MockRequest], Awaitable[httpx.Response]
+]
 
 
-def hasher(string: str) -> str:
-    return hashlib.blake2b(string.encode("utf-8")).hexdigest()
+def idempotent_wrapper(func: OPERAION_FUNC):
+    def wrapper(view: "gateway", request: MockRequest):
+        key = get_idempotent_key(request)
+        if not key:
+            return func(view, request)
+        stored, token = idempotency_store.begin(key, request)
+        if stored is not None:
+            return stored
+        try:
+            response = func(view, request)
+            try:
+                idempotency_store.save(key, request, response)
+            except BaseException:
+                discard_response(response)
+                raise
+            return response
+        finally:
+            # 처리중에 에러가 나더라도 기다리는 요청이 다시 시도할 수 있도록 잠금을 풂
+            idempotency_store.release(key, token)
+
+    return wrapper
+
 
+# idempotent_wrapper의 비동기 버전
+def async_idempotent_wrapper(func: ASYNC_OPERAION_FUNC):
+    async def wrapper(view: "async_gateway", request: MockRequest):
+        key = get_idempotent_key(request)
+        if not key:
+            return await func(view, request)
+        stored, token = await idempotency_store.async_begin(key, request)
+        if stored is not None:
+            return stored
+        try:
+            response = await func(view, request)
+            try:
+                await idempotency_store.async_save(key, request, response)
+            except BaseException:
+                discard_response(response)
+                raise
+            return response
+        finally:
+            await idempotency_store.async_release(key, token)
 
-def get_idempotent_key(request: MockRequest):
-    key = request.headers.get("Idempotency-Key", None)
-    user = request.headers.get("Authorization", "Anon")
-    content_type = request.headers.get("Content-Type", "application/json")
-    if key:
-        string = f"{user}:{request.get_full_path()}:{request.method}:{content_type}:{request.data}:{key}"
-        return hasher(string)
-    return None
+    return wrapper
 
 
-def block_cached_idempotent_response(
-    key: str, retries=0
-) -> Optional[requests.Response]:
-    if retries >= 10:
-        raise TimeoutException
-    response = cache.get(key, None)
-    if response == "in_progress":
-        raise ConflictException(detail={"duplicated": ["이미 처리중인 요청입니다."]})
-    else:
-        cache.add(key, "in_progress")
-    return response
+# 스트리밍 응답의 본문, 장고는 응답을 보낸 뒤나 클라이언트의 연결이 끊겼을 때 close를 호출
+# 제너레이터는 시작하기 전에 닫으면 finally가 실행되지 않으므로 이터레이터 클래스로 만듦
+class UpstreamBody:
+    def __init__(self, response: requests.Response, chunks: Iterator[bytes]):
+        self.response = response
+        self.chunks = iter(chunks)
+        self.completed = False
+        self.closed = False
 
+    def __iter__(self):
+        return self
 
-def idempotent_wrapper(func: OPERAION_FUNC):
-    def wrapper(view: "gateway", request: MockRequest):
-        response: Optional[requests.Response] = None
-        key = get_idempotent_key(request)
-        if key:
-            # 캐시에서 키검색
-            response = block_cached_idempotent_response(key)
-            if response != None:
-                print("hit idemp")
-            if not response:
-                response = func(view, request)
-                cache.set(key, response, timeout=15 * DAY)
-        else:
-            response = func(view, request)
-        return response
+    def __next__(self) -> bytes:
+        try:
+            return next(self.chunks)
+        except StopIteration:
+            self.completed = True
+            self.close()
+            raise
 
-    return wrapper
+    # 끝까지 읽은 커넥션만 풀에 반납하고
+    # 클라이언트의 연결이 끊겨 중간에 멈춘 경우에는 업스트림 커넥션을 닫음
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self.completed:
+                self.response.raw.release_conn()
+            else:
+                self.response.close()
+        finally:
+            end_body(self.response)
+
+
+# 업스트림의 본문을 받는 대로 클라이언트에게 전달
+# 압축된 본문을 그대로 넘기므로 Content-Length와 Content-Encoding도 그대로 전달
+def to_streaming_response(response: requests.Response):
+    chunk_size = getattr(settings, "STREAM_CHUNK_SIZE", 64 * 1024)
+    body = UpstreamBody(response, response.raw.stream(chunk_size, decode_content=False))
+    content_type = response.headers.get("Content-Type", "").lower()
+    http_response = StreamingHttpResponse(
+        body, status=response.status_code, content_type=content_type
+    )
+    for header in ("Content-Length", "Content-Encoding"):
+        if header in response.headers:
+            http_response[header] = response.headers[header]
+    return http_response
+
+
+# 멱등성 저장을 위해 일부를 읽다가 멈춘 응답은 읽은 부분과 나머지를 이어서 전달
+# 읽은 부분은 압축이 풀린 본문이므로 Content-Encoding과 Content-Length는 넘기지 않음
+def to_resumed_response(
+    response: requests.Response, prefix: bytes, rest: Iterator[bytes]
+):
+    body = UpstreamBody(response, itertools.chain([prefix], rest))
+    content_type = response.headers.get("Content-Type", "").lower()
+    return StreamingHttpResponse(
+        body, status=response.status_code, content_type=content_type
+    )
+
+
+# 업스트림의 응답을 클라이언트에게 돌려줄 장고 응답으로 변환
+# 접근 로그에서 사용하도록 요청을 보낸 타겟과 응답 시간을 함께 넘김
+def to_http_response(
+    response: requests.Response | httpx.Response | StoredResponse,
+    api: Optional[Api] = None,
+):
+    http_response = convert_response(response, api)
+    http_response.upstream_target = getattr(response, "upstream_target", None)
+    http_response.upstream_latency = getattr(response, "upstream_latency", None)
+    return http_response
+
+
+def convert_response(
+    response: requests.Response | httpx.Response | StoredResponse,
+    api: Optional[Api] = None,
+):
+    if isinstance(response, StoredResponse):
+        return to_replayed_response(response)
+
+    if response.status_code == 204:
+        discard_response(response)
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+    partial = getattr(response, "partial_content", None)
+    if partial is not None:
+        return to_resumed_response(response, *partial)
+
+    # 캐시 저장이나 에러 출력으로 이미 본문을 읽은 응답은 그대로 사용
+    if (
+        api is not None
+        and isinstance(response, requests.Response)
+        and not response._content_consumed
+        and api.should_stream_response(response)
+    ):
+        return to_streaming_response(response)
+
+    content_type = response.headers.get("Content-Type", "").lower()
+    try:
+        content = response.content
+    finally:
+        end_body(response)
+    return HttpResponse(
+        content=content,
+        status=response.status_code,
+        content_type=content_type,
+    )
+
+
+# 멱등성 저장소에 저장해둔 응답을 다시 돌려줌
+def to_replayed_response(stored: StoredResponse):
+    http_response = HttpResponse(content=stored.content, status=stored.status_code)
+    for name, value in stored.headers.items():
+        http_response[name] = value
+    http_response["Idempotent-Replayed"] = "true"
+    return http_response
 
 
 def http_responser(func: OPERAION_FUNC):
     def wrapper(view: "gateway", request: MockRequest):
         response = func(view, request)
+        try:
+            return to_http_response(response, getattr(view, "api", None))
+        except BaseException:
+            discard_response(response)
+            raise
+
+    return wrapper
+
+
+# 장고 4.1의 ASGI 핸들러는 스트리밍 응답을 이벤트 루프에서 동기로 순회하므로
+# 비동기 게이트웨이는 업스트림 응답을 스트리밍하지 못하고 본문을 모두 읽어서 전달
+# 스트리밍했어야 할 응답을 메모리에 읽은 api는 워커마다 한번씩 알림
+buffered_apis: set[int] = set()
 
-        if response.status_code == 204:
-            return HttpResponse(status=status.HTTP_204_NO_CONTENT)
 
-        content_type = response.headers.get("Content-Type", "").lower()
-        return HttpResponse(
-            content=response.content,
-            status=response.status_code,
-            content_type=content_type,
-        )
+def warn_buffered(api: Optional[Api], response: httpx.Response | StoredResponse):
+    if api is None or api.pk in buffered_apis or isinstance(response, StoredResponse):
+        return
+    if api.should_stream_response(response):
+        buffered_apis.add(api.pk)
+        print("response buffered under GATEWAY_ASYNC", api.name)
+
+
+def async_http_responser(func: ASYNC_OPERAION_FUNC):
+    async def wrapper(view: "async_gateway", request: MockRequest):
+        response = await func(view, request)
+        api = getattr(view, "api", None)
+        try:
+            warn_buffered(api, response)
+            return to_http_response(response, api)
+        except BaseException:
+            discard_response(response)
+            raise
 
     return wrapper
 
 
 class gateway(APIView):
     # authentication_classes = ()
-    cache: UseSingleCache[Api] = UseSingleCache(0, "api")
 
     def validate_path(self, path: list[str]):
         if len(path) < 2:
             raise exceptions.NotFound
 
-    def get_path_mathced_api(self, path: str):
-        return (
-            Api.objects.prefetch_related("upstream", "upstream__targets")
-            .annotate(search_path=Value(path))
-            .filter(search_path__startswith=F("request_path"))
-        )
-
-    def get_cached_api(self, path: str) -> Optional[Api]:
-        search_key = "0/api:path=(.+?):upstream=(.*):end"
-        for key in cache.keys("0/api:*:end"):
-            result = re.search(search_key, key)
-            if not result:
-                continue
-            target_path = result.group(1)
-            if path.startswith(target_path):
-                return cache.get(key, None)
-        return None
-
+    # 워커 메모리의 라우트 테이블에서 가장 길게 일치하는 api를 찾음
     def get_api(self, path: str):
-        api = self.get_cached_api(path)
-        if api:
-            if settings.DEBUG == True:
-                cache.add("cache_hit", 0)
-                cache.incr("cache_hit", 1)
-        if not api:
-            apis = self.get_path_mathced_api(path)
-            api = apis.first()
-            if api:
-                self.cache.set(
-                    api,
-                    30 * DAY,
-                    path=api.request_path,
-                    upstream=api.upstream.pk,
-                )
+        api = route_table.match(path)
         if not api:
             print("no api found")
             raise exceptions.NotFound
@@ -138,12 +250,19 @@ class gateway(APIView):
             err.status_code = _status
             raise err
 
-    @http_responser
-    @idempotent_wrapper
-    def operation(self, request: MockRequest):
+    # 요청에 맞는 api를 찾고 플러그인 검사를 수행
+    def resolve(self, request: MockRequest):
         self.validate_path(request.path_info.split("/"))
         api = self.get_api(request.path_info)
+        api.check_body_size(request)
         self.check_plugin(api, request)
+        self.api = api
+        return api
+
+    @http_responser
+    @idempotent_wrapper
+    def operation(self, request: MockRequest):
+        api = self.resolve(request)
         with api:
             return api.send_request(request)
 
@@ -161,3 +280,54 @@ class gateway(APIView):
 
     def delete(self, request):
         return self.operation(request)
+
+
+# ASGI 배포에서 사용하는 비동기 게이트웨이
+# 업스트림의 응답을 기다리는 동안 스레드를 점유하지 않음
+class async_gateway(gateway):
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            # 인증, 권한 검사등은 동기 코드이므로 스레드에서 수행
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            method = request.method.lower()
+            if method not in self.http_method_names or not hasattr(self, method):
+                raise exceptions.MethodNotAllowed(request.method)
+            handler = getattr(self, method)
+            if asyncio.iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    @async_http_responser
+    @async_idempotent_wrapper
+    async def async_operation(self, request: MockRequest):
+        # 플러그인 검사는 db를 조회할 수 있으므로 스레드에서 수행
+        api = await sync_to_async(self.resolve)(request)
+        with api:
+            return await api.async_send_request(request)
+
+    async def get(self, request):
+        return await self.async_operation(request)
+
+    async def post(self, request):
+        return await self.async_operation(request)
+
+    async def put(self, request):
+        return await self.async_operation(request)
+
+    async def patch(self, request):
+        return await self.async_operation(request)
+
+    async def delete(self, request):
+        return await self.async_operation(request)
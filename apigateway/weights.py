@@ -0,0 +1,56 @@
+from functools import reduce
+from math import gcd
+from typing import TYPE_CHECKING, Callable, Generic, Iterable, Optional, TypeVar
+
+from django.conf import settings
+
+if TYPE_CHECKING:
+    from .nodes import Node
+
+TNode = TypeVar("TNode", bound="Node")
+
+
+# 가중치를 최대공약수로 나누고, 한 주기가 너무 길면 비율을 유지하며 줄임
+def reduce_weights(weights: list[int], limit: int) -> list[int]:
+    divisor = reduce(gcd, weights)
+    weights = [weight // divisor for weight in weights]
+    total = sum(weights)
+    if limit < total:
+        weights = [max(weight * limit // total, 1) for weight in weights]
+    return weights
+
+
+# nginx의 smooth weighted round robin으로 한 주기의 선택 순서를 미리 계산
+# 요청마다 요청 번호로 순서를 조회하므로 선택 비용은 노드 수와 무관하고
+# 한 주기 안에서 각 노드는 가중치에 정확히 비례하는 횟수만큼, 고르게 섞여서 선택됨
+class WeightedSequence(Generic[TNode]):
+    def __init__(self, nodes: Iterable[TNode], limit: Optional[int] = None):
+        if limit is None:
+            limit = getattr(settings, "WEIGHTED_SEQUENCE_LIMIT", 10000)
+        nodes = [node for node in nodes if 0 < node.weight]
+        sequence: list[TNode] = []
+        if nodes:
+            weights = reduce_weights([node.weight for node in nodes], limit)
+            total = sum(weights)
+            current = [0] * len(nodes)
+            for _ in range(total):
+                for i, weight in enumerate(weights):
+                    current[i] += weight
+                best = max(range(len(nodes)), key=lambda i: current[i])
+                current[best] -= total
+                sequence.append(nodes[best])
+        self._sequence = sequence
+
+    def __len__(self):
+        return len(self._sequence)
+
+    # available을 통과하지 못한 노드는 건너뛰고 다음 순서의 노드를 선택
+    def get(
+        self, index: int, available: Callable[[TNode], bool] = lambda x: True
+    ) -> Optional[TNode]:
+        size = len(self._sequence)
+        for i in range(size):
+            node = self._sequence[(index + i) % size]
+            if available(node):
+                return node
+        return None
@@ -0,0 +1,57 @@
+import os
+import time
+import socket
+from collections import Counter
+from typing import Optional
+
+from base.caches import cache
+
+
+# 워커마다 자신의 현재값을 ttl이 있는 키에 기록하고, 읽을 때 살아있는 워커들의 값을 합침
+# 하나의 키를 모든 워커가 증감하면 죽거나 재시작한 워커의 몫이 영원히 남지만
+# 워커별 키는 갱신이 멈추면 ttl이 지나 사라지므로 합계가 어긋난 채로 남지 않음
+class WorkerValues:
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        # (pid, 워커 목록에 등록된 만료 시각)
+        self._registered: tuple[Optional[int], float] = (None, 0)
+
+    @property
+    def registry_key(self):
+        return f"{self.prefix}:workers"
+
+    # fork된 워커는 부모와 다른 키를 사용
+    @property
+    def worker(self):
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def key(self, worker: str):
+        return f"{self.prefix}:worker:{worker}"
+
+    # 워커 목록은 워커별 만료 시각을 가지고, 만료 시각의 절반이 지나면 다시 등록
+    # 동시에 등록하다가 목록에서 빠지더라도 다음 기록 때 다시 등록됨
+    def register(self, ttl: float):
+        now = time.time()
+        pid, until = self._registered
+        workers: dict[str, float] = cache.get(self.registry_key) or {}
+        worker = self.worker
+        if pid == os.getpid() and now + ttl / 2 < until and worker in workers:
+            return
+        workers = {key: expires for key, expires in workers.items() if now < expires}
+        workers[worker] = now + ttl
+        cache.set(self.registry_key, workers, timeout=None)
+        self._registered = (os.getpid(), now + ttl)
+
+    def publish(self, values: dict[str, int], ttl: float):
+        cache.set(self.key(self.worker), values, timeout=ttl)
+        self.register(ttl)
+
+    # 살아있는 모든 워커의 값의 합
+    def total(self) -> Counter:
+        now = time.time()
+        workers: dict[str, float] = cache.get(self.registry_key) or {}
+        keys = [self.key(worker) for worker, expires in workers.items() if now < expires]
+        result: Counter = Counter()
+        for values in cache.get_many(keys).values():
+            result.update(values)
+        return result
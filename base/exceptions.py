@@ -11,11 +11,31 @@ class TimeoutException(exceptions.APIException):
     default_detail = {"timeout": ["현재 연결이 많아 지연됩니다. 다시 시도해 주세요."]}
 
 
+class PayloadTooLargeException(exceptions.APIException):
+    status_code = exceptions.status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = {"payload": ["요청 본문이 너무 큽니다."]}
+
+
 class GenericException(exceptions.APIException):
     status_code = exceptions.status.HTTP_503_SERVICE_UNAVAILABLE
     default_detail = {"unavailable": ["현재 서비스 이용이 불가합니다."]}
 
 
+# drf의 exception_handler가 wait로 Retry-After 헤더를 만듦
+class OverloadedException(exceptions.APIException):
+    status_code = exceptions.status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = {"overloaded": ["요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도해 주세요."]}
+
+    def __init__(self, detail=None, code=None, wait: int = 1):
+        super().__init__(detail, code)
+        self.wait = wait
+
+
+class IdempotencyKeyReusedException(exceptions.APIException):
+    status_code = exceptions.status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = {"idempotency": ["같은 Idempotency-Key로 다른 요청을 보냈습니다."]}
+
+
 class TokenExpiredExcpetion(exceptions.APIException):
     status_code = exceptions.status.HTTP_422_UNPROCESSABLE_ENTITY
     default_detail = {"token": ["토큰이 만료되었습니다."]}
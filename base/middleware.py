@@ -1,15 +1,16 @@
 import asyncio
+from typing import Optional
+
+from asgiref.sync import sync_to_async
 
 from django.http import HttpResponse
-from base.caches import cache
 from django.core.handlers.wsgi import WSGIRequest
 import logging
-from rest_framework import exceptions
 from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
 
-DDOSReponse = HttpResponse("Too many Requests")
-DDOSReponse.status_code = 429
-MAX_REQUESTS_PER_SECONDS = 25
+from apigateway.routes import route_table
+from .ratelimits import RateLimitMode, RateLimitResult, Scope, rate_limiter
 
 
 def get_origin(request: WSGIRequest):
@@ -19,72 +20,101 @@ def get_origin(request: WSGIRequest):
     return origin
 
 
-def blocker(origin: str):
-    if not origin:
-        return
-    block_key = f"BLOCK:ORIGIN:{origin}"
-    if cache.get(block_key, False):
-        return DDOSReponse
-    return
-
-
-def req_counter(origin: str):
-    cache_key = f"REQ:ORIGIN:{origin}"
-    req: int = cache.get_or_set(cache_key, 0, 1)  # type: ignore
-    try:
-        req: int = cache.incr(cache_key, 1)
-    except:
-        pass
-    return req
-
-
-def handle_block(origin: str, req: int):
-    if MAX_REQUESTS_PER_SECONDS <= req:
-        block_key = f"BLOCK:ORIGIN:{origin}"
-        cache.add(block_key, True, 20)
-        return DDOSReponse
-    return req
-
-
-def handle_request(request: WSGIRequest):
+# 요청에 적용할 토큰 버킷들, 첫번째 버킷은 항상 접속지
+def get_scopes(request: WSGIRequest, origin: str) -> list[Scope]:
+    rate = getattr(settings, "MAX_REQUESTS_PER_SECONDS", 25)
+    burst = getattr(settings, "MAX_REQUESTS_BURST", rate)
+    scopes = [Scope(f"RATE:ORIGIN:{origin}", rate, burst)]
+    # 라우트 테이블이 아직 없다면 만들지 않고 접속지의 제한만 적용
+    trie = route_table.current
+    if trie is None:
+        return scopes
+    api = trie.match(request.path_info)
+    if api is not None and api.rate_limit:
+        scopes.append(
+            Scope(
+                f"RATE:API:{api.pk}",
+                api.rate_limit,
+                api.rate_limit_burst or api.rate_limit,
+            )
+        )
+    apikey = request.META.get("HTTP_APIKEY")
+    consumer = trie.consumers.get(apikey) if apikey else None
+    if consumer is not None:
+        pk, rate, burst = consumer
+        rate = rate or getattr(settings, "RATE_LIMIT_PER_CONSUMER", None)
+        if rate:
+            scopes.append(Scope(f"RATE:CONSUMER:{pk}", rate, burst or rate))
+    return scopes
+
+
+def set_rate_limit_headers(response: HttpResponse, result: RateLimitResult):
+    response["RateLimit-Limit"] = str(result.limit)
+    response["RateLimit-Remaining"] = str(result.remaining)
+    response["RateLimit-Reset"] = str(result.reset)
+    return response
+
+
+def too_many_requests(result: RateLimitResult):
+    response = HttpResponse("Too many Requests", status=429)
+    response["Retry-After"] = str(max(result.reset, 1))
+    return set_rate_limit_headers(response, result)
+
+
+# 워커에서 세는 방식은 redis를 조회하지 않으므로 GET 요청도 기본으로 제한
+def should_limit(request: WSGIRequest) -> bool:
+    if request.method != "GET":
+        return True
+    local = rate_limiter.mode == RateLimitMode.LOCAL
+    return getattr(settings, "RATE_LIMIT_GET", local)
+
+
+# 확인, 차감, 차단을 한번의 redis 호출로 처리
+def handle_request(request: WSGIRequest) -> Optional[RateLimitResult]:
     origin = get_origin(request)
-    if request.method == "GET":
-        return
-    white_list = getattr(settings, "DDOS_WHITELIST", ["192.168.0.1"])
-    if origin in white_list:
-        return
-    response = blocker(origin)
-    if response:
-        return response
-    req = req_counter(origin)
-    result = handle_block(origin, req)
-    if isinstance(result, int):
-        return
-    return result
-
-
+    if not should_limit(request):
+        return None
+    # 화이트리스트는 CIDR 대역도 사용할 수 있음
+    if rate_limiter.is_whitelisted(origin):
+        return None
+    return rate_limiter.hit(
+        f"BLOCK:ORIGIN:{origin}",
+        get_scopes(request, origin),
+        getattr(settings, "DDOS_BLOCK_SECONDS", 20),
+    )
+
+
+@sync_and_async_middleware
 def DDOSBlocker(get_response):
     logger = logging.getLogger("django")
 
     logger.setLevel(logging.INFO)
     if asyncio.iscoroutinefunction(get_response):
 
+        # redis 호출이 이벤트 루프를 막지 않도록 스레드에서 수행
+        # db를 사용하지 않으므로 한 스레드에 몰아서 실행할 필요가 없음
+        async_handle_request = sync_to_async(handle_request, thread_sensitive=False)
+
         async def async_middleware(request):
-            response = handle_request(request)
-            if response:
-                return response
+            result = await async_handle_request(request)
+            if result is None:
+                return await get_response(request)
+            if not result.allowed:
+                return too_many_requests(result)
             response = await get_response(request)
-            return response
+            return set_rate_limit_headers(response, result)
 
         function = async_middleware
     else:
 
         def middleware(request):
-            response = handle_request(request)
-            if response:
-                return response
+            result = handle_request(request)
+            if result is None:
+                return get_response(request)
+            if not result.allowed:
+                return too_many_requests(result)
             response = get_response(request)
-            return response
+            return set_rate_limit_headers(response, result)
 
         function = middleware
     return function
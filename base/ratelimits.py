@@ -0,0 +1,387 @@
+import math
+import time
+import ipaddress
+from enum import Enum
+from threading import Lock
+from typing import Iterable, NamedTuple, Optional
+
+from django.conf import settings
+
+# 트라이 노드에서 대역의 끝을 가리키는 키, 비트인 0, 1과 겹치지 않음
+END = -1
+
+# 토큰 버킷의 확인, 차감, 차단을 한번의 redis 호출로 원자적으로 수행
+# KEYS[1]은 차단 키, KEYS[2]부터는 버킷 키
+# ARGV[1]은 차단 시간(초), 이후 버킷마다 초당 요청 수와 버스트 크기
+# 모든 버킷에 토큰이 있을 때만 모든 버킷에서 하나씩 차감하고
+# 첫번째 버킷(접속지)이 비었다면 차단 키를 설정
+TOKEN_BUCKET_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local blocked = redis.call('PTTL', KEYS[1])
+if blocked > 0 then
+    return {0, 0, 0, math.ceil(blocked / 1000), 1}
+end
+local allowed = 1
+local tokens = {}
+for i = 2, #KEYS do
+    local rate = tonumber(ARGV[i * 2 - 2])
+    local burst = tonumber(ARGV[i * 2 - 1])
+    local state = redis.call('HMGET', KEYS[i], 't', 'ts')
+    local current = tonumber(state[1]) or burst
+    local updated = tonumber(state[2]) or now
+    current = math.min(burst, current + math.max(0, now - updated) * rate)
+    tokens[i] = current
+    if current < 1 then
+        allowed = 0
+    end
+end
+local limit, remaining, reset, block = 0, -1, 0, 0
+for i = 2, #KEYS do
+    local rate = tonumber(ARGV[i * 2 - 2])
+    local burst = tonumber(ARGV[i * 2 - 1])
+    local current = tokens[i]
+    if allowed == 1 then
+        current = current - 1
+        redis.call('HSET', KEYS[i], 't', tostring(current), 'ts', tostring(now))
+        redis.call('EXPIRE', KEYS[i], math.ceil(burst / rate) + 1)
+    end
+    if remaining < 0 or math.floor(current) < remaining then
+        limit = burst
+        remaining = math.floor(current)
+        if allowed == 1 then
+            reset = math.ceil((burst - current) / rate)
+        else
+            reset = math.ceil((1 - current) / rate)
+        end
+    end
+end
+if allowed == 0 and tokens[2] < 1 and tonumber(ARGV[1]) > 0 then
+    redis.call('SET', KEYS[1], 1, 'EX', ARGV[1])
+    reset = math.max(reset, tonumber(ARGV[1]))
+    block = 1
+end
+return {allowed, limit, math.max(remaining, 0), reset, block}
+"""
+
+
+class Scope(NamedTuple):
+    key: str
+    rate: float  # 초당 요청 수
+    burst: int  # 한번에 허용하는 최대 요청 수
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: int  # 허용되었다면 버킷이 다 차기까지, 거절되었다면 다시 시도할 수 있기까지 걸리는 시간(초)
+    blocked: bool = False  # 접속지가 차단되었는지
+
+
+# redis를 쓰지 않는 환경에서 사용하는 워커 메모리의 토큰 버킷
+# 워커마다 따로 계산되므로 개발, 테스트 용도로만 사용
+class LocalBuckets:
+    def __init__(self):
+        self._lock = Lock()
+        self.buckets: dict[str, tuple[float, float]] = {}
+        self.blocked: dict[str, float] = {}
+
+    def hit(self, block_key: str, scopes: list[Scope], block_seconds: int):
+        now = time.monotonic()
+        with self._lock:
+            until = self.blocked.get(block_key, 0)
+            if now < until:
+                return RateLimitResult(False, 0, 0, math.ceil(until - now), True)
+            tokens = []
+            for scope in scopes:
+                current, updated = self.buckets.get(scope.key, (scope.burst, now))
+                tokens.append(
+                    min(scope.burst, current + max(0, now - updated) * scope.rate)
+                )
+            allowed = all(1 <= current for current in tokens)
+            limit, remaining, reset = 0, -1, 0
+            for scope, current in zip(scopes, tokens):
+                if allowed:
+                    current -= 1
+                    self.buckets[scope.key] = (current, now)
+                if remaining < 0 or math.floor(current) < remaining:
+                    limit = scope.burst
+                    remaining = math.floor(current)
+                    needed = scope.burst - current if allowed else 1 - current
+                    reset = math.ceil(needed / scope.rate)
+            blocked = not allowed and tokens[0] < 1 and block_seconds > 0
+            if blocked:
+                self.blocked[block_key] = now + block_seconds
+                reset = max(reset, block_seconds)
+            return RateLimitResult(allowed, limit, max(remaining, 0), reset, blocked)
+
+
+# 차단된 접속지를 워커 메모리에 잠시 기억하여 차단 중인 요청은 redis를 조회하지 않고 거절
+# redis에서 차단을 풀었을 때 늦게 반영되지 않도록 짧은 기간만 기억
+class Blocklist:
+    def __init__(self):
+        self._lock = Lock()
+        # 차단 키별 (기억하는 기한, 차단이 풀리는 시각)
+        self.blocked: dict[str, tuple[float, float]] = {}
+
+    def add(self, block_key: str, seconds: float):
+        now = time.monotonic()
+        ttl = min(seconds, getattr(settings, "RATE_LIMIT_BLOCKLIST_TTL", 5))
+        with self._lock:
+            self.blocked[block_key] = (now + ttl, now + seconds)
+
+    # 차단이 남은 시간(초), 차단되지 않았다면 0
+    def get(self, block_key: str) -> int:
+        entry = self.blocked.get(block_key)
+        if entry is None:
+            return 0
+        now = time.monotonic()
+        if entry[0] <= now:
+            with self._lock:
+                if self.blocked.get(block_key) == entry:
+                    del self.blocked[block_key]
+            return 0
+        return math.ceil(entry[1] - now)
+
+
+# 워커에서 요청 수를 세고 일정 시간이나 요청 수마다 변화량을 redis에 합산하는 제한기
+# 마지막으로 합산한 전체 요청 수와 아직 보내지 않은 요청 수로 판단하므로 요청마다 redis를 조회하지 않음
+# 버킷을 burst/rate초 길이의 고정 창으로 바꿔서 창마다 burst개까지 허용
+class WindowCounter:
+    def __init__(self, connection=None):
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self.connection = connection
+        # 창 키별 아직 보내지 않은 요청 수, 키의 유효기간, 창이 끝나는 시각
+        self.pending: dict[str, list] = {}
+        # 창 키별 마지막으로 합산한 전체 요청 수와 창이 끝나는 시각
+        self.known: dict[str, tuple[int, float]] = {}
+        # 합산하는 동안의 요청 수도 판단에 포함
+        self.flushing: dict[str, list] = {}
+        # 이번 주기에 요청한 접속지의 차단 키와 새로 차단할 키
+        self.origins: set[str] = set()
+        self.blocks: dict[str, int] = {}
+        self.hits = 0
+        self.flushed_at = time.monotonic()
+
+    def window(self, scope: Scope, now: float) -> tuple[str, float, float]:
+        length = max(scope.burst / scope.rate, 1)
+        index = int(now // length)
+        return f"{scope.key}:{index}", length, (index + 1) * length - now
+
+    def hit(self, block_key: str, scopes: list[Scope], block_seconds: int):
+        now = time.time()
+        with self._lock:
+            windows = [self.window(scope, now) for scope in scopes]
+            counts = [
+                self.known.get(key, (0, 0))[0]
+                + self.flushing.get(key, (0,))[0]
+                + self.pending.get(key, (0,))[0]
+                for key, _, _ in windows
+            ]
+            allowed = all(
+                count < scope.burst for scope, count in zip(scopes, counts)
+            )
+            limit, remaining, reset = 0, -1, 0
+            for scope, (key, length, left), count in zip(scopes, windows, counts):
+                if allowed:
+                    pending = self.pending.setdefault(
+                        key, [0, math.ceil(length) + 1, now + left]
+                    )
+                    pending[0] += 1
+                    count += 1
+                if remaining < 0 or scope.burst - count < remaining:
+                    limit = scope.burst
+                    remaining = max(scope.burst - count, 0)
+                    reset = math.ceil(left)
+            self.origins.add(block_key)
+            blocked = not allowed and scopes[0].burst <= counts[0] and 0 < block_seconds
+            if blocked:
+                self.blocks[block_key] = block_seconds
+                reset = max(reset, block_seconds)
+            self.hits += 1
+        if self.should_flush():
+            self.flush()
+        return RateLimitResult(allowed, limit, remaining, reset, blocked)
+
+    def should_flush(self) -> bool:
+        if getattr(settings, "RATE_LIMIT_FLUSH_EVERY", 100) <= self.hits:
+            return True
+        interval = getattr(settings, "RATE_LIMIT_FLUSH_INTERVAL", 0.05)
+        return interval <= time.monotonic() - self.flushed_at
+
+    # 모인 변화량을 한번의 파이프라인으로 더하고 다른 워커가 설정한 차단도 함께 확인
+    def flush(self):
+        # 다른 스레드가 합산 중이라면 기다리지 않고 다음 주기에 합산
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                pending, self.pending = self.pending, {}
+                self.flushing = pending
+                origins, self.origins = self.origins, set()
+                blocks, self.blocks = self.blocks, {}
+                self.hits = 0
+                self.flushed_at = time.monotonic()
+            if self.connection is None:
+                # redis가 없으면 워커의 요청 수만으로 판단
+                self.merge(pending)
+                return
+            pipe = self.connection.pipeline(transaction=False)
+            for key, (delta, ttl, _) in pending.items():
+                pipe.incrby(key, delta)
+                pipe.expire(key, ttl)
+            for block_key, seconds in blocks.items():
+                pipe.set(block_key, 1, ex=seconds)
+            origins = list(origins)
+            for block_key in origins:
+                pipe.pttl(block_key)
+            try:
+                results = pipe.execute()
+            except Exception as e:
+                print("rate limit flush failed", e)
+                self.merge(pending)
+                return
+            self.merge(pending, results[: len(pending) * 2 : 2])
+            ttls = results[len(pending) * 2 + len(blocks) :]
+            for block_key, ttl in zip(origins, ttls):
+                if ttl and 0 < ttl:
+                    rate_limiter.blocklist.add(block_key, ttl / 1000)
+        finally:
+            self._flush_lock.release()
+
+    # counts가 없으면 합산한 전체 요청 수 대신 워커의 요청 수를 더함
+    def merge(self, pending: dict[str, list], counts: Optional[list[int]] = None):
+        with self._lock:
+            # 지난 창의 요청 수는 더이상 사용하지 않음
+            now = time.time()
+            self.known = {
+                key: known for key, known in self.known.items() if now < known[1]
+            }
+            for i, (key, (delta, _, ends_at)) in enumerate(pending.items()):
+                if counts is None:
+                    count = self.known.get(key, (0, 0))[0] + delta
+                else:
+                    count = int(counts[i])
+                self.known[key] = (count, ends_at)
+            self.flushing = {}
+
+
+# 화이트리스트의 IP 대역 목록
+# 주소의 비트를 따라 내려가는 트라이라 대역 수와 무관하게 최대 32(IPv6는 128)번 비교
+class PrefixTree:
+    def __init__(self, networks: Iterable[str] = ()):
+        self.roots: dict[int, dict] = {4: {}, 6: {}}
+        for network in networks:
+            self.add(network)
+
+    def add(self, network: str):
+        network = network.strip()
+        if not network:
+            return
+        try:
+            parsed = ipaddress.ip_network(network, strict=False)
+        except ValueError:
+            print("invalid network", network)
+            return
+        node = self.roots[parsed.version]
+        address = int(parsed.network_address)
+        bits = parsed.max_prefixlen
+        for i in range(parsed.prefixlen):
+            node = node.setdefault((address >> (bits - 1 - i)) & 1, {})
+        node[END] = True
+
+    def __contains__(self, address: str) -> bool:
+        try:
+            parsed = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        node = self.roots[parsed.version]
+        value = int(parsed)
+        bits = parsed.max_prefixlen
+        for i in range(bits):
+            if END in node:
+                return True
+            node = node.get((value >> (bits - 1 - i)) & 1)
+            if node is None:
+                return False
+        return END in node
+
+
+class RateLimitMode(str, Enum):
+    ATOMIC = "atomic"  # 요청마다 스크립트를 한번 호출
+    LOCAL = "local"  # 워커에서 세고 주기적으로 합산
+
+
+# 접속지, 라우트, 컨슈머별 요청 수를 확인하는 요청 제한기
+class RateLimiter:
+    def __init__(self):
+        self._script = None
+        self._local: Optional[LocalBuckets] = None
+        self._counter: Optional[WindowCounter] = None
+        self._whitelist: tuple[Optional[tuple[str, ...]], PrefixTree] = (None, PrefixTree())
+        self.blocklist = Blocklist()
+
+    @property
+    def mode(self) -> str:
+        return getattr(settings, "RATE_LIMIT_MODE", RateLimitMode.ATOMIC)
+
+    def load(self):
+        if self._script is not None or self._local is not None:
+            return
+        try:
+            from django_redis import get_redis_connection
+
+            connection = get_redis_connection("default")
+            # EVALSHA로 호출하고 스크립트가 없으면 EVAL로 다시 호출함
+            self._script = connection.register_script(TOKEN_BUCKET_SCRIPT)
+            self._counter = WindowCounter(connection)
+        except (ImportError, NotImplementedError):
+            self._local = LocalBuckets()
+            self._counter = WindowCounter()
+
+    # 설정이 바뀌었을 때만 다시 만듦
+    def is_whitelisted(self, origin: str) -> bool:
+        networks = tuple(getattr(settings, "DDOS_WHITELIST", ["192.168.0.1"]))
+        current, tree = self._whitelist
+        if current != networks:
+            tree = PrefixTree(networks)
+            self._whitelist = (networks, tree)
+        return origin in tree
+
+    def hit(
+        self, block_key: str, scopes: list[Scope], block_seconds: int
+    ) -> Optional[RateLimitResult]:
+        if not scopes:
+            return None
+        if remaining := self.blocklist.get(block_key):
+            return RateLimitResult(False, 0, 0, remaining, True)
+        self.load()
+        result = self.count(block_key, scopes, block_seconds)
+        if result is not None and result.blocked:
+            self.blocklist.add(block_key, result.reset)
+        return result
+
+    def count(
+        self, block_key: str, scopes: list[Scope], block_seconds: int
+    ) -> Optional[RateLimitResult]:
+        if self.mode == RateLimitMode.LOCAL:
+            return self._counter.hit(block_key, scopes, block_seconds)  # type:ignore
+        if self._local is not None:
+            return self._local.hit(block_key, scopes, block_seconds)
+        args = [block_seconds]
+        for scope in scopes:
+            args.extend((scope.rate, scope.burst))
+        try:
+            allowed, limit, remaining, reset, blocked = self._script(  # type:ignore
+                keys=[block_key, *(scope.key for scope in scopes)], args=args
+            )
+        except Exception as e:
+            # redis에 문제가 있으면 요청을 막지 않음
+            print("rate limit failed", e)
+            return None
+        return RateLimitResult(bool(allowed), limit, remaining, reset, bool(blocked))
+
+
+rate_limiter = RateLimiter()
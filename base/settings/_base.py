@@ -54,6 +54,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "apigateway.middleware.LoadShedding",
     "logs.middleware.request_logger",
     "base.middleware.DDOSBlocker",
     "corsheaders.middleware.CorsMiddleware",
@@ -239,8 +240,31 @@ CELERY_ACCEPT_CONTENT = ["application/json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "Asia/Seoul"
+CELERY_BEAT_SCHEDULE = {
+    "maintain-log-partitions": {
+        "task": "logs.tasks.maintain_log_partitions",
+        "schedule": 60 * 60,
+    },
+    "compact-log-rollups": {
+        "task": "logs.tasks.compact_log_rollups",
+        "schedule": 5 * 60,
+    },
+}
+
+# 로그 테이블을 나누는 기간(day, month)과 미리 만들어 둘 파티션 수, 보관 기간(일)
+LOG_PARTITION_PERIOD = os.getenv("LOG_PARTITION_PERIOD", "day")
+LOG_PARTITION_PREMAKE = 3
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "30"))
+
+# 분 단위 라우트, 타겟별 합계의 보관 기간(일)
+LOG_ROLLUP_RETENTION_DAYS = int(os.getenv("LOG_ROLLUP_RETENTION_DAYS", "90"))
 
 EVENT_BROKER_URL = os.getenv("EVENT_BROKER_URL", "host.docker.internal:9092")
 
 
 DDOS_WHITELIST = os.getenv("DDOS_WHITELIST", "").split(",")
+# atomic: 요청마다 redis 스크립트를 한번 호출, local: 워커에서 세고 주기적으로 redis에 합산
+RATE_LIMIT_MODE = os.getenv("RATE_LIMIT_MODE", "atomic")
+
+# uvicorn(ASGI)으로 배포할 때 비동기 게이트웨이 뷰와 httpx 클라이언트를 사용
+GATEWAY_ASYNC = os.getenv("GATEWAY_ASYNC", "false").lower() == "true"
@@ -13,14 +13,17 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include, re_path
 from rest_framework import routers
 
 # from django.conf.urls import url
-from apigateway.views import gateway
+from apigateway.views import gateway, async_gateway
 from redirects.views import RedirectionViewSet
 
+# ASGI로 배포할 때는 비동기 게이트웨이를 사용
+gateway_view = async_gateway if settings.GATEWAY_ASYNC else gateway
 router = routers.DefaultRouter()
 # router.register('redirections',RedirectionViewSet,basename='redirections')
 
@@ -30,5 +33,5 @@ urlpatterns = [
     # path("consul/", include(router.urls)),
     # path('',include(router.urls)),
     # path("", include(router.urls)),
-    re_path(r".*", gateway.as_view()),
+    re_path(r".*", gateway_view.as_view()),
 ]
@@ -1,10 +1,114 @@
+import ipaddress
+from datetime import timedelta
+
 from django.contrib import admin, messages
-from .models import Log
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import Log, LogRollup
+
+METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+
+
+# 필터가 없는 목록에서는 전체 행을 세지 않고 통계의 추정치를 사용
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if connection.vendor != "postgresql" or query is None or query.where:
+            return super().count
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT COALESCE(SUM(GREATEST(reltuples, 0)), 0)::bigint FROM pg_class
+                WHERE oid = to_regclass(%s)
+                OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s))
+                """,
+                [Log._meta.db_table, Log._meta.db_table],
+            )
+            (estimate,) = cursor.fetchone()
+        return estimate or super().count
+
+
+# created_at으로 범위를 좁혀서 해당 기간의 파티션만 조회하도록 함
+class CreatedFilter(admin.SimpleListFilter):
+    title = "created"
+    parameter_name = "created"
+
+    def lookups(self, request, model_admin):
+        return (("1h", "1 hour"), ("1d", "1 day"), ("7d", "7 days"), ("30d", "30 days"))
+
+    def queryset(self, request, queryset):
+        periods = {
+            "1h": timedelta(hours=1),
+            "1d": timedelta(days=1),
+            "7d": timedelta(days=7),
+            "30d": timedelta(days=30),
+        }
+        period = periods.get(self.value() or "")
+        if period is None:
+            return queryset
+        return queryset.filter(created_at__gte=timezone.now() - period)
+
+
+# 값 목록을 DISTINCT로 조회하지 않도록 고정된 목록을 사용
+class MethodFilter(admin.SimpleListFilter):
+    title = "method"
+    parameter_name = "method"
+
+    def lookups(self, request, model_admin):
+        return [(method, method) for method in METHODS]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(method=self.value())
+        return queryset
+
+
 class LogAdmin(admin.ModelAdmin):
     ordering = ("-created_at",)
-    list_filter = ("method", "user_id")
-    search_fields = ("path_info", "ip_address", "user_id")
+    list_filter = (CreatedFilter, MethodFilter)
+    search_fields = ("path_info",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # ip와 유저 id는 인덱스를 사용하도록 일치 검색, 나머지는 경로의 부분 문자열 검색
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if term.isdigit():
+            return queryset.filter(user_id=int(term)), False
+        try:
+            ipaddress.ip_address(term)
+            return queryset.filter(ip_address=term), False
+        except ValueError:
+            pass
+        return super().get_search_results(request, queryset, search_term)
+
+
+class LogRollupAdmin(admin.ModelAdmin):
+    ordering = ("-minute",)
+    list_display = ("minute", "api_id", "target", "count", "errors", "p50", "p95", "p99")
+    list_filter = (("minute", admin.DateFieldListFilter),)
+    search_fields = ("target",)
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if term.isdigit():
+            return queryset.filter(api_id=int(term)), False
+        return queryset.filter(target=term), False
+
+    def p50(self, obj: LogRollup):
+        return obj.latency_histogram.percentile(50)
+
+    def p95(self, obj: LogRollup):
+        return obj.latency_histogram.percentile(95)
+
+    def p99(self, obj: LogRollup):
+        return obj.latency_histogram.percentile(99)
 
 
 # Register your models here.
 admin.site.register(Log, LogAdmin)
+admin.site.register(LogRollup, LogRollupAdmin)
@@ -0,0 +1,73 @@
+import math
+from typing import Iterable, Optional
+
+# 2의 거듭제곱 구간마다 나누는 하위 구간 수, 값의 상대 오차는 1/SUB_BUCKETS 이하
+SUB_BUCKETS = 16
+# 1ms부터 2^MAX_EXPONENT ms까지 기록, 그보다 큰 값은 마지막 구간에 포함
+MAX_EXPONENT = 24
+
+
+# 0이면 1ms 미만
+def bucket_index(value: float) -> int:
+    if value < 1:
+        return 0
+    exponent = min(int(math.log2(value)), MAX_EXPONENT - 1)
+    base = 2**exponent
+    sub = min(int((value - base) / base * SUB_BUCKETS), SUB_BUCKETS - 1)
+    return 1 + exponent * SUB_BUCKETS + sub
+
+
+# 구간의 중간값
+def bucket_value(index: int) -> float:
+    if index == 0:
+        return 0.5
+    exponent, sub = divmod(index - 1, SUB_BUCKETS)
+    base = 2**exponent
+    return base + base * (sub + 0.5) / SUB_BUCKETS
+
+
+# HDR 히스토그램처럼 로그 간격의 고정된 구간에 개수를 세는 응답 시간(ms) 히스토그램
+# 구간이 고정되어 있으므로 워커나 분 단위로 나눠서 센 히스토그램을 더하기만 하면 합칠 수 있음
+class LatencyHistogram:
+    def __init__(self, counts: Optional[dict[int, int]] = None):
+        self.counts: dict[int, int] = counts or {}
+
+    def add(self, value: float, count: int = 1):
+        index = bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        return self
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def percentile(self, percent: float) -> Optional[float]:
+        total = self.total
+        if not total:
+            return None
+        rank = math.ceil(total * percent / 100)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if rank <= seen:
+                return bucket_value(index)
+        return bucket_value(max(self.counts))
+
+    # JSONField에 저장할 때 키는 문자열이어야 함
+    def to_json(self) -> dict[str, int]:
+        return {str(index): count for index, count in self.counts.items()}
+
+    @classmethod
+    def from_json(cls, data: Optional[dict[str, int]]) -> "LatencyHistogram":
+        return cls({int(index): count for index, count in (data or {}).items()})
+
+    @classmethod
+    def merged(cls, histograms: Iterable["LatencyHistogram"]) -> "LatencyHistogram":
+        result = cls()
+        for histogram in histograms:
+            result.merge(histogram)
+        return result
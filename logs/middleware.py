@@ -1,4 +1,6 @@
+import time
 import asyncio
+from typing import Optional
 
 from django.http import HttpResponse
 from base.caches import cache
@@ -6,9 +8,16 @@ from django.core.handlers.wsgi import WSGIRequest
 import logging
 from rest_framework import exceptions
 from django.conf import settings
+from django.utils import timezone
+from django.utils.decorators import sync_and_async_middleware
 
 from base.wrappers import MockRequest
 
+from apigateway.routes import route_table
+from apigateway.streams import get_content_length
+
+from .pipeline import log_pipeline
+
 
 def get_origin(request: WSGIRequest):
     origin = request.META.get("REMOTE_ADDR", "")
@@ -19,7 +28,26 @@ def get_origin(request: WSGIRequest):
 
 
 
-def handle_request(request: MockRequest,status_code=200):
+def get_bytes_out(response: Optional[HttpResponse]) -> Optional[int]:
+    if response is None:
+        return None
+    # 스트리밍 응답은 본문을 읽지 않고 Content-Length만 사용
+    if getattr(response, "streaming", False):
+        length = response.get("Content-Length")
+        return int(length) if length and length.isdigit() else None
+    return len(response.content)
+
+
+def to_ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else seconds * 1000
+
+
+def handle_request(
+    request: MockRequest,
+    status_code=200,
+    response: Optional[HttpResponse] = None,
+    latency: Optional[float] = None,
+):
     user_id = None
     if ip_address := get_origin(request):  # type:ignore
         ip_address = ip_address.split(",")[0]
@@ -28,19 +56,31 @@ def handle_request(request: MockRequest,status_code=200):
     if token := getattr(request, "auth", None):
         user_id = token.user_id
     path_info = request.path_info
-    from .tasks import create_log
-
     if path_info.startswith("/gateway/"):
         return
-    create_log(
-        user_id=user_id,
-        ip_address=ip_address,
-        path_info=path_info,
-        method=request.method,
-        status_code=status_code
+    # 비동기 미들웨어에서도 호출되므로 라우트 테이블을 만들지 않음
+    trie = route_table.current
+    api = trie.match(path_info) if trie else None
+    # db에 바로 저장하지 않고 큐에 넣으면 백그라운드에서 모아서 저장
+    log_pipeline.put(
+        dict(
+            user_id=user_id,
+            ip_address=ip_address,
+            path_info=path_info,
+            method=request.method,
+            status_code=status_code,
+            created_at=timezone.now(),
+            api_id=api.pk if api else None,
+            target=getattr(response, "upstream_target", None),
+            latency=to_ms(latency),
+            upstream_latency=to_ms(getattr(response, "upstream_latency", None)),
+            bytes_in=get_content_length(request) or None,
+            bytes_out=get_bytes_out(response),
+        )
     )
 
 
+@sync_and_async_middleware
 def request_logger(get_response):
     logger = logging.getLogger("django")
 
@@ -48,16 +88,28 @@ def request_logger(get_response):
     if asyncio.iscoroutinefunction(get_response):
 
         async def async_middleware(request):
+            started = time.monotonic()
             response = await get_response(request)
-            handle_request(request,status_code=response.status_code)
+            handle_request(
+                request,
+                status_code=response.status_code,
+                response=response,
+                latency=time.monotonic() - started,
+            )
             return response
 
         function = async_middleware
     else:
 
         def middleware(request):
+            started = time.monotonic()
             response:HttpResponse = get_response(request)
-            handle_request(request,status_code=response.status_code)
+            handle_request(
+                request,
+                status_code=response.status_code,
+                response=response,
+                latency=time.monotonic() - started,
+            )
             return response
 
         function = middleware
@@ -0,0 +1,19 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:37
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0002_log_status_code'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='log',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='생성 날짜'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:39
+
+from django.db import migrations, models, transaction
+
+
+# postgresql에서만 created_at 범위로 나눈 파티션 테이블로 바꿈
+def partition_log_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    from django.conf import settings
+    from logs.partitions import convert_to_partitioned, get_period
+
+    convert_to_partitioned(get_period(), getattr(settings, "LOG_PARTITION_PREMAKE", 3))
+
+
+# path_info의 부분 문자열 검색에 사용하는 트라이그램 인덱스
+# 확장을 만들 권한이 없다면 인덱스 없이 진행
+def add_path_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    try:
+        with transaction.atomic():
+            schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except Exception as e:
+        print("pg_trgm unavailable", e)
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS log_path_trgm_idx ON logs_log "
+        "USING gin (path_info gin_trgm_ops)"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0003_alter_log_created_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_log_table, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['-created_at'], name='log_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['user_id', '-created_at'], name='log_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['method', '-created_at'], name='log_method_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['ip_address', '-created_at'], name='log_ip_created_idx'),
+        ),
+        migrations.RunPython(add_path_trigram_index, migrations.RunPython.noop),
+    ]
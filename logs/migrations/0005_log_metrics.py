@@ -0,0 +1,68 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0004_log_partitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minute', models.DateTimeField()),
+                ('api_id', models.IntegerField(null=True)),
+                ('target', models.CharField(max_length=255, null=True)),
+                ('count', models.IntegerField(default=0)),
+                ('errors', models.IntegerField(default=0, help_text='5xx 응답 수')),
+                ('bytes_in', models.BigIntegerField(default=0)),
+                ('bytes_out', models.BigIntegerField(default=0)),
+                ('latency_sum', models.FloatField(default=0)),
+                ('upstream_latency_sum', models.FloatField(default=0)),
+                ('upstream_count', models.IntegerField(default=0)),
+                ('histogram', models.JSONField(default=dict)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='api_id',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='bytes_in',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='bytes_out',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='latency',
+            field=models.FloatField(help_text='게이트웨이의 전체 처리 시간(ms)', null=True),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='target',
+            field=models.CharField(help_text='요청을 보낸 타겟의 주소', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='upstream_latency',
+            field=models.FloatField(help_text='타겟의 응답 시간(ms)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='logrollup',
+            index=models.Index(fields=['minute', 'api_id'], name='rollup_minute_api_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logrollup',
+            index=models.Index(fields=['minute', 'target'], name='rollup_minute_target_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, transaction
+
+
+# 장고의 icontains는 postgresql에서 UPPER("path_info"::text) LIKE UPPER(%s)로 조회하므로
+# path_info 자체가 아니라 UPPER(path_info)에 트라이그램 인덱스를 만들어야 검색에 사용됨
+def add_upper_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    try:
+        with transaction.atomic():
+            schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except Exception as e:
+        print("pg_trgm unavailable", e)
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS log_path_trgm_idx")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS log_path_upper_trgm_idx ON logs_log "
+        "USING gin ((UPPER(path_info::text)) gin_trgm_ops)"
+    )
+
+
+def remove_upper_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS log_path_upper_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0005_log_metrics'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_upper_trigram_index, remove_upper_trigram_index),
+    ]
@@ -10,8 +10,57 @@ class Log(models.Model):
     ip_address = models.GenericIPAddressField(null=True)
     path_info = models.TextField()
     method = models.CharField(max_length=32)
-    created_at = models.DateTimeField(auto_now_add=True, null=False, help_text="생성 날짜")
+    # 로그를 모아서 저장하므로 저장한 시각이 아닌 요청을 처리한 시각을 기록
+    created_at = models.DateTimeField(default=timezone.now, null=False, help_text="생성 날짜")
     status_code = models.IntegerField(default=200)
+    api_id = models.IntegerField(null=True)
+    target = models.CharField(max_length=255, null=True, help_text="요청을 보낸 타겟의 주소")
+    latency = models.FloatField(null=True, help_text="게이트웨이의 전체 처리 시간(ms)")
+    upstream_latency = models.FloatField(null=True, help_text="타겟의 응답 시간(ms)")
+    bytes_in = models.BigIntegerField(null=True)
+    bytes_out = models.BigIntegerField(null=True)
+
+    # 관리자 페이지의 정렬, 필터, 검색에 사용하는 인덱스
+    # postgresql에서는 created_at 기준의 파티션마다 만들어짐
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at"], name="log_created_idx"),
+            models.Index(fields=["user_id", "-created_at"], name="log_user_created_idx"),
+            models.Index(fields=["method", "-created_at"], name="log_method_created_idx"),
+            models.Index(fields=["ip_address", "-created_at"], name="log_ip_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.created_at.astimezone(tz).strftime('%Y-%m-%d %H:%M:%S'):{20}} {self.method:{7}} {self.status_code} {str(self.user_id):{6}} {self.ip_address or '':{20}} {self.path_info}"
+
+
+# 분 단위로 라우트, 타겟별 요청 수와 응답 시간 히스토그램을 모아둔 테이블
+# 워커마다 로그를 저장할 때 부분 합계를 추가하고, 지난 분의 행들은 주기적으로 하나로 합침
+class LogRollup(models.Model):
+    minute = models.DateTimeField()
+    api_id = models.IntegerField(null=True)
+    target = models.CharField(max_length=255, null=True)
+    count = models.IntegerField(default=0)
+    errors = models.IntegerField(default=0, help_text="5xx 응답 수")
+    bytes_in = models.BigIntegerField(default=0)
+    bytes_out = models.BigIntegerField(default=0)
+    latency_sum = models.FloatField(default=0)
+    upstream_latency_sum = models.FloatField(default=0)
+    upstream_count = models.IntegerField(default=0)
+    # LatencyHistogram의 구간별 개수
+    histogram = models.JSONField(default=dict)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["minute", "api_id"], name="rollup_minute_api_idx"),
+            models.Index(fields=["minute", "target"], name="rollup_minute_target_idx"),
+        ]
+
+    @property
+    def latency_histogram(self):
+        from .histograms import LatencyHistogram
+
+        return LatencyHistogram.from_json(self.histogram)
+
+    def __str__(self):
+        return f"{self.minute.astimezone(tz).strftime('%Y-%m-%d %H:%M'):{17}} {str(self.api_id):{6}} {self.target or '':{24}} {self.count}"
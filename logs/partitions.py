@@ -0,0 +1,228 @@
+import re
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import TextChoices
+
+logger = logging.getLogger("django")
+
+TABLE = "logs_log"
+LEGACY_TABLE = "logs_log_legacy"
+DEFAULT_TABLE = "logs_log_default"
+
+
+class PartitionPeriod(TextChoices):
+    DAY = "day"
+    MONTH = "month"
+
+
+def get_period() -> str:
+    return getattr(settings, "LOG_PARTITION_PERIOD", PartitionPeriod.DAY)
+
+
+# 파티션 경계는 UTC 기준
+def period_start(moment: datetime, period: str) -> datetime:
+    moment = moment.astimezone(dt_timezone.utc)
+    start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == PartitionPeriod.MONTH:
+        start = start.replace(day=1)
+    return start
+
+
+def next_period(start: datetime, period: str) -> datetime:
+    if period == PartitionPeriod.MONTH:
+        return (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def partition_name(start: datetime, period: str) -> str:
+    if period == PartitionPeriod.MONTH:
+        return f"{TABLE}_p{start:%Y%m}"
+    return f"{TABLE}_p{start:%Y%m%d}"
+
+
+def is_partitioned() -> bool:
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE]
+        )
+        row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+BOUNDS = re.compile(r"FROM \((?:'([^']+)'|MINVALUE)\) TO \('([^']+)'\)")
+
+Partition = tuple[str, Optional[datetime], Optional[datetime]]
+
+
+# 파티션의 이름과 범위의 시작과 끝, 기존 테이블을 붙인 파티션은 시작이 없고 기본 파티션은 둘 다 없음
+def list_partitions() -> list[Partition]:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+            """,
+            [TABLE],
+        )
+        rows = cursor.fetchall()
+    partitions: list[Partition] = []
+    for name, bound in rows:
+        match = BOUNDS.search(bound or "")
+        if match is None:
+            partitions.append((name, None, None))
+            continue
+        lower, upper = match.groups()
+        partitions.append(
+            (
+                name,
+                datetime.fromisoformat(lower) if lower else None,
+                datetime.fromisoformat(upper),
+            )
+        )
+    return partitions
+
+
+def overlaps(partitions: list[Partition], start: datetime, end: datetime) -> bool:
+    for _, lower, upper in partitions:
+        if upper is None:
+            continue
+        if (lower is None or lower < end) and start < upper:
+            return True
+    return False
+
+
+# 파티션 범위에는 상수만 쓸 수 있으므로 문자열로 넣음
+def literal(moment: datetime) -> str:
+    return f"'{moment.isoformat()}'"
+
+
+def create_partition(cursor, start: datetime, period: str) -> str:
+    name = partition_name(start, period)
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} "
+        f"FOR VALUES FROM ({literal(start)}) TO ({literal(next_period(start, period))})"
+    )
+    return name
+
+
+# 기본 파티션에 해당 기간의 로그가 있으면 그 기간의 파티션을 만들 수 없으므로
+# 기본 파티션을 떼어낸 뒤 파티션을 만들고 로그를 옮긴 다음 다시 붙임
+# 트랜잭션 안에서 호출해야 하며, 끝날 때까지 로그 테이블에 쓰는 요청은 기다림
+def create_partition_from_default(cursor, start: datetime, period: str) -> str:
+    from .models import Log
+
+    end = next_period(start, period)
+    cursor.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_TABLE} "
+        "WHERE created_at >= %s AND created_at < %s)",
+        [start, end],
+    )
+    (exists,) = cursor.fetchone()
+    if not exists:
+        return create_partition(cursor, start, period)
+    columns = ", ".join(field.column for field in Log._meta.concrete_fields)
+    cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {DEFAULT_TABLE}")
+    name = create_partition(cursor, start, period)
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {DEFAULT_TABLE} "
+        f"WHERE created_at >= %s AND created_at < %s RETURNING {columns}) "
+        f"INSERT INTO {name} ({columns}) SELECT {columns} FROM moved",
+        [start, end],
+    )
+    print("log partition moved rows from default", name, cursor.rowcount)
+    cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {DEFAULT_TABLE} DEFAULT")
+    return name
+
+
+# 기존 테이블을 created_at 범위로 나눈 파티션 테이블로 바꿈
+# 기존 테이블은 현재 기간까지의 파티션으로 붙이므로 데이터를 옮기지 않음
+def convert_to_partitioned(period: str, premake: int):
+    now = datetime.now(dt_timezone.utc)
+    upper = next_period(period_start(now, period), period)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {TABLE}")
+        (last_id,) = cursor.fetchone()
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {LEGACY_TABLE}")
+        # 파티션 테이블의 기본키에는 파티션 키가 포함되어야 함
+        cursor.execute(f"ALTER TABLE {LEGACY_TABLE} DROP CONSTRAINT {TABLE}_pkey")
+        cursor.execute(
+            f"ALTER TABLE {LEGACY_TABLE} ALTER COLUMN id DROP IDENTITY IF EXISTS"
+        )
+        cursor.execute(f"ALTER TABLE {LEGACY_TABLE} ALTER COLUMN id DROP DEFAULT")
+        cursor.execute(
+            f"CREATE TABLE {TABLE} (LIKE {LEGACY_TABLE}) PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(f"CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id")
+        cursor.execute(f"SELECT setval('{TABLE}_id_seq', %s + 1, false)", [last_id])
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')"
+        )
+        cursor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_at)")
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ATTACH PARTITION {LEGACY_TABLE} "
+            f"FOR VALUES FROM (MINVALUE) TO ({literal(upper)})"
+        )
+        # 파티션을 미리 만들지 못했더라도 로그를 잃지 않도록 기본 파티션을 둠
+        cursor.execute(f"CREATE TABLE {DEFAULT_TABLE} PARTITION OF {TABLE} DEFAULT")
+        start = upper
+        for _ in range(premake):
+            create_partition(cursor, start, period)
+            start = next_period(start, period)
+
+
+# 다가올 기간의 파티션을 미리 만들고, 보관 기간이 지난 파티션은 통째로 지움
+# 유지보수가 밀려서 기본 파티션에 쌓인 로그는 해당 기간의 파티션을 만들어 옮기고
+# 보관 기간이 지난 로그는 기본 파티션에서 지움
+def maintain_partitions(now: Optional[datetime] = None) -> dict[str, list[str]]:
+    now = now or datetime.now(dt_timezone.utc)
+    period = get_period()
+    premake: int = getattr(settings, "LOG_PARTITION_PREMAKE", 3)
+    retention = timedelta(days=getattr(settings, "LOG_RETENTION_DAYS", 30))
+    result: dict[str, list[str]] = {"created": [], "dropped": [], "failed": []}
+    if not is_partitioned():
+        # 파티션을 쓰지 않는 db는 한번의 DELETE로 지움
+        from .models import Log
+
+        Log.objects.filter(created_at__lt=now - retention).delete()
+        return result
+    partitions = list_partitions()
+    existing = {name for name, _, _ in partitions}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {DEFAULT_TABLE} WHERE created_at < %s", [now - retention]
+        )
+        cursor.execute(f"SELECT MIN(created_at) FROM {DEFAULT_TABLE}")
+        (oldest,) = cursor.fetchone()
+        start = period_start(min(oldest, now) if oldest else now, period)
+        last = period_start(now, period)
+        for _ in range(premake):
+            last = next_period(last, period)
+        while start <= last:
+            end = next_period(start, period)
+            name = partition_name(start, period)
+            # 기존 테이블을 붙인 파티션처럼 이미 다른 파티션의 범위에 포함된 기간은 건너뜀
+            if name not in existing and not overlaps(partitions, start, end):
+                try:
+                    with transaction.atomic():
+                        name = create_partition_from_default(cursor, start, period)
+                    result["created"].append(name)
+                except Exception as e:
+                    logger.error("log partition create failed %s: %s", name, e)
+                    result["failed"].append(name)
+            start = end
+        for name, _, upper in partitions:
+            if upper is None or now - retention < upper:
+                continue
+            with transaction.atomic():
+                cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+                cursor.execute(f"DROP TABLE {name}")
+            result["dropped"].append(name)
+    return result
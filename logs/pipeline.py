@@ -0,0 +1,157 @@
+import os
+import atexit
+import random
+import time
+from queue import Empty, Full, Queue
+from threading import Lock, Thread
+from typing import Any, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from apigateway.metrics import metrics
+
+from .models import Log, LogRollup
+from .rollups import rollup_aggregator
+
+# 큐에 넣으면 flusher가 남은 로그를 저장하고 종료
+STOP = None
+
+
+# 요청 처리중에는 로그를 메모리의 큐에 넣기만 하고
+# 백그라운드 스레드가 모아서 bulk_create로 한번에 저장
+# 큐가 차오르면 일부만 저장하고, 가득 차면 버려서 db가 느려져도 요청이 지연되지 않게 함
+class LogPipeline:
+    def __init__(self):
+        self._lock = Lock()
+        self.pid: Optional[int] = None
+        self.queue: Queue = Queue()
+        self._flusher: Optional["LogFlusher"] = None
+
+    @property
+    def max_size(self) -> int:
+        return getattr(settings, "LOG_QUEUE_SIZE", 10000)
+
+    @property
+    def sample_rate(self) -> float:
+        return getattr(settings, "LOG_SAMPLE_RATE", 0.1)
+
+    # 큐가 이만큼 차면 sample_rate만큼만 저장, 0이면 가득 찰 때까지 모두 저장
+    @property
+    def high_watermark(self) -> float:
+        return getattr(settings, "LOG_QUEUE_HIGH_WATERMARK", 0.8)
+
+    def put(self, record: dict[str, Any]):
+        self.start()
+        if getattr(settings, "LOG_ROLLUP", True):
+            rollup_aggregator.add(record)
+        size = self.queue.qsize()
+        if self.high_watermark and self.max_size * self.high_watermark <= size:
+            if self.sample_rate <= random.random():
+                metrics.incr("logs:sampled_out")
+                return
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            metrics.incr("logs:dropped")
+
+    # uwsgi처럼 워커를 fork하는 서버에서는 부모 프로세스의 스레드가 복사되지 않으므로
+    # 워커마다 첫 로그를 받을 때 flusher를 시작
+    def start(self):
+        pid = os.getpid()
+        if self.pid == pid:
+            return
+        with self._lock:
+            if self.pid == pid:
+                return
+            self.queue = Queue(maxsize=self.max_size)
+            self._flusher = LogFlusher(self)
+            self._flusher.start()
+            self.pid = pid
+
+    # 종료할 때 큐에 남은 로그를 저장할 때까지 기다림
+    def stop(self):
+        flusher = self._flusher
+        if flusher is None or self.pid != os.getpid() or not flusher.is_alive():
+            return
+        timeout = getattr(settings, "LOG_DRAIN_TIMEOUT", 5)
+        try:
+            self.queue.put(STOP, timeout=timeout)
+        except Full:
+            pass
+        flusher.join(timeout)
+
+
+class LogFlusher(Thread):
+    def __init__(self, pipeline: LogPipeline):
+        super().__init__(name="log-flusher", daemon=True)
+        self.pipeline = pipeline
+        self.queue = pipeline.queue
+        self.batch_size: int = getattr(settings, "LOG_BATCH_SIZE", 500)
+        self.interval: float = getattr(settings, "LOG_FLUSH_INTERVAL", 1)
+        self.rollup_interval: float = getattr(settings, "LOG_ROLLUP_INTERVAL", 15)
+        self.rolled_at = time.monotonic()
+
+    # batch_size만큼 모이거나 interval이 지나면 반환, 종료 신호를 받았다면 stopped가 True
+    def collect(self) -> tuple[list[dict[str, Any]], bool]:
+        batch: list[dict[str, Any]] = []
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                record = self.queue.get(timeout=timeout)
+            except Empty:
+                break
+            if record is STOP:
+                return batch, True
+            batch.append(record)
+        return batch, False
+
+    def save(self, batch: list[dict[str, Any]]):
+        if not batch:
+            return
+        try:
+            close_old_connections()
+            Log.objects.bulk_create([Log(**record) for record in batch])
+        except Exception as e:
+            metrics.incr("logs:failed", len(batch))
+            print("log flush error", e)
+
+    # 워커에서 합산한 분 단위 합계를 rollup_interval마다 저장
+    def save_rollups(self, force: bool = False):
+        if not force and time.monotonic() - self.rolled_at < self.rollup_interval:
+            return
+        self.rolled_at = time.monotonic()
+        rollups = rollup_aggregator.drain()
+        if not rollups:
+            return
+        try:
+            LogRollup.objects.bulk_create(rollups)
+        except Exception as e:
+            print("log rollup flush error", e)
+
+    def run(self):
+        while True:
+            batch, stopped = self.collect()
+            self.save(batch)
+            self.save_rollups()
+            if stopped:
+                # 종료 신호 이후에 들어온 로그까지 저장
+                rest = []
+                while True:
+                    try:
+                        record = self.queue.get_nowait()
+                    except Empty:
+                        break
+                    if record is not STOP:
+                        rest.append(record)
+                for start in range(0, len(rest), self.batch_size):
+                    self.save(rest[start : start + self.batch_size])
+                self.save_rollups(force=True)
+                return
+
+
+log_pipeline = LogPipeline()
+atexit.register(log_pipeline.stop)
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Any, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .histograms import LatencyHistogram
+from .models import LogRollup
+
+RollupKey = tuple[datetime, Optional[int], Optional[str]]
+
+
+# 워커에서 로그를 분, 라우트, 타겟별로 합산
+# 큐가 가득 차서 버리거나 일부만 저장하는 로그도 합산하므로 요청 수는 정확함
+class RollupAggregator:
+    def __init__(self):
+        self._lock = Lock()
+        self.rollups: dict[RollupKey, tuple[LogRollup, LatencyHistogram]] = {}
+
+    def add(self, record: dict[str, Any]):
+        minute = record["created_at"].replace(second=0, microsecond=0)
+        key = (minute, record.get("api_id"), record.get("target"))
+        with self._lock:
+            entry = self.rollups.get(key)
+            if entry is None:
+                entry = (
+                    LogRollup(minute=minute, api_id=key[1], target=key[2]),
+                    LatencyHistogram(),
+                )
+                self.rollups[key] = entry
+            rollup, histogram = entry
+            rollup.count += 1
+            if 500 <= (record.get("status_code") or 0):
+                rollup.errors += 1
+            rollup.bytes_in += record.get("bytes_in") or 0
+            rollup.bytes_out += record.get("bytes_out") or 0
+            if (latency := record.get("latency")) is not None:
+                rollup.latency_sum += latency
+                histogram.add(latency)
+            if (upstream_latency := record.get("upstream_latency")) is not None:
+                rollup.upstream_latency_sum += upstream_latency
+                rollup.upstream_count += 1
+
+    def drain(self) -> list[LogRollup]:
+        with self._lock:
+            rollups, self.rollups = self.rollups, {}
+        result = []
+        for rollup, histogram in rollups.values():
+            rollup.histogram = histogram.to_json()
+            result.append(rollup)
+        return result
+
+
+def merge_rollups(rollups: list[LogRollup]) -> LogRollup:
+    merged, rest = rollups[0], rollups[1:]
+    histogram = merged.latency_histogram
+    for rollup in rest:
+        merged.count += rollup.count
+        merged.errors += rollup.errors
+        merged.bytes_in += rollup.bytes_in
+        merged.bytes_out += rollup.bytes_out
+        merged.latency_sum += rollup.latency_sum
+        merged.upstream_latency_sum += rollup.upstream_latency_sum
+        merged.upstream_count += rollup.upstream_count
+        histogram.merge(rollup.latency_histogram)
+    merged.histogram = histogram.to_json()
+    return merged
+
+
+# 워커들이 추가한 지난 분의 부분 합계를 키마다 한 행으로 합치고 보관 기간이 지난 행을 지움
+def compact_rollups(now: Optional[datetime] = None) -> int:
+    now = now or timezone.now()
+    # 아직 저장되지 않은 로그의 합계가 들어올 수 있으므로 조금 지난 분만 합침
+    delay = timedelta(seconds=getattr(settings, "LOG_ROLLUP_COMPACT_DELAY", 120))
+    keys = (
+        LogRollup.objects.filter(minute__lt=now - delay)
+        .values("minute", "api_id", "target")
+        .annotate(rows=Count("id"))
+        .filter(rows__gt=1)
+    )
+    compacted = 0
+    for key in keys:
+        with transaction.atomic():
+            rollups = list(
+                LogRollup.objects.select_for_update()
+                .filter(minute=key["minute"], api_id=key["api_id"], target=key["target"])
+                .order_by("id")
+            )
+            if len(rollups) < 2:
+                continue
+            merged = merge_rollups(rollups)
+            merged.save()
+            LogRollup.objects.filter(pk__in=[r.pk for r in rollups[1:]]).delete()
+            compacted += len(rollups) - 1
+    retention = timedelta(days=getattr(settings, "LOG_ROLLUP_RETENTION_DAYS", 90))
+    LogRollup.objects.filter(minute__lt=now - retention).delete()
+    return compacted
+
+
+rollup_aggregator = RollupAggregator()
@@ -1,6 +1,8 @@
 from typing import Optional
 from celery import shared_task
 from .models import Log
+from .partitions import maintain_partitions
+from .rollups import compact_rollups
 
 
 @shared_task
@@ -14,3 +16,15 @@ def create_log(
     Log.objects.create(
         user_id=user_id, ip_address=ip_address, path_info=path_info, method=method,status_code=status_code
     )
+
+
+# 다가올 기간의 파티션을 만들고 보관 기간이 지난 파티션을 지움
+@shared_task
+def maintain_log_partitions():
+    return maintain_partitions()
+
+
+# 워커들이 나눠서 저장한 분 단위 합계를 합치고 보관 기간이 지난 합계를 지움
+@shared_task
+def compact_log_rollups():
+    return compact_rollups()
@@ -1,3 +1,151 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from apigateway.routes import route_table
+
+from .histograms import LatencyHistogram, bucket_index, bucket_value
+from .middleware import request_logger
+from .models import Log
+from .partitions import (
+    DEFAULT_TABLE,
+    PartitionPeriod,
+    get_period,
+    maintain_partitions,
+    overlaps,
+    partition_name,
+    period_start,
+)
+from .pipeline import LogPipeline
+
+
+def make_pipeline():
+    pipeline = LogPipeline()
+    # flusher를 시작하지 않고 큐에 쌓이는 것만 확인
+    pipeline.start = lambda: None  # type:ignore
+    pipeline.queue.maxsize = pipeline.max_size
+    return pipeline
+
+
+def make_record(i: int):
+    return {"path_info": f"/{i}", "created_at": timezone.now()}
+
+
+class TestLogPipeline(SimpleTestCase):
+    @override_settings(LOG_QUEUE_SIZE=100, LOG_QUEUE_HIGH_WATERMARK=0)
+    def test_drop_when_full(self):
+        pipeline = make_pipeline()
+        for i in range(150):
+            pipeline.put(make_record(i))
+        self.assertEqual(pipeline.queue.qsize(), 100)
+
+    @override_settings(
+        LOG_QUEUE_SIZE=1000, LOG_QUEUE_HIGH_WATERMARK=0.5, LOG_SAMPLE_RATE=0.1
+    )
+    def test_sample_above_watermark(self):
+        pipeline = make_pipeline()
+        for i in range(500):
+            pipeline.put(make_record(i))
+        self.assertEqual(pipeline.queue.qsize(), 500)
+        for i in range(2000):
+            pipeline.put(make_record(i))
+        # 기준을 넘은 뒤에는 10% 정도만 큐에 들어감
+        self.assertTrue(600 < pipeline.queue.qsize() < 850)
+
+
+class TestLatencyHistogram(SimpleTestCase):
+    def test_bucket_error(self):
+        for value in (1, 3, 17.5, 250, 999, 12345):
+            self.assertLessEqual(
+                abs(bucket_value(bucket_index(value)) - value) / value, 1 / 16
+            )
+
+    def test_percentile(self):
+        histogram = LatencyHistogram()
+        for value in range(1, 1001):
+            histogram.add(value)
+        self.assertAlmostEqual(histogram.percentile(50), 500, delta=500 / 16)
+        self.assertAlmostEqual(histogram.percentile(99), 990, delta=990 / 16)
+
+    def test_merge(self):
+        first, second, combined = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        for value in range(1, 500):
+            first.add(value)
+            combined.add(value)
+        for value in range(500, 2000):
+            second.add(value)
+            combined.add(value)
+        merged = LatencyHistogram.from_json(first.merge(second).to_json())
+        self.assertEqual(merged.counts, combined.counts)
+
+
+@mock.patch.object(route_table, "start_syncer")
+class TestRequestLogger(SimpleTestCase):
+    # 라우트 테이블이 아직 없을 때 이벤트 루프에서 db를 조회하지 않고 api 없이 기록
+    async def test_cold_route_table(self, start_syncer):
+        async def get_response(request):
+            return HttpResponse("ok")
+
+        middleware = request_logger(get_response)
+        with mock.patch.object(route_table, "_trie", None), mock.patch(
+            "logs.middleware.log_pipeline"
+        ) as pipeline:
+            response = await middleware(RequestFactory().get("/users/"))
+        self.assertEqual(response.status_code, 200)
+        record = pipeline.put.call_args.args[0]
+        self.assertEqual(record["path_info"], "/users/")
+        self.assertIsNone(record["api_id"])
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class TestPartitionRanges(SimpleTestCase):
+    def test_overlaps(self):
+        partitions = [
+            ("logs_log_legacy", None, utc(2026, 10, 2)),
+            ("logs_log_p20261003", utc(2026, 10, 3), utc(2026, 10, 4)),
+            (DEFAULT_TABLE, None, None),
+        ]
+        self.assertTrue(overlaps(partitions, utc(2026, 10, 1), utc(2026, 10, 2)))
+        self.assertFalse(overlaps(partitions, utc(2026, 10, 2), utc(2026, 10, 3)))
+        # 기간을 월 단위로 바꾸면 이미 있는 일 단위 파티션과 겹침
+        self.assertTrue(overlaps(partitions, utc(2026, 10, 1), utc(2026, 11, 1)))
+        self.assertFalse(overlaps(partitions, utc(2026, 11, 1), utc(2026, 12, 1)))
+
+    def test_period_start(self):
+        moment = utc(2026, 10, 18, 13, 5)
+        self.assertEqual(period_start(moment, PartitionPeriod.DAY), utc(2026, 10, 18))
+        self.assertEqual(period_start(moment, PartitionPeriod.MONTH), utc(2026, 10, 1))
+
+
+def table_of(log: Log) -> str:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT tableoid::regclass::text FROM logs_log WHERE id = %s", [log.pk])
+        return cursor.fetchone()[0]
+
+
+@skipUnless(connection.vendor == "postgresql", "파티션은 postgresql에서만 사용")
+class TestMaintainPartitions(TestCase):
+    # 유지보수가 밀려서 기본 파티션에 들어간 로그가 있어도 파티션을 만들고 로그를 옮김
+    def test_move_rows_from_default(self):
+        later = timezone.now() + timedelta(days=20)
+        log = Log.objects.create(path_info="/late", created_at=later)
+        self.assertEqual(table_of(log), DEFAULT_TABLE)
+        result = maintain_partitions(later)
+        name = partition_name(period_start(later, get_period()), get_period())
+        self.assertIn(name, result["created"])
+        self.assertFalse(result["failed"])
+        self.assertEqual(table_of(log), name)
+
+    @override_settings(LOG_RETENTION_DAYS=30)
+    def test_prune_default(self):
+        later = timezone.now() + timedelta(days=100)
+        log = Log.objects.create(path_info="/late", created_at=later)
+        maintain_partitions(later + timedelta(days=31))
+        self.assertFalse(Log.objects.filter(pk=log.pk).exists())